@@ -1,14 +1,17 @@
 # -*- coding: utf-8 -*-
 # Cambio necesario: Ajustar imports
-import sys
-from models.Config import Config
-from core.Bot import RecoNotasBot
+import time
+ARRANQUE = time.monotonic()
+
+import sys # pylint: disable=wrong-import-position
+from models.Config import Config # pylint: disable=wrong-import-position
+from core.Bot import RecoNotasBot # pylint: disable=wrong-import-position
 
 # [Código final del archivo original SIN CAMBIOS]
 if __name__ == "__main__":
     try:
         config_instance = Config()
-        bot = RecoNotasBot(config_instance)
+        bot = RecoNotasBot(config_instance, inicio=ARRANQUE)
         bot.run()
     except ValueError as e:
         print(f"❌ Error de configuración: {str(e)}")
@@ -0,0 +1,186 @@
+# ------------------------- BENCHMARK DE LA BOT API -------------------------
+"""
+Mide la reutilización de conexiones y la latencia de SesionTelegram contra un
+servidor local que imita la Bot API
+
+    python -m bench.telegram_http --peticiones 2000 --hilos 16 --conexiones 8
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import telebot  # pylint: disable=wrong-import-position
+from telebot import apihelper  # pylint: disable=wrong-import-position
+
+from services.metrics import Metricas  # pylint: disable=wrong-import-position
+from services.telegram_http import SesionTelegram  # pylint: disable=wrong-import-position
+
+TOKEN = "123456:BENCH"
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    # HTTP/1.1: el servidor mantiene la conexión abierta entre peticiones
+    protocol_version = "HTTP/1.1"
+    # Cabeceras y cuerpo salen en escrituras separadas: sin esto Nagle añade ~40 ms
+    disable_nagle_algorithm = True
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        servidor = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with servidor.lock:
+            servidor.peticiones += 1
+        if servidor.retardo:
+            time.sleep(servidor.retardo)
+        if servidor.fallo == "cortar":
+            # El cliente ve la conexión cerrada sin respuesta: un error de lectura
+            self.close_connection = True
+            return
+        codigo = servidor.fallo if isinstance(servidor.fallo, int) else 200
+        if codigo == 200:
+            respuesta = {"ok": True, "result": {
+                "message_id": servidor.peticiones, "date": int(time.time()),
+                "chat": {"id": 1, "type": "private"}, "text": "ok"}}
+        else:
+            respuesta = {"ok": False, "error_code": codigo, "description": "Bad Gateway"}
+        cuerpo = json.dumps(respuesta).encode()
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    do_GET = do_POST
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class ServidorFalso(ThreadingHTTPServer):
+    """Bot API falsa en 127.0.0.1 que cuenta conexiones aceptadas y peticiones.
+
+    `fallo` puede ser un código HTTP que devolver siempre o "cortar" para
+    cerrar la conexión sin responder.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, retardo: float = 0, fallo=None):
+        super().__init__(("127.0.0.1", 0), _Manejador)
+        self.retardo = retardo
+        self.fallo = fallo
+        self.conexiones = 0
+        self.peticiones = 0
+        self.lock = threading.Lock()
+        self._hilo = None
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.conexiones += 1
+        super().process_request(request, client_address)
+
+    @property
+    def api_url(self) -> str:
+        """Plantilla para apihelper.API_URL."""
+        return f"http://127.0.0.1:{self.server_address[1]}/bot{{0}}/{{1}}"
+
+    def __enter__(self):
+        self._hilo = threading.Thread(target=self.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class ApiLocal:
+    """Dirige telebot al servidor falso (y, si se da, por `sesion`) mientras dura el bloque."""
+
+    _AJUSTES = ("API_URL", "CUSTOM_REQUEST_SENDER", "CONNECT_TIMEOUT", "READ_TIMEOUT")
+
+    def __init__(self, servidor: ServidorFalso, sesion: SesionTelegram = None):
+        self.servidor = servidor
+        self.sesion = sesion
+        self._anteriores = {}
+
+    def __enter__(self):
+        self._anteriores = {nombre: getattr(apihelper, nombre) for nombre in self._AJUSTES}
+        if self.sesion:
+            self.sesion.instalar()
+        apihelper.API_URL = self.servidor.api_url
+        return telebot.TeleBot(TOKEN, threaded=False)
+
+    def __exit__(self, *exc):
+        for nombre, valor in self._anteriores.items():
+            setattr(apihelper, nombre, valor)
+
+
+def _percentil(valores, p):
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1] if len(valores) > 1 \
+        else valores[0]
+
+
+def medir(peticiones: int = 1000, hilos: int = 16, conexiones: int = 8,
+          retardo: float = 0.002, con_sesion: bool = True) -> dict:
+    """Lanza `peticiones` send_message desde `hilos` hilos y resume el resultado.
+
+    Sin `con_sesion` se usan las sesiones por hilo que telebot crea por defecto.
+    """
+    sesion = SesionTelegram(conexiones=conexiones, metricas=Metricas()) if con_sesion else None
+    latencias = []
+
+    with ServidorFalso(retardo=retardo) as servidor, ApiLocal(servidor, sesion) as bot:
+        def enviar(i):
+            inicio = time.perf_counter()
+            bot.send_message(1, f"mensaje {i}")
+            return time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            latencias = list(pool.map(enviar, range(peticiones)))
+        total = time.perf_counter() - inicio
+        creadas = servidor.conexiones
+    if sesion:
+        sesion.cerrar()
+
+    return {
+        "peticiones": peticiones,
+        "conexiones": creadas,
+        "conexiones_por_peticion": creadas / peticiones,
+        "p50_ms": _percentil(latencias, 50) * 1000,
+        "p99_ms": _percentil(latencias, 99) * 1000,
+        "peticiones_por_segundo": peticiones / total,
+    }
+
+
+def main(argv=None):
+    """Punto de entrada del benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark de SesionTelegram contra una Bot API local")
+    parser.add_argument("--peticiones", type=int, default=1000)
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--conexiones", type=int, default=8, help="Tamaño del pool de la sesión")
+    parser.add_argument("--retardo", type=float, default=0.002,
+                        help="Segundos que tarda el servidor en responder")
+    parser.add_argument("--comparar", action="store_true",
+                        help="Mide también las sesiones por defecto de telebot")
+    args = parser.parse_args(argv)
+
+    modos = [("SesionTelegram", True)] + ([("telebot por defecto", False)] if args.comparar else [])
+    for nombre, con_sesion in modos:
+        r = medir(args.peticiones, args.hilos, args.conexiones, args.retardo, con_sesion)
+        print(f"{nombre}: {r['peticiones']} peticiones, {r['conexiones']} conexiones "
+              f"({r['conexiones_por_peticion']:.4f} por petición), "
+              f"p50 {r['p50_ms']:.2f} ms, p99 {r['p99_ms']:.2f} ms, "
+              f"{r['peticiones_por_segundo']:.0f} peticiones/s")
+
+
+if __name__ == "__main__":
+    main()
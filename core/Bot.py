@@ -3,156 +3,598 @@ Comment
 """
 import os
 import sys
-import gettext
+import time
+import base64
 from datetime import datetime, timedelta
 from functools import partial
-from threading import Timer
+from threading import Lock
 import telebot
+from telebot import apihelper
 import pyotp
 
 # # Cambio necesario: Importar las clases desde los nuevos archivos
 from models.Config import Config
 from models.database import SecureDB
 from models.encryption import CifradoManager
-
-
+from services.note_import import parse_notes, FormatoImportacionError, MAX_IMPORT_BYTES
+from services.export import ExportadorUsuario, PASSPHRASE_MIN_LENGTH
+from services.scheduler import Planificador
+from services.audit_archive import ArchivadorAuditoria, AUDIT_ARCHIVE_INTERVAL
+from services.translation import TranslationService, VigilanteLocales, LOCALES_POLL_INTERVAL
+from services.keyboards import Teclados
+from services.attachments import AlmacenAdjuntos, AdjuntoDemasiadoGrande, MAX_ATTACHMENT_BYTES
+from services.tags import IndiceEtiquetas, TIPO_ETIQUETA, TIPO_CARPETA
+from services.lifecycle import CicloVida
+from services.startup import Arranque
+from services.dispatch import (
+    DespachadorOrdenado, usuario_de, PRIORIDAD_ALTA, PRIORIDAD_NORMAL, PRIORIDAD_BAJA
+)
+from services.ratelimit import LimitadorUsuarios
+from services.dedup import UpdatesRecientes, DEDUP_SAVE_INTERVAL
+from services.outbox import BuzonSalida, OUTBOX_POLL_INTERVAL
+from services.telegram_http import SesionTelegram
+from services.user_keys import ClavesUsuario
+from services.deletion_jobs import TrabajosBorrado, DELETION_INTERVAL
+from services.erasure import PurgaUsuarios
+from services.key_migration import RecifradoLegado
+from services.reminder_archive import ArchivadorRecordatorios, REMINDER_ARCHIVE_INTERVAL
+from services.preview_cache import CacheVistasPrevias
+from services.metrics import REGISTRO
+from services.reminders import (
+    recordatorios_perdidos, HEARTBEAT_INTERVAL, HEARTBEAT_KEY, CATCHUP_INTERVAL
+)
+
+
+
+# Segundos sin nuevas ediciones antes de guardar un mensaje editado
+EDIT_DEBOUNCE_SECONDS = 3
+# proxima_ejecucion de un recordatorio único ya enviado y aún sin confirmar
+REMINDER_AWAITING_ACK = 0
+# Segundos de cada petición getUpdates; acota lo que tarda en cortarse la entrada
+POLL_TIMEOUT = 10
+# Pausa máxima cuando getUpdates solo devuelve actualizaciones aún en cola
+REFETCH_WAIT = 1
+# Segundos entre volcados de la auditoría diferida por saturación
+AUDIT_FLUSH_INTERVAL = 5
+# Comandos que escriben datos: nunca se descartan por saturación
+WRITE_COMMANDS = frozenset({
+    'addnote', 'newnote', 'editnote', 'import', 'attach', 'deletenote', 'delnote',
+    'addreminder', 'newreminder', 'deletereminder', 'delreminder', 'clearall', 'setup2fa',
+})
+# Consultas que se descartan primero cuando las colas se llenan
+LOW_PRIORITY_COMMANDS = frozenset({
+    'listnotes', 'mynotes', 'listreminders', 'myreminders', 'tag', 'folder', 'files',
+    'help', 'tutorial', 'menu', 'settings',
+})
+# Fichas del límite por usuario que gasta cada comando (1 si no aparece):
+# los listados descifran todas las notas del usuario
+COMMAND_COSTS = {
+    'listnotes': 5, 'mynotes': 5, 'files': 5, 'import': 5, 'backup': 10,
+    'editnote': 3, 'attach': 3, 'deletenote': 3, 'delnote': 3, 'tag': 3, 'folder': 3,
+    'listreminders': 2, 'myreminders': 2,
+}
+MENU_COSTS = {'list_notes': 5, 'delete_note': 3, 'list_reminders': 2}
 
 # ------------------------- BOT PRINCIPAL -------------------------
 class RecoNotasBot:
     """
     La clase principal para el bot
     """
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, inicio: float = None):
         self.config = config
-        self.bot = telebot.TeleBot(config.api_token)
+        self.arranque = Arranque(inicio)
+        # Sin el pool de telebot: los manejadores corren en DespachadorOrdenado
+        self.bot = telebot.TeleBot(config.api_token, threaded=False)
+        # Una conexión por hilo de manejadores, más polling, planificador y outbox
+        self.http = SesionTelegram(
+            conexiones=config.update_workers + 4,
+            reintentos=config.api_retries,
+            timeout_conexion=config.api_connect_timeout,
+            timeout_lectura=config.api_read_timeout
+        ).instalar()
         self.db = SecureDB.get_instance()
-        self.cifrado = CifradoManager(config.salt, config.clave_maestra)
-        self.active_reminders = {}
-        self._load_translations()
+        # Lo lento (derivar la clave, leer catálogos, cargar recordatorios) se
+        # prepara en segundo plano mientras el bot ya recibe actualizaciones
+        self.cifrado = self.arranque.diferir(
+            "cifrado", CifradoManager, config.salt, config.clave_maestra
+        )
+        self.claves = ClavesUsuario(self.db, self.cifrado)
+        self.exportador = ExportadorUsuario(self.db, self.claves)
+        self.adjuntos = AlmacenAdjuntos(self.db, self.cifrado, self.claves)
+        self.planificador = Planificador()
+        self.trabajos_borrado = TrabajosBorrado(self.db, self.planificador)
+        self.purga = PurgaUsuarios(self.claves, self.adjuntos, self.trabajos_borrado)
+        self.archivo_recordatorios = ArchivadorRecordatorios(self.db, self.trabajos_borrado)
+        self.vistas_previas = CacheVistasPrevias()
+        self.etiquetas = IndiceEtiquetas(self.db, self.cifrado)
+        self.recifrado = RecifradoLegado(
+            self.db, self.claves, self.adjuntos, self.etiquetas, self.trabajos_borrado
+        )
+        self.archivador = ArchivadorAuditoria(self.db, planificador=self.planificador)
+        self.buzon = BuzonSalida(self.db, self.bot)
+        self._pending_edits = {}
+        self._pending_edits_lock = Lock()
+        self.traducciones = self.arranque.diferir(
+            "traducciones", TranslationService,
+            self.db, config.locales_dir, config.supported_langs, config.default_lang
+        )
+        self.teclados = self.arranque.diferir("teclados", self._build_keyboards)
+        self.vigilante_locales = self.arranque.diferir(
+            "vigilante_locales", VigilanteLocales, self.traducciones
+        )
+        # Tras un reinicio reciente, el primer getUpdates confirma lo ya procesado;
+        # Telegram vuelve a entregar lo que quedó en cola
+        self.recientes = UpdatesRecientes(self.db)
+        self.recientes.cargar()
+        self.ciclo = CicloVida()
         self._setup_handlers()
-        self._load_pending_reminders()
+        self._setup_lifecycle()
+        # El latido se lee antes de que _schedule_maintenance lo sobrescriba
+        latido = self.db.leer_estado(HEARTBEAT_KEY)
+        self.arranque.ejecutar("recordatorios", self._load_pending_reminders, latido)
+        self._schedule_maintenance()
+        self.despachador = DespachadorOrdenado(
+            self.bot.process_new_updates,
+            config.update_workers,
+            al_terminar=self._on_update_done,
+            marca_alta=config.update_queue_high_water,
+            limite=config.update_queue_limit,
+            tope=config.update_queue_max,
+            clasificar=self._update_priority,
+            al_descartar=self._on_update_dropped,
+            al_cambiar_presion=self._on_pressure_change
+        )
+        self.limitador = LimitadorUsuarios(config.rate_limit_burst, config.rate_limit_per_minute)
+        self._count_throttled = REGISTRO.contador(
+            "reconotas_updates_limitadas_total", "Actualizaciones rechazadas por el límite por usuario"
+        )
+        REGISTRO.medidor(
+            "reconotas_limitador_usuarios", self.limitador.__len__, "Usuarios con cubeta activa"
+        )
+        self._count_duplicates = REGISTRO.contador(
+            "reconotas_updates_duplicadas_total", "Actualizaciones repetidas ignoradas"
+        )
+        self._get_updates = self.bot.get_updates
+        self.bot.get_updates = self._fetch_updates
+        self.bot.process_new_updates = self._admit_updates
+        self.despachador.iniciar()
+        REGISTRO.medidor(
+            "reconotas_auditoria_diferida", self.db.auditoria_pendiente,
+            "Eventos de auditoría en memoria pendientes de escribir"
+        )
+        REGISTRO.medidor(
+            "reconotas_vistas_previas_bytes", lambda: self.vistas_previas.bytes,
+            "Memoria aproximada de la caché de vistas previas"
+        )
+        REGISTRO.servir()
+        if not config.lazy_startup:
+            self.arranque.esperar()
         self._clear_console()
 
-    def _clear_console(self):
-        """Limpia la consola según el sistema operativo"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+    def _build_keyboards(self):
+        """Construye los teclados en cuanto las traducciones están listas"""
+        teclados = Teclados(
+            self.traducciones, self.config.supported_langs, self.config.default_lang
+        )
+        self.traducciones.al_recargar(teclados.reconstruir)
+        return teclados
+
+    def _fetch_updates(self, offset=None, **kwargs):
+        """getUpdates confirmando solo lo ya procesado.
+
+        telebot avanza last_update_id en cuanto un trabajador procesa cualquier
+        actualización, aunque otras anteriores sigan en cola; el offset sale de
+        UpdatesRecientes para que una parada brusca no pierda lo encolado. A
+        cambio, mientras la más antigua siga en cola, Telegram solo entrega las
+        100 siguientes a ella.
+        """
+        confirmado = self.recientes.confirmado()
+        if confirmado is not None and offset is not None and offset > 0:
+            offset = confirmado + 1
+        return self._get_updates(offset=offset, **kwargs)
+
+    def _admit_updates(self, updates):
+        """Descarta repetidas y aplica el límite por usuario antes de encolar"""
+        if not updates:
+            return
+        confirmado = self.recientes.confirmado()
+        admitted = []
+        duplicates = 0
+        for update in updates:
+            if not self.recientes.nuevo(update.update_id):
+                self._count_duplicates()
+                duplicates += 1
+                continue
+            user_id = usuario_de(update)
+            cost = self._update_cost(update)
+            if cost and not self.limitador.permitir(user_id, cost):
+                self.recientes.terminado(update.update_id)
+                self._count_throttled()
+                self._reply_throttled(update, user_id, cost)
+                continue
+            admitted.append(update)
+        self.despachador.enviar(admitted)
+        if duplicates == len(updates):
+            # Telegram repite lo que sigue en cola: se espera a que los trabajadores
+            # avancen en lugar de repetir getUpdates sin pausa
+            self.recientes.esperar_avance(confirmado, REFETCH_WAIT)
+
+    def _on_update_done(self, update):
+        """Un trabajador terminó una actualización: ya puede confirmarse"""
+        self.recientes.terminado(update.update_id)
+        self.arranque.primera_actualizacion()
+
+    def _on_update_dropped(self, update):
+        """Actualización descartada por saturación: se confirma y se avisa"""
+        self.recientes.terminado(update.update_id)
+        self._reply_busy(update)
+
+    def _is_pending_step(self, message):
+        """Indica si el mensaje responde a un register_next_step_handler pendiente"""
+        return message.chat.id in getattr(self.bot.next_step_backend, 'handlers', {})
+
+    def _command_of(self, message):
+        """Comando (sin '/' ni @bot) o acción del menú de un mensaje, o None"""
+        text = message.text or ''
+        if text.startswith('/'):
+            return text.split()[0][1:].split('@')[0].lower()
+        if self.teclados.listo():
+            return self.teclados.accion_menu(text)
+        return None
+
+    def _update_cost(self, update):
+        """Fichas que gasta una actualización en el límite por usuario"""
+        message = update.message
+        if message is None:
+            return 1
+        if self._is_pending_step(message):
+            # Los pasos de un flujo ya iniciado no se cobran otra vez
+            return 0
+        command = self._command_of(message)
+        return COMMAND_COSTS.get(command) or MENU_COSTS.get(command) or 1
+
+    def _reply_throttled(self, update, user_id, cost):
+        """Avisa al usuario limitado (una vez por chat y tanda)"""
+        wait_seconds = max(1, round(self.limitador.espera(user_id, cost)))
+        if update.callback_query is not None:
+            self.planificador.programar(
+                ("limitado", update.callback_query.id), time.time(),
+                self._answer_throttled, update.callback_query.id, user_id, wait_seconds
+            )
+        elif update.message is not None:
+            self.planificador.programar(
+                ("limitado", update.message.chat.id), time.time(),
+                self._send_throttled, update.message.chat.id, user_id, wait_seconds
+            )
 
-    def _load_translations(self):
-        """Carga las traducciones para multiidioma"""
-        self.translations = {}
-        for lang in self.config.supported_langs:
-            try:
-                self.translations[lang] = gettext.translation(
-                    'reconotas',
-                    localedir=self.config.locales_dir,
-                    languages=[lang],
-                    fallback=True
-                )
-            except FileNotFoundError:
-                self.translations[lang] = gettext.NullTranslations()
+    def _send_throttled(self, chat_id, user_id, wait_seconds):
+        """Envía el aviso de límite alcanzado en el idioma del usuario"""
+        self.bot.send_message(
+            chat_id, self._get_user_texts(user_id)["limitado"].format(segundos=wait_seconds)
+        )
+
+    def _answer_throttled(self, callback_id, user_id, wait_seconds):
+        """Responde a un botón pulsado por un usuario limitado"""
+        self.bot.answer_callback_query(
+            callback_id, self._get_user_texts(user_id)["limitado"].format(segundos=wait_seconds)
+        )
+
+    def _update_priority(self, update):
+        """Clasifica una actualización para el descarte de carga"""
+        if update.callback_query is not None or update.edited_message is not None:
+            return PRIORIDAD_ALTA
+        message = update.message
+        if message is None:
+            return PRIORIDAD_NORMAL
+        # Respuesta a un paso pendiente (p. ej. el texto de la nota que se está creando)
+        if self._is_pending_step(message):
+            return PRIORIDAD_ALTA
+        command = self._command_of(message)
+        if command in WRITE_COMMANDS:
+            return PRIORIDAD_ALTA
+        if command in LOW_PRIORITY_COMMANDS or command in ('list_notes', 'list_reminders'):
+            return PRIORIDAD_BAJA
+        return PRIORIDAD_NORMAL
+
+    def _reply_busy(self, update):
+        """Responde "ocupado" a una actualización descartada (una vez por chat y tanda)"""
+        message = update.message
+        if message is None:
+            return
+        self.planificador.programar(
+            ("ocupado", message.chat.id), time.time(),
+            self._send_busy, message.chat.id, message.from_user.id
+        )
+
+    def _send_busy(self, chat_id, user_id):
+        """Envía el aviso de saturación en el idioma del usuario"""
+        self.bot.send_message(chat_id, self._get_user_texts(user_id)["ocupado"])
+
+    def _on_pressure_change(self, saturado):
+        """Con las colas saturadas, la auditoría sin transacción se escribe por lotes"""
+        self.db.diferir_auditoria(saturado)
+        if not saturado:
+            self.planificador.programar("volcar_auditoria", time.time(), self.db.volcar_auditoria)
+
+    def _flush_audit(self):
+        """Escribe la auditoría diferida antes de cerrar la base de datos"""
+        self.db.diferir_auditoria(False)
+        self.db.volcar_auditoria()
+
+    def _setup_lifecycle(self):
+        """Registra los pasos de la parada ordenada, en el orden en que se ejecutan"""
+        self.ciclo.al_parar(self.bot.stop_polling)
+        self.ciclo.al_drenar("manejadores", self._drain_handlers)
+        self.ciclo.al_drenar("ediciones", self._flush_pending_edits)
+        self.ciclo.al_drenar("planificador", partial(self.planificador.detener, esperar=True))
+        self.ciclo.al_drenar("buzon_salida", self.buzon.enviar_pendientes)
+        self.ciclo.al_drenar("latido", self._heartbeat)
+        self.ciclo.al_drenar("updates_recientes", self.recientes.guardar)
+        self.ciclo.al_drenar("auditoria", self._flush_audit)
+        self.ciclo.al_drenar("base_de_datos", self.db.cerrar)
+        self.ciclo.al_drenar("http", self.http.cerrar)
+
+    def _drain_handlers(self):
+        """Procesa lo encolado durante la mitad del plazo de parada y espera a lo en curso"""
+        # La otra mitad queda para el manejador en curso y los pasos siguientes
+        self.despachador.detener(esperar=True, plazo=self.ciclo.plazo / 2)
+
+    def _flush_pending_edits(self):
+        """Guarda ya las ediciones de notas que esperaban su debounce"""
+        with self._pending_edits_lock:
+            note_ids = list(self._pending_edits)
+        for note_id in note_ids:
+            self.planificador.cancelar(("edicion_nota", note_id))
+            self._apply_pending_edit(note_id)
+
+    def _clear_console(self):
+        """Limpia la consola con una secuencia ANSI, sin lanzar un proceso"""
+        if sys.stdout.isatty():
+            sys.stdout.write("\033[2J\033[H")
+            sys.stdout.flush()
 
     def _get_user_translation(self, user_id):
         """Obtiene la traducción para el idioma del usuario"""
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT lenguaje FROM usuarios WHERE telegram_id = ?", (user_id,))
-        lang = cursor.fetchone()
-        lang = lang[0] if lang else self.config.default_lang
-        return self.translations.get(lang, self.translations[self.config.default_lang]).gettext
-
-    def _get_main_menu(self):
-        """Devuelve el teclado principal del menú"""
-        markup = telebot.types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-        markup.add(
-            '📝 Añadir Nota',
-            '📖 Listar Notas',
-            '🗑 Eliminar Nota',
-            '⏰ Añadir Recordatorio',
-            '🔄 Listar Recordatorios',
-            '❌ Eliminar Recordatorio',
-            '⚙️ Configuración'
-        )
-        return markup
+        return self.traducciones.gettext(self.traducciones.idioma(user_id))
+
+    def _get_user_texts(self, user_id):
+        """Obtiene los textos fijos ya traducidos al idioma del usuario"""
+        return self.traducciones.textos(self.traducciones.idioma(user_id))
 
-    def _load_pending_reminders(self):
-        """Carga recordatorios pendientes al iniciar el bot"""
+    def _get_main_menu(self, user_id=None):
+        """Devuelve el teclado principal del menú en el idioma del usuario"""
+        if user_id is None:
+            return self.teclados.menu_principal(self.config.default_lang)
+        return self.teclados.menu_principal(self.traducciones.idioma(user_id))
+
+    def _load_pending_reminders(self, latido=None):
+        """Carga recordatorios pendientes al iniciar el bot y recupera los perdidos"""
         try:
+            ahora = time.time()
             cursor = self.db.conn.cursor()
             cursor.execute(
-                """SELECT r.id, u.telegram_id, r.texto, r.hora_recordatorio, r.recurrente 
+                """SELECT r.id, u.telegram_id, r.texto, r.hora_recordatorio, r.recurrente,
+                    r.proxima_ejecucion
                 FROM recordatorios r
                 JOIN usuarios u ON r.usuario_id = u.id
-                WHERE r.completado = 0"""
+                WHERE r.completado = 0
+                    AND (r.proxima_ejecucion IS NULL OR r.proxima_ejecucion != ?)""",
+                (REMINDER_AWAITING_ACK,)
             )
             reminders = cursor.fetchall()
 
-            for reminder_id, user_id, text, reminder_time, recurrente in reminders:
-                self._schedule_reminder(user_id, reminder_time, text, reminder_id, recurrente)
+            perdidos = recordatorios_perdidos(
+                [row for row in reminders if not row[5] or row[5] <= ahora],
+                float(latido) if latido else None,
+                ahora
+            )
+            unicos_perdidos = {
+                reminder_id
+                for items in perdidos.values()
+                for reminder_id, _texto, recurrente, _instantes in items if not recurrente
+            }
+
+            for reminder_id, _user, _text, reminder_time, _recurrente, proxima in reminders:
+                if reminder_id in unicos_perdidos:
+                    continue
+                if proxima and proxima > ahora:
+                    self.planificador.programar(
+                        ("recordatorio", reminder_id), proxima, self._fire_reminder, reminder_id
+                    )
+                else:
+                    self._schedule_reminder(reminder_id, reminder_time)
+
+            self._schedule_catch_up(perdidos)
 
         except Exception as e: # pylint: disable=broad-except
             self.config.logger.error(f"Error cargando recordatorios: {str(e)}")
 
-#----------------------------
-    def _schedule_reminder(self, user_id, reminder_time, text, reminder_id=None, recurrente=False):
-        """Programa un recordatorio para enviarse a la hora especificada"""
+    def _schedule_catch_up(self, perdidos):
+        """Reparte en el planificador el envío de los recordatorios perdidos.
+
+        Los recurrentes se resumen en un solo mensaje por usuario; los únicos se
+        envían uno a uno con sus botones porque esperan confirmación.
+        """
+        cuando = time.time()
+        for user_id, items in perdidos.items():
+            recurrentes = [item for item in items if item[2]]
+            if recurrentes:
+                cuando += CATCHUP_INTERVAL
+                self.planificador.programar(
+                    ("recuperacion", user_id), cuando, self._send_missed_summary,
+                    user_id, recurrentes
+                )
+            for reminder_id, _texto, recurrente, instantes in items:
+                if not recurrente:
+                    cuando += CATCHUP_INTERVAL
+                    self.planificador.programar(
+                        ("recordatorio", reminder_id), cuando, self._fire_reminder,
+                        reminder_id, instantes[0]
+                    )
+        if perdidos:
+            self.config.logger.info(
+                "Recuperando recordatorios perdidos de %d usuarios", len(perdidos)
+            )
+
+    def _send_missed_summary(self, user_id, recurrentes):
+        """Envía en un mensaje los recordatorios diarios que no se enviaron"""
         try:
-            now = datetime.now()
-            target_time = datetime.strptime(reminder_time, "%H:%M").time()
-            target_datetime = datetime.combine(now.date(), target_time)
+            _ = self._get_user_translation(user_id)
+            response = _("⏰ Mientras el bot estaba detenido no se enviaron estos recordatorios:")
+            response += "\n\n"
+            for _reminder_id, text, _recurrente, instantes in recurrentes:
+                response += _("• {time} {text} (×{count})").format(
+                    time=instantes[-1].strftime("%H:%M"), text=text, count=len(instantes)
+                ) + "\n"
+            self.bot.send_message(user_id, response)
+        except Exception as e: # pylint: disable=broad-except
+            self.config.logger.error(f"Error en _send_missed_summary: {str(e)}")
 
-            if target_datetime < now:
-                target_datetime += timedelta(days=1)
+    def _note_previews(self, db_user_id, notes):
+        """Comienzo descifrado de cada nota, reutilizando lo visto hace poco"""
+        return self.vistas_previas.obtener(
+            db_user_id, notes, lambda contenido: self.claves.de(db_user_id).descifrar(contenido)
+        )
 
-            delay = (target_datetime - now).total_seconds()
+    def _deliver_outbox(self):
+        """Envía cuanto antes lo recién confirmado en el outbox, fuera del manejador"""
+        self.planificador.programar("entregar_outbox", time.time(), self.buzon.enviar_pendientes)
 
-            if recurrente:
-                t = Timer(delay, self._setup_recurrent_reminder,
-                          args=(user_id, reminder_time, text, reminder_id))
-            else:
-                t = Timer(delay, self._send_reminder, args=(user_id, text, reminder_id))
+    def _heartbeat(self):
+        """Guarda la hora actual para detectar después el tiempo de parada"""
+        self.db.guardar_estado(HEARTBEAT_KEY, int(time.time()))
 
-            t.start()
-            self.active_reminders[(user_id, text)] = t
+    def _check_locales(self):
+        """Recarga los catálogos si cambiaron (espera a que el vigilante esté listo)"""
+        self.vigilante_locales.comprobar()
 
-        except Exception as e:# pylint: disable=broad-except
-            self.config.logger.error(f"Error programando recordatorio: {str(e)}")
+    def _schedule_maintenance(self):
+        """Programa las tareas periódicas de mantenimiento"""
+        self.planificador.cada(
+            "archivo_auditoria", AUDIT_ARCHIVE_INTERVAL, self.archivador.lanzar, primera=60
+        )
+        self.planificador.cada(
+            "recarga_locales", LOCALES_POLL_INTERVAL, self._check_locales
+        )
+        self.planificador.cada("latido", HEARTBEAT_INTERVAL, self._heartbeat, primera=0)
+        self.planificador.cada(
+            "auditoria_diferida", AUDIT_FLUSH_INTERVAL, self.db.volcar_auditoria
+        )
+        self.planificador.cada(
+            "updates_recientes", DEDUP_SAVE_INTERVAL, self.recientes.guardar
+        )
+        # También retoma los borrados que un reinicio dejó a medias
+        self.planificador.cada(
+            "trabajos_borrado", DELETION_INTERVAL, self.trabajos_borrado.reanudar, primera=60
+        )
+        if self.vistas_previas.ttl > 0:
+            self.planificador.cada(
+                "vistas_previas", self.vistas_previas.ttl, self.vistas_previas.purgar
+            )
+        self.planificador.cada(
+            "archivo_recordatorios", REMINDER_ARCHIVE_INTERVAL,
+            self.archivo_recordatorios.ejecutar, primera=300
+        )
+        # Red de seguridad para los reintentos; lo nuevo se envía al confirmarse
+        self.planificador.cada(
+            "buzon_salida", OUTBOX_POLL_INTERVAL, self.buzon.enviar_pendientes, primera=0
+        )
+        # Notas guardadas antes de existir el índice de etiquetas
+        self.planificador.programar(
+            "indexar_etiquetas", time.time() + 30, self.etiquetas.indexar_pendientes
+        )
+        # Lo cifrado con la clave maestra antes de existir las claves por usuario
+        self.planificador.programar("recifrado", time.time() + 60, self.recifrado.iniciar)
+        self.planificador.iniciar()
 
-    def _setup_recurrent_reminder(self, user_id, reminder_time, text, reminder_id=None):
-        """Configura un recordatorio recurrente diario"""
+#----------------------------
+    def _schedule_reminder(self, reminder_id, reminder_time, cuando=None):
+        """Programa la siguiente ejecución de un recordatorio y la guarda en la base de datos"""
         try:
-            #Update: Enviar el recordatorio actual
-            self._send_reminder(user_id, text, reminder_id)
+            if cuando is None:
+                cuando = self._next_run(reminder_time)
+            proxima = int(cuando.timestamp())
+
+            with self.db.transaccion() as cursor:
+                cursor.execute(
+                    "UPDATE recordatorios SET proxima_ejecucion = ? WHERE id = ?",
+                    (proxima, reminder_id)
+                )
+            # Misma clave: reprogramar o posponer sustituye a la entrada anterior
+            self.planificador.programar(
+                ("recordatorio", reminder_id), proxima, self._fire_reminder, reminder_id
+            )
+            return cuando
 
-            #Update: Programar para el siguiente día
-            next_day = datetime.now() + timedelta(days=1)
-            delay = (next_day - datetime.now()).total_seconds()
+        except Exception as e:# pylint: disable=broad-except
+            self.config.logger.error(f"Error programando recordatorio: {str(e)}")
+            return None
 
-            t = Timer(delay, self._setup_recurrent_reminder,
-                      args=(user_id, reminder_time, text, reminder_id))
-            t.start()
-            self.active_reminders[(user_id, text)] = t
+    def _next_run(self, reminder_time):
+        """Próxima vez (hoy o mañana) que toca la hora HH:MM"""
+        now = datetime.now()
+        cuando = datetime.combine(now.date(), datetime.strptime(reminder_time, "%H:%M").time())
+        if cuando <= now:
+            cuando += timedelta(days=1)
+        return cuando
 
-        except Exception as e: # pylint: disable=broad-except
-            self.config.logger.error(f"Error en recordatorio recurrente: {str(e)}")
+    def _fire_reminder(self, reminder_id, perdido=None):
+        """Envía el recordatorio con sus botones y programa la siguiente ejecución
 
-    def _send_reminder(self, user_id, text, reminder_id=None):
-        """Envía el recordatorio al usuario y lo marca como completado"""
+        `perdido` es la hora a la que debió enviarse si se recupera tras una parada.
+        """
         try:
-            _ = self._get_user_translation(user_id)
-            self.bot.send_message(user_id, _("🔔 Recordatorio: {text}").format(text=text))
+            cursor = self.db.conn.cursor()
+            cursor.execute(
+                """SELECT u.telegram_id, r.texto, r.hora_recordatorio, r.recurrente
+                FROM recordatorios r
+                JOIN usuarios u ON r.usuario_id = u.id
+                WHERE r.id = ? AND r.completado = 0""",
+                (reminder_id,)
+            )
+            row = cursor.fetchone()
+            if not row:
+                return
+            user_id, text, reminder_time, recurrente = row
 
-            if reminder_id:
-                cursor = self.db.conn.cursor()
+            _ = self._get_user_translation(user_id)
+            if perdido:
+                reminder_text = _("🔔 Recordatorio atrasado ({time}): {text}").format(
+                    time=perdido.strftime("%d/%m %H:%M"), text=text)
+            else:
+                reminder_text = _("🔔 Recordatorio: {text}").format(text=text)
+            # El envío y el avance del recordatorio se confirman juntos
+            cuando = self._next_run(reminder_time) if recurrente else None
+            with self.db.transaccion() as cursor:
+                self.buzon.encolar(
+                    cursor, user_id, reminder_text,
+                    reply_markup=self.teclados.recordatorio(
+                        self.traducciones.idioma(user_id), reminder_id)
+                )
+                # Uno único sigue pendiente hasta que el usuario pulse "Hecho"
                 cursor.execute(
-                    "UPDATE recordatorios SET completado = 1 WHERE id = ? AND recurrente = 0",
-                    (reminder_id,)
+                    "UPDATE recordatorios SET proxima_ejecucion = ? WHERE id = ?",
+                    (int(cuando.timestamp()) if cuando else REMINDER_AWAITING_ACK, reminder_id)
                 )
-                self.db.conn.commit()
+            if cuando:
+                self.planificador.programar(
+                    ("recordatorio", reminder_id), cuando, self._fire_reminder, reminder_id
+                )
+            self._deliver_outbox()
 
         except Exception as e:# pylint: disable=broad-except
             self.config.logger.error(f"Error enviando recordatorio: {str(e)}")
-        finally:
-            if (user_id, text) in self.active_reminders:
-                del self.active_reminders[(user_id, text)]
+
+    def _owned_reminder(self, reminder_id, user_id):
+        """Devuelve (db_user_id, hora, recurrente) si el recordatorio es del usuario, o None"""
+        cursor = self.db.conn.cursor()
+        cursor.execute(
+            """SELECT u.id, r.hora_recordatorio, r.recurrente FROM recordatorios r
+            JOIN usuarios u ON r.usuario_id = u.id
+            WHERE r.id = ? AND u.telegram_id = ? AND r.completado = 0""",
+            (reminder_id, user_id)
+        )
+        return cursor.fetchone()
 
 #--------------------- FIXED...
 
@@ -163,13 +605,13 @@ class RecoNotasBot:
                 user = message.from_user
                 user_id = user.id
 
-                cursor = self.db.conn.cursor()
-                cursor.execute(
-                    "INSERT OR IGNORE INTO usuarios (telegram_id, lenguaje) VALUES (?, ?)",
-                    (user_id, self.config.default_lang)
-                )
-                self.db.conn.commit()
+                with self.db.transaccion() as cursor:
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO usuarios (telegram_id, lenguaje) VALUES (?, ?)",
+                        (user_id, self.config.default_lang)
+                    )
 
+                cursor = self.db.conn.cursor()
                 cursor.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,))
                 db_user_id = cursor.fetchone()[0]
 
@@ -177,7 +619,7 @@ class RecoNotasBot:
                 cursor.execute("SELECT secret FROM auth_2fa WHERE usuario_id = ? AND activado = 1",
                     (db_user_id,))
                 if cursor.fetchone():
-                    msg = self.bot.reply_to(message, "🔐 Ingresa tu código 2FA:")
+                    msg = self.bot.reply_to(message, self._get_user_texts(user_id)["pedir_2fa"])
                     self.bot.register_next_step_handler(
                         msg, lambda m: self._verify_2fa(m, db_user_id)
                     )
@@ -187,7 +629,189 @@ class RecoNotasBot:
 
             except Exception as e: # pylint: disable=broad-except
                 self.config.logger.error(f"Error en send_welcome: {str(e)}")
-                self.bot.reply_to(message, "❌ Ocurrió un error al procesar tu solicitud")
+                self.bot.reply_to(
+                    message, self._get_user_texts(message.from_user.id)["error_solicitud"]
+                )
+
+        @self.bot.message_handler(commands=['import'])
+        def import_notes(message):
+            try:
+                _ = self._get_user_translation(message.from_user.id)
+                msg = self.bot.reply_to(
+                    message,
+                    _("📥 Envíame un archivo .txt, .md o .json con tus notas.\n"
+                      "Separa las notas con una línea en blanco o con '---'."),
+                    reply_markup=telebot.types.ReplyKeyboardRemove()
+                )
+                self.bot.register_next_step_handler(msg, self._process_import_step)
+            except Exception as e: # pylint: disable=broad-except
+                self.config.logger.error(f"Error en import_notes: {str(e)}")
+                self.bot.reply_to(
+                    message,
+                    self._get_user_texts(message.from_user.id)["error_solicitud"],
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+
+        @self.bot.message_handler(commands=['editnote'])
+        def edit_note(message):
+            try:
+                user_id = message.from_user.id
+                _ = self._get_user_translation(user_id)
+
+                cursor = self.db.conn.cursor()
+                cursor.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,))
+                db_user_id = cursor.fetchone()[0]
+
+                cursor.execute(
+                    "SELECT id, contenido_cifrado FROM notas WHERE usuario_id = ?",
+                    (db_user_id,)
+                )
+                notes = cursor.fetchall()
+
+                if not notes:
+                    self.bot.reply_to(
+                        message,
+                        _("📭 No tienes notas para editar"),
+                        reply_markup=self._get_main_menu(message.from_user.id)
+                    )
+                    return
+
+                markup = telebot.types.ReplyKeyboardMarkup(one_time_keyboard=True)
+                previews = self._note_previews(db_user_id, notes)
+                for note_id, encrypted_note in notes:
+                    decrypted_note = previews[note_id]
+                    short_note = (
+                        decrypted_note[:20] + '...') if len(decrypted_note) > 20 else decrypted_note
+                    markup.add(f"{note_id}: {short_note}")
+
+                msg = self.bot.reply_to(
+                    message,
+                    _("✏️ Selecciona la nota que deseas editar:"),
+                    reply_markup=markup
+                )
+                self.bot.register_next_step_handler(msg, self._process_edit_note_select_step)
+            except Exception as e: # pylint: disable=broad-except
+                self.config.logger.error(f"Error en edit_note: {str(e)}")
+                self.bot.reply_to(
+                    message,
+                    self._get_user_texts(message.from_user.id)["error_solicitud"],
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+
+        @self.bot.edited_message_handler(func=lambda message: True)
+        def handle_edited_message(message):
+            try:
+                cursor = self.db.conn.cursor()
+                cursor.execute(
+                    """SELECT n.id FROM notas n
+                    JOIN usuarios u ON n.usuario_id = u.id
+                    WHERE u.telegram_id = ? AND n.mensaje_id = ?""",
+                    (message.from_user.id, message.message_id)
+                )
+                row = cursor.fetchone()
+                if row:
+                    self._queue_note_edit(row[0], message)
+            except Exception as e: # pylint: disable=broad-except
+                self.config.logger.error(f"Error en handle_edited_message: {str(e)}")
+
+        @self.bot.message_handler(commands=['backup'])
+        def backup(message):
+            try:
+                _ = self._get_user_translation(message.from_user.id)
+                msg = self.bot.reply_to(
+                    message,
+                    _("🔐 Envíame una contraseña (mínimo {min} caracteres) para cifrar el respaldo, "
+                      "o /skip para recibirlo sin cifrar").format(min=PASSPHRASE_MIN_LENGTH),
+                    reply_markup=telebot.types.ReplyKeyboardRemove()
+                )
+                self.bot.register_next_step_handler(msg, self._process_backup_step)
+            except Exception as e: # pylint: disable=broad-except
+                self.config.logger.error(f"Error en backup: {str(e)}")
+                self.bot.reply_to(
+                    message,
+                    self._get_user_texts(message.from_user.id)["error_solicitud"],
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+
+        @self.bot.callback_query_handler(
+                func=lambda call: call.data.startswith(('snooze_', 'done_'))
+        )
+        def handle_reminder_action(call):
+            _ = self._get_user_translation(call.from_user.id)
+            try:
+                accion, reminder_id, *minutos = call.data.split('_')
+                reminder_id = int(reminder_id)
+                reminder = self._owned_reminder(reminder_id, call.from_user.id)
+                if not reminder:
+                    self.bot.answer_callback_query(call.id)
+                    self.bot.edit_message_reply_markup(
+                        call.message.chat.id, call.message.message_id, reply_markup=None
+                    )
+                    return
+                db_user_id, reminder_time, recurrente = reminder
+
+                if accion == 'snooze':
+                    cuando = self._schedule_reminder(
+                        reminder_id, reminder_time,
+                        cuando=datetime.now() + timedelta(minutes=int(minutos[0]))
+                    )
+                    status = _("⏰ Pospuesto hasta las {time}").format(
+                        time=cuando.strftime("%H:%M"))
+                else:
+                    if not recurrente:
+                        with self.db.transaccion() as cursor:
+                            cursor.execute(
+                                """UPDATE recordatorios
+                                SET completado = 1, proxima_ejecucion = NULL,
+                                    fecha_completado = CURRENT_TIMESTAMP
+                                WHERE id = ?""",
+                                (reminder_id,)
+                            )
+                        self.planificador.cancelar(("recordatorio", reminder_id))
+                    status = _("✅ Recordatorio completado")
+
+                self.db.registrar_auditoria(
+                    db_user_id,
+                    "RECORDATORIO_POSPUESTO" if accion == 'snooze' else "RECORDATORIO_COMPLETADO",
+                    {"reminder_id": reminder_id, "minutos": int(minutos[0]) if minutos else 0}
+                )
+                self.bot.answer_callback_query(call.id, status)
+                self.bot.edit_message_text(
+                    f"{call.message.text}\n\n{status}",
+                    chat_id=call.message.chat.id,
+                    message_id=call.message.message_id
+                )
+            except Exception as e: # pylint: disable=broad-except
+                self.config.logger.error(f"Error en handle_reminder_action: {str(e)}")
+                self.bot.answer_callback_query(
+                    call.id,
+                    self._get_user_texts(call.from_user.id)["error_solicitud"],
+                    show_alert=True
+                )
+
+        @self.bot.message_handler(commands=['tag'])
+        def tag_filter(message):
+            self._list_notes_by_tag(message, TIPO_ETIQUETA)
+
+        @self.bot.message_handler(commands=['folder'])
+        def folder_filter(message):
+            self._list_notes_by_tag(message, TIPO_CARPETA)
+
+        @self.bot.message_handler(commands=['attach'])
+        def attach(message):
+            _ = self._get_user_translation(message.from_user.id)
+            self._ask_note_selection(
+                message, _("📎 Selecciona la nota a la que quieres adjuntar un archivo:"),
+                self._process_attach_select_step
+            )
+
+        @self.bot.message_handler(commands=['files'])
+        def files(message):
+            _ = self._get_user_translation(message.from_user.id)
+            self._ask_note_selection(
+                message, _("📂 Selecciona la nota cuyos adjuntos quieres recibir:"),
+                self._process_files_step
+            )
 
     def _verify_2fa(self, message, db_user_id):
         """Verifica el código 2FA del usuario"""
@@ -200,24 +824,23 @@ class RecoNotasBot:
             if pyotp.TOTP(secret).verify(user_code):
                 self._show_main_menu(message, db_user_id)
             else:
-                self.bot.reply_to(message, "❌ Código inválido. Intenta nuevamente o usa /start")
+                self.bot.reply_to(
+                    message, self._get_user_texts(message.from_user.id)["error_2fa_invalido"]
+                )
         except Exception as e: # pylint: disable=broad-except
             self.config.logger.error(f"Error en verify_2fa: {str(e)}")
-            self.bot.reply_to(message, "❌ Error en autenticación")
+            self.bot.reply_to(
+                message, self._get_user_texts(message.from_user.id)["error_autenticacion"]
+            )
 #------------------Menu con los botones--------------
     def _show_main_menu(self, message, db_user_id):
         """Muestra el menú principal al usuario"""
-        _ = self._get_user_translation(message.from_user.id)
-        welcome_msg = _(
-            "🔐 *Bienvenido a RecoNotas v2.5_beta*\n\n"
-            "📝 **Selecciona una opción del menú:**\n"
-            "O usa los comandos tradicionales si lo prefieres"
-        )
+        welcome_msg = self._get_user_texts(message.from_user.id)["bienvenida"]
         self.bot.reply_to(
             message,
             welcome_msg,
             parse_mode="Markdown",
-            reply_markup=self._get_main_menu()
+            reply_markup=self._get_main_menu(message.from_user.id)
         )
 
         # Registrar auditoría
@@ -236,62 +859,62 @@ class RecoNotasBot:
         def handle_menu_buttons(message):
             try:
                 text = message.text.lower()
-                _ = self._get_user_translation(message.from_user.id)
-
-                if 'añadir nota' in text or 'addnote' in text:
+                acciones = {
+                    'add_note': add_note,
+                    'list_notes': list_notes,
+                    'delete_note': delete_note,
+                    'add_reminder': add_reminder,
+                    'list_reminders': list_reminders,
+                    'delete_reminder': delete_reminder,
+                    'settings': show_settings
+                }
+                accion = self.teclados.accion_menu(text)
+
+                if accion:
+                    acciones[accion](message)
+                elif 'addnote' in text:
                     add_note(message)
-                elif 'listar notas' in text or 'listnotes' in text:
+                elif 'listnotes' in text:
                     list_notes(message)
-                elif 'eliminar nota' in text or 'deletenote' in text:
+                elif 'deletenote' in text:
                     delete_note(message)
-                elif 'añadir recordatorio' in text or 'addreminder' in text:
+                elif 'addreminder' in text:
                     add_reminder(message)
-                elif 'listar recordatorios' in text or 'listreminders' in text:
+                elif 'listreminders' in text:
                     list_reminders(message)
-                elif 'configuración' in text or 'settings' in text:
+                elif 'settings' in text:
                     show_settings(message)
                 else:
                     self.bot.reply_to(
                         message,
-                        _("No reconozco ese comando. Usa el menú o escribe /help"),
-                        reply_markup=self._get_main_menu()
+                        self._get_user_texts(message.from_user.id)["comando_desconocido"],
+                        reply_markup=self._get_main_menu(message.from_user.id)
                     )
 
             except Exception as e: # pylint: disable=broad-except
                 self.config.logger.error(f"Error en handle_menu_buttons: {str(e)}")
                 self.bot.reply_to(
                     message,
-                    "❌ Ocurrió un error al procesar tu solicitud",
-                    reply_markup=self._get_main_menu()
+                    self._get_user_texts(message.from_user.id)["error_solicitud"],
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
 
         @self.bot.message_handler(commands=['tutorial', 'help'])
         def show_tutorial(message):
             try:
-                _ = self._get_user_translation(message.from_user.id)
-                tutorial_markdown = _(
-                    "📚 *Tutorial de RecoNotas*\n\n"
-                    "1. *Notas*:\n"
-                    "   - /newnote [texto] - Crea una nota\n"
-                    "   - /mynotes - Lista tus notas\n\n"
-                    "2. *Recordatorios*:\n"
-                    "   - /newreminder [texto] [HH:MM] --recurrente\n"
-                    "   - /myreminders - Lista recordatorios\n\n"
-                    "3. *Seguridad*:\n"
-                    "   - /setup2fa - Configura autenticación\n"
-                    "   - /settings - Cambia preferencias\n\n"
-                    "ℹ️ Usa el menú de botones para acceso rápido!"
-                )
+                tutorial_markdown = self._get_user_texts(message.from_user.id)["tutorial"]
 
                 self.bot.reply_to(
                     message,
                     tutorial_markdown,
                     parse_mode="Markdown",
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
             except Exception as e: # pylint: disable=broad-except
                 self.config.logger.error(f"Error en show_tutorial: {str(e)}")
-                self.bot.reply_to(message, "❌ Error al mostrar el tutorial")
+                self.bot.reply_to(
+                    message, self._get_user_texts(message.from_user.id)["error_tutorial"]
+                )
 
         @self.bot.message_handler(commands=['setup2fa'])
         def setup_2fa(message):
@@ -307,12 +930,12 @@ class RecoNotasBot:
                 provisioning_uri = totp.provisioning_uri(name=str(user_id), issuer_name="RecoNotas")
 
                 # Guardar en DB
-                cursor.execute(
-                    """INSERT OR REPLACE INTO auth_2fa (usuario_id, secret, activado) 
-                    VALUES (?, ?, 1)""",
-                    (db_user_id, secret)
-                )
-                self.db.conn.commit()
+                with self.db.transaccion() as cursor:
+                    cursor.execute(
+                        """INSERT OR REPLACE INTO auth_2fa (usuario_id, secret, activado)
+                        VALUES (?, ?, 1)""",
+                        (db_user_id, secret)
+                    )
 
                 self.bot.reply_to(
                     message,
@@ -320,11 +943,13 @@ class RecoNotasBot:
                     f"URI: {provisioning_uri}\n"
                     f"O usa este código manual: {secret}\n\n"
                     "Guarda este código en un lugar seguro!",
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
             except Exception as e: # pylint: disable=broad-except
                 self.config.logger.error(f"Error en setup_2fa: {str(e)}")
-                self.bot.reply_to(message, "❌ Error al configurar 2FA")
+                self.bot.reply_to(
+                    message, self._get_user_texts(message.from_user.id)["error_configurar_2fa"]
+                )
 
         @self.bot.message_handler(commands=['settings'])
         def show_settings(message):
@@ -336,12 +961,7 @@ class RecoNotasBot:
                 cursor.execute("SELECT lenguaje FROM usuarios WHERE telegram_id = ?", (user_id,))
                 current_lang = cursor.fetchone()[0] or self.config.default_lang
 
-                markup = telebot.types.InlineKeyboardMarkup()
-                markup.row(
-                    telebot.types.InlineKeyboardButton("English", callback_data="setlang_en"),
-                    telebot.types.InlineKeyboardButton("Español", callback_data="setlang_es"),
-                    telebot.types.InlineKeyboardButton("Português", callback_data="setlang_pt")
-                )
+                markup = self.teclados.selector_idioma()
 
                 self.bot.reply_to(
                     message,
@@ -352,22 +972,24 @@ class RecoNotasBot:
                 )
             except Exception as e: # pylint: disable=broad-except
                 self.config.logger.error(f"Error en show_settings: {str(e)}")
-                self.bot.reply_to(message, "❌ Error al cargar configuración")
+                self.bot.reply_to(
+                    message, self._get_user_texts(message.from_user.id)["error_configuracion"]
+                )
 
         @self.bot.callback_query_handler(func=lambda call: call.data.startswith('setlang_'))
         def set_language(call):
             try:
                 lang = call.data.split('_')[1]
                 user_id = call.from_user.id
-                _ = self.translations.get(lang, self.translations[self.config.default_lang]).gettext
+                _ = self.traducciones.gettext(lang)
 
                 if lang in self.config.supported_langs:
-                    cursor = self.db.conn.cursor()
-                    cursor.execute(
-                        "UPDATE usuarios SET lenguaje = ? WHERE telegram_id = ?",
-                        (lang, user_id)
-                    )
-                    self.db.conn.commit()
+                    with self.db.transaccion() as cursor:
+                        cursor.execute(
+                            "UPDATE usuarios SET lenguaje = ? WHERE telegram_id = ?",
+                            (lang, user_id)
+                        )
+                    self.traducciones.fijar_idioma(user_id, lang)
 
                     self.bot.answer_callback_query(
                         call.id,
@@ -391,7 +1013,7 @@ class RecoNotasBot:
                 self.config.logger.error(f"Error en set_language: {str(e)}")
                 self.bot.answer_callback_query(
                     call.id,
-                    "❌ Error al cambiar idioma",
+                    self._get_user_texts(call.from_user.id)["error_idioma"],
                     show_alert=True
                 )
 
@@ -410,7 +1032,7 @@ class RecoNotasBot:
                 self.bot.reply_to(
                     message,
                     _("❌ Ocurrió un error al procesar tu nota"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
 
         @self.bot.message_handler(commands=['listnotes', 'mynotes'])
@@ -433,13 +1055,14 @@ class RecoNotasBot:
                     self.bot.reply_to(
                         message,
                         _("📭 No tienes ninguna nota guardada"),
-                        reply_markup=self._get_main_menu()
+                        reply_markup=self._get_main_menu(message.from_user.id)
                     )
                     return
 
                 response = _("📖 *Tus notas:*\n\n")
+                previews = self._note_previews(db_user_id, notes)
                 for note_id, encrypted_note, fecha in notes:
-                    decrypted_note = self.cifrado.descifrar(encrypted_note)
+                    decrypted_note = previews[note_id]
                     short_note = (
                         decrypted_note[:50] + '...') if len(decrypted_note) > 50 else decrypted_note
                     response += _("🆔 {id}\n📅 {date}\n📝 {note}\n\n").format(
@@ -449,7 +1072,7 @@ class RecoNotasBot:
                     message,
                     response,
                     parse_mode="Markdown",
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
 
             except Exception as e: # pylint: disable=broad-except
@@ -457,7 +1080,7 @@ class RecoNotasBot:
                 self.bot.reply_to(
                     message,
                     _("❌ Error al listar las notas"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
 
         @self.bot.message_handler(commands=['deletenote', 'delnote'])
@@ -480,14 +1103,15 @@ class RecoNotasBot:
                     self.bot.reply_to(
                         message,
                         _("📭 No tienes notas para eliminar"),
-                        reply_markup=self._get_main_menu()
+                        reply_markup=self._get_main_menu(message.from_user.id)
                     )
                     return
 
                 # Crear teclado con las notas disponibles
                 markup = telebot.types.ReplyKeyboardMarkup(one_time_keyboard=True)
+                previews = self._note_previews(db_user_id, notes)
                 for note_id, encrypted_note in notes:
-                    decrypted_note = self.cifrado.descifrar(encrypted_note)
+                    decrypted_note = previews[note_id]
                     short_note = (
                         decrypted_note[:20] + '...') if len(decrypted_note) > 20 else decrypted_note
                     markup.add(f"{note_id}: {short_note}")
@@ -504,7 +1128,7 @@ class RecoNotasBot:
                 self.bot.reply_to(
                     message,
                     _("❌ Error al listar notas para eliminar"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
 
         @self.bot.message_handler(commands=['addreminder', 'newreminder'])
@@ -540,7 +1164,7 @@ class RecoNotasBot:
                 self.bot.reply_to(
                     message,
                     _("❌ Ocurrió un error al crear el recordatorio"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
 
         @self.bot.message_handler(commands=['listreminders', 'myreminders'])
@@ -566,7 +1190,7 @@ class RecoNotasBot:
                     self.bot.reply_to(
                         message,
                         _("⏳ No tienes recordatorios pendientes"),
-                        reply_markup=self._get_main_menu()
+                        reply_markup=self._get_main_menu(message.from_user.id)
                     )
                     return
 
@@ -580,7 +1204,7 @@ class RecoNotasBot:
                     message,
                     response,
                     parse_mode="Markdown",
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
 
             except Exception as e: # pylint: disable=broad-except
@@ -588,7 +1212,7 @@ class RecoNotasBot:
                 self.bot.reply_to(
                     message,
                     _("❌ Error al listar los recordatorios"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
         @self.bot.message_handler(commands=['deletereminder', 'delreminder'])
         def delete_reminder(message):
@@ -612,7 +1236,7 @@ class RecoNotasBot:
                     self.bot.reply_to(
                         message,
                         _("⏳ No tienes recordatorios pendientes para eliminar"),
-                        reply_markup=self._get_main_menu()
+                        reply_markup=self._get_main_menu(message.from_user.id)
                     )
                     return
 
@@ -632,7 +1256,7 @@ class RecoNotasBot:
                 self.bot.reply_to(
                     message,
                     _("❌ Error al listar recordatorios para eliminar"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
 
         @self.bot.message_handler(commands=['clearall'])
@@ -642,13 +1266,7 @@ class RecoNotasBot:
                 _ = self._get_user_translation(user_id)
 
                 #Update: Confirmación antes de eliminar
-                markup = telebot.types.InlineKeyboardMarkup()
-                markup.row(
-                    telebot.types.InlineKeyboardButton(
-                        _("Sí, eliminar todo"), callback_data="confirm_clear"),
-                    telebot.types.InlineKeyboardButton(
-                        _("Cancelar"), callback_data="cancel_clear")
-                )
+                markup = self.teclados.confirmar_borrado(self.traducciones.idioma(user_id))
 
                 self.bot.reply_to(
                     message,
@@ -669,25 +1287,36 @@ class RecoNotasBot:
 
                 if call.data == 'confirm_clear':
                     user_id = call.from_user.id
-                    cursor = self.db.conn.cursor()
-                    cursor.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,))
-                    db_user_id = cursor.fetchone()[0]
-
-                    # Registrar consentimiento de eliminación
-                    self.db.registrar_auditoria(
-                        db_user_id,
-                        "GDPR_DELETE_REQUEST",
-                        {"ip": "Telegram", "user_agent": "Telegram"}
-                    )
-
-                    # Eliminar todos los datos
-                    cursor.execute("DELETE FROM notas WHERE usuario_id = ?", (db_user_id,))
-                    cursor.execute("DELETE FROM recordatorios WHERE usuario_id = ?", (db_user_id,))
-                    cursor.execute("DELETE FROM auth_2fa WHERE usuario_id = ?", (db_user_id,))
-                    cursor.execute("DELETE FROM auditoria WHERE usuario_id = ?", (db_user_id,))
-                    cursor.execute("DELETE FROM usuarios WHERE id = ?", (db_user_id,))
-
-                    self.db.conn.commit()
+                    with self.db.transaccion() as cursor:
+                        cursor.execute(
+                            "SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,)
+                        )
+                        db_user_id = cursor.fetchone()[0]
+
+                        # Registrar consentimiento de eliminación
+                        self.db.registrar_auditoria(
+                            db_user_id,
+                            "GDPR_DELETE_REQUEST",
+                            {"ip": "Telegram", "user_agent": "Telegram"},
+                            cursor=cursor
+                        )
+
+                        cursor.execute(
+                            "SELECT id FROM recordatorios WHERE usuario_id = ?", (db_user_id,)
+                        )
+                        reminder_ids = [row[0] for row in cursor.fetchall()]
+
+                        # Sin su clave, notas y adjuntos ya son ilegibles; las filas
+                        # se eliminan después por lotes
+                        legacy_files = self.purga.borrar(cursor, db_user_id)
+                        self.buzon.descartar_chat(cursor, user_id)
+
+                    self.adjuntos.borrar_sin_uso(legacy_files)
+                    for reminder_id in reminder_ids:
+                        self.planificador.cancelar(("recordatorio", reminder_id))
+                    self.traducciones.olvidar(user_id)
+                    self.vistas_previas.invalidar(db_user_id)
+                    self.trabajos_borrado.lanzar()
 
                     self.bot.edit_message_text(
                         chat_id=call.message.chat.id,
@@ -701,7 +1330,6 @@ class RecoNotasBot:
                         text=_("✅ Operación cancelada. Tus datos están seguros.")
                     )
             except Exception as e: # pylint: disable=broad-except
-                self.db.conn.rollback()
                 self.config.logger.error(f"Error en handle_clear_confirmation: {str(e)}")
                 self.bot.answer_callback_query(
                     call.id,
@@ -721,7 +1349,7 @@ class RecoNotasBot:
                 self.bot.reply_to(
                     message,
                     _("❌ El texto de la nota no puede estar vacío"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
                 return
 
@@ -729,39 +1357,567 @@ class RecoNotasBot:
                 self.bot.reply_to(
                     message,
                     _("❌ La nota es demasiado larga (máximo 2000 caracteres)"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+                return
+
+            db_user_id = self.db.conn.execute(
+                "SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,)
+            ).fetchone()[0]
+            encrypted_note = self.claves.de(db_user_id).cifrar(note_text)
+
+            # La nota, sus etiquetas y la confirmación se confirman juntas
+            with self.db.transaccion() as cursor:
+                cursor.execute(
+                    "INSERT INTO notas (usuario_id, contenido_cifrado, mensaje_id) VALUES (?, ?, ?)",
+                    (db_user_id, encrypted_note, message.message_id)
+                )
+                self.etiquetas.indexar(cursor, db_user_id, cursor.lastrowid, note_text)
+                self.buzon.encolar(
+                    cursor, message.chat.id, _("✅ Nota guardada correctamente"),
+                    reply_markup=self._get_main_menu(message.from_user.id),
+                    responder_a=message.message_id
+                )
+            self.vistas_previas.invalidar(db_user_id)
+            self._deliver_outbox()
+
+            self.db.registrar_auditoria(
+                db_user_id,
+                "NOTA_CREADA",
+                {"tamaño": len(note_text)}
+            )
+        except Exception as e: # pylint: disable=broad-except
+            self.config.logger.error(f"Error en _process_note_step: {str(e)}")
+            self.bot.reply_to(
+                message,
+                _("❌ Error al guardar la nota"),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+
+    def _process_import_step(self, message):
+        """Importa en bloque las notas del archivo recibido"""
+        _ = self._get_user_translation(message.from_user.id)
+        try:
+            document = getattr(message, 'document', None)
+            if not document:
+                self.bot.reply_to(
+                    message,
+                    _("❌ Debes enviar un archivo .txt, .md o .json"),
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+                return
+
+            if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+                self.bot.reply_to(
+                    message,
+                    _("❌ El archivo es demasiado grande (máximo 1 MB)"),
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+                return
+
+            file_info = self.bot.get_file(document.file_id)
+            data = self.bot.download_file(file_info.file_path)
+            notes, skipped = parse_notes(document.file_name, data)
+
+            if not notes:
+                self.bot.reply_to(
+                    message,
+                    _("📭 No encontré notas en el archivo"),
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+                return
+
+            db_user_id = self.db.conn.execute(
+                "SELECT id FROM usuarios WHERE telegram_id = ?", (message.from_user.id,)
+            ).fetchone()[0]
+            # Se cifra todo antes de abrir la transacción para no retener el bloqueo
+            encrypted_notes = self.claves.de(db_user_id).cifrar_lote(notes)
+
+            with self.db.transaccion() as cursor:
+                # Dentro de transaccion() nadie más inserta: las nuevas son las de id mayor
+                last_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM notas").fetchone()[0]
+                cursor.executemany(
+                    "INSERT INTO notas (usuario_id, contenido_cifrado) VALUES (?, ?)",
+                    [(db_user_id, encrypted) for encrypted in encrypted_notes]
+                )
+                cursor.execute(
+                    "SELECT id FROM notas WHERE usuario_id = ? AND id > ? ORDER BY id",
+                    (db_user_id, last_id)
+                )
+                new_ids = [row[0] for row in cursor.fetchall()]
+                self.etiquetas.indexar_nuevas(cursor, db_user_id, list(zip(new_ids, notes)))
+                self.db.registrar_auditoria(
+                    db_user_id,
+                    "NOTAS_IMPORTADAS",
+                    {
+                        "cantidad": len(notes),
+                        "omitidas": skipped,
+                        "archivo_bytes": len(data),
+                        "tamaño_total": sum(len(note) for note in notes)
+                    },
+                    cursor=cursor
+                )
+            self.vistas_previas.invalidar(db_user_id)
+
+            response = _("✅ {count} notas importadas correctamente").format(count=len(notes))
+            if skipped:
+                response += "\n" + _(
+                    "⚠️ {skipped} notas omitidas (más de 2000 caracteres o límite alcanzado)"
+                ).format(skipped=skipped)
+            self.bot.reply_to(message, response, reply_markup=self._get_main_menu(message.from_user.id))
+
+        except FormatoImportacionError as e:
+            self.bot.reply_to(
+                message,
+                _("❌ No pude leer el archivo: {error}").format(error=str(e)),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+        except Exception as e: # pylint: disable=broad-except
+            self.config.logger.error(f"Error en _process_import_step: {str(e)}")
+            self.bot.reply_to(
+                message,
+                _("❌ Error al importar las notas"),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+
+    def _process_edit_note_select_step(self, message):
+        """Procesa la selección de la nota a editar y pide el nuevo texto"""
+        _ = self._get_user_translation(message.from_user.id)
+        try:
+            note_id = int(message.text.split(":")[0])
+            msg = self.bot.reply_to(
+                message,
+                _("✏️ Envíame el nuevo texto de la nota {id}:").format(id=note_id),
+                reply_markup=telebot.types.ReplyKeyboardRemove()
+            )
+            self.bot.register_next_step_handler(
+                msg, lambda m: self._process_edit_note_text_step(m, note_id)
+            )
+        except (ValueError, AttributeError):
+            self.bot.reply_to(
+                message,
+                _("❌ Formato de selección inválido"),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+
+    def _process_edit_note_text_step(self, message, note_id):
+        """Guarda el nuevo texto de una nota"""
+        _ = self._get_user_translation(message.from_user.id)
+        try:
+            if not self._validate_note_text(message):
+                return
+
+            if self._update_note(message.from_user.id, note_id, message.text):
+                response = _("✅ Nota {id} actualizada correctamente").format(id=note_id)
+            else:
+                response = _("❌ La nota no existe o no tienes permisos para editarla")
+            self.bot.reply_to(
+                message, response, reply_markup=self._get_main_menu(message.from_user.id)
+            )
+        except Exception as e: # pylint: disable=broad-except
+            self.config.logger.error(f"Error en _process_edit_note_text_step: {str(e)}")
+            self.bot.reply_to(
+                message,
+                _("❌ Error al editar la nota"),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+
+    def _validate_note_text(self, message):
+        """Comprueba que el texto de una nota no esté vacío ni sea demasiado largo"""
+        _ = self._get_user_translation(message.from_user.id)
+        note_text = message.text
+        if not note_text or len(note_text.strip()) == 0:
+            error = _("❌ El texto de la nota no puede estar vacío")
+        elif len(note_text) > 2000:
+            error = _("❌ La nota es demasiado larga (máximo 2000 caracteres)")
+        else:
+            return True
+        self.bot.send_message(
+            message.chat.id, error, reply_markup=self._get_main_menu(message.from_user.id)
+        )
+        return False
+
+    def _update_note(self, user_id, note_id, note_text):
+        """Vuelve a cifrar una nota y la actualiza en su sitio, en una sola transacción.
+
+        La versión anterior pasa a notas_historial si NOTE_HISTORY_LIMIT > 0.
+        Devuelve False si la nota no existe o no pertenece al usuario.
+        """
+        db_user_id = self.db.conn.execute(
+            "SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,)
+        ).fetchone()[0]
+        encrypted_note = self.claves.de(db_user_id).cifrar(note_text)
+        history_limit = self.config.note_history_limit
+
+        with self.db.transaccion() as cursor:
+            cursor.execute(
+                "SELECT contenido_cifrado, legado FROM notas WHERE id = ? AND usuario_id = ?",
+                (note_id, db_user_id)
+            )
+            row = cursor.fetchone()
+            if not row:
+                return False
+
+            if history_limit > 0:
+                # El token Fernet se guarda decodificado: un 25 % menos que en base64.
+                # Si aún iba con la clave maestra, la versión archivada sigue marcada
+                cursor.execute(
+                    "INSERT INTO notas_historial (nota_id, contenido_cifrado, legado) VALUES (?, ?, ?)",
+                    (note_id, base64.urlsafe_b64decode(row[0]), row[1])
+                )
+                cursor.execute(
+                    """DELETE FROM notas_historial WHERE nota_id = ? AND id NOT IN (
+                        SELECT id FROM notas_historial WHERE nota_id = ?
+                        ORDER BY id DESC LIMIT ?)""",
+                    (note_id, note_id, history_limit)
+                )
+
+            cursor.execute(
+                """UPDATE notas SET contenido_cifrado = ?, legado = 0,
+                    fecha_modificacion = CURRENT_TIMESTAMP
+                WHERE id = ?""",
+                (encrypted_note, note_id)
+            )
+            self.etiquetas.indexar(cursor, db_user_id, note_id, note_text)
+            self.db.registrar_auditoria(
+                db_user_id,
+                "NOTA_EDITADA",
+                {"nota_id": note_id, "tamaño": len(note_text)},
+                cursor=cursor
+            )
+        self.vistas_previas.invalidar(db_user_id)
+        return True
+
+    def _queue_note_edit(self, note_id, message):
+        """Agrupa las ediciones rápidas de un mensaje: solo se guarda la última"""
+        with self._pending_edits_lock:
+            self._pending_edits[note_id] = message
+        self.planificador.programar(
+            ("edicion_nota", note_id),
+            time.time() + EDIT_DEBOUNCE_SECONDS,
+            self._apply_pending_edit,
+            note_id
+        )
+
+    def _apply_pending_edit(self, note_id):
+        """Guarda la última edición recibida de una nota"""
+        with self._pending_edits_lock:
+            message = self._pending_edits.pop(note_id, None)
+        if message is None:
+            return
+
+        try:
+            _ = self._get_user_translation(message.from_user.id)
+            if not self._validate_note_text(message):
+                return
+            if self._update_note(message.from_user.id, note_id, message.text):
+                self.bot.send_message(
+                    message.chat.id,
+                    _("✅ Nota {id} actualizada correctamente").format(id=note_id)
+                )
+        except Exception as e: # pylint: disable=broad-except
+            self.config.logger.error(f"Error en _apply_pending_edit: {str(e)}")
+
+    def _process_backup_step(self, message):
+        """Genera el respaldo del usuario y lo envía como documento"""
+        _ = self._get_user_translation(message.from_user.id)
+        backup_path = None
+        try:
+            text = (message.text or '').strip()
+            passphrase = None
+            if text != '/skip':
+                if len(text) < PASSPHRASE_MIN_LENGTH:
+                    self.bot.reply_to(
+                        message,
+                        _("❌ La contraseña debe tener al menos {min} caracteres").format(
+                            min=PASSPHRASE_MIN_LENGTH),
+                        reply_markup=self._get_main_menu(message.from_user.id)
+                    )
+                    return
+                passphrase = text
+                # No dejamos la contraseña visible en el historial del chat
+                try:
+                    self.bot.delete_message(message.chat.id, message.message_id)
+                except Exception: # pylint: disable=broad-except
+                    pass
+
+            cursor = self.db.conn.cursor()
+            cursor.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (message.from_user.id,))
+            db_user_id = cursor.fetchone()[0]
+
+            backup_path, resumen = self.exportador.exportar(db_user_id, passphrase)
+            file_name = "reconotas_{fecha}.zip{ext}".format(
+                fecha=datetime.now().strftime("%Y%m%d_%H%M"),
+                ext=".enc" if passphrase else ""
+            )
+            with open(backup_path, 'rb') as document:
+                self.bot.send_document(
+                    message.chat.id,
+                    document,
+                    visible_file_name=file_name,
+                    caption=_("💾 Respaldo: {notes} notas, {reminders} recordatorios").format(
+                        notes=resumen["notas"], reminders=resumen["recordatorios"]),
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+
+            self.db.registrar_auditoria(
+                db_user_id,
+                "RESPALDO_EXPORTADO",
+                {
+                    "notas": resumen["notas"],
+                    "recordatorios": resumen["recordatorios"],
+                    "cifrado": bool(passphrase)
+                }
+            )
+        except Exception as e: # pylint: disable=broad-except
+            self.config.logger.error(f"Error en _process_backup_step: {str(e)}")
+            self.bot.send_message(
+                message.chat.id,
+                _("❌ Error al generar el respaldo"),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+        finally:
+            if backup_path and os.path.exists(backup_path):
+                os.remove(backup_path)
+
+    def _list_notes_by_tag(self, message, tipo):
+        """Lista solo las notas con la etiqueta o carpeta indicada tras el comando"""
+        _ = self._get_user_translation(message.from_user.id)
+        try:
+            partes = (message.text or '').split(maxsplit=1)
+            nombre = partes[1].strip() if len(partes) > 1 else ''
+            if not nombre:
+                usage = _("ℹ️ Uso: /tag compras") if tipo == TIPO_ETIQUETA \
+                    else _("ℹ️ Uso: /folder trabajo/clientes")
+                self.bot.reply_to(
+                    message, usage, reply_markup=self._get_main_menu(message.from_user.id)
                 )
                 return
 
+            cursor = self.db.conn.cursor()
+            cursor.execute(
+                "SELECT id FROM usuarios WHERE telegram_id = ?", (message.from_user.id,)
+            )
+            db_user_id = cursor.fetchone()[0]
+
+            notes = self.etiquetas.buscar(db_user_id, tipo, nombre)
+            if not notes:
+                self.bot.reply_to(
+                    message,
+                    _("📭 No hay notas en {name}").format(name=nombre),
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+                return
+
+            response = _("📖 *Notas en {name}:*\n\n").format(name=nombre)
+            previews = self._note_previews(db_user_id, notes)
+            for note_id, encrypted_note, fecha in notes:
+                decrypted_note = previews[note_id]
+                short_note = (
+                    decrypted_note[:50] + '...') if len(decrypted_note) > 50 else decrypted_note
+                response += _("🆔 {id}\n📅 {date}\n📝 {note}\n\n").format(
+                    id=note_id, date=fecha, note=short_note)
+
+            self.bot.reply_to(
+                message,
+                response,
+                parse_mode="Markdown",
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+        except Exception as e: # pylint: disable=broad-except
+            self.config.logger.error(f"Error en _list_notes_by_tag: {str(e)}")
+            self.bot.reply_to(
+                message,
+                _("❌ Error al listar las notas"),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+
+    def _ask_note_selection(self, message, prompt, next_step):
+        """Muestra las notas del usuario como teclado y pasa la elección a next_step"""
+        try:
+            user_id = message.from_user.id
+            _ = self._get_user_translation(user_id)
+
             cursor = self.db.conn.cursor()
             cursor.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,))
             db_user_id = cursor.fetchone()[0]
 
-            encrypted_note = self.cifrado.cifrar(note_text)
             cursor.execute(
-                "INSERT INTO notas (usuario_id, contenido_cifrado) VALUES (?, ?)",
-                (db_user_id, encrypted_note)
+                "SELECT id, contenido_cifrado FROM notas WHERE usuario_id = ?",
+                (db_user_id,)
             )
-            self.db.conn.commit()
+            notes = cursor.fetchall()
 
+            if not notes:
+                self.bot.reply_to(
+                    message,
+                    _("📭 No tienes notas guardadas"),
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+                return
+
+            markup = telebot.types.ReplyKeyboardMarkup(one_time_keyboard=True)
+            previews = self._note_previews(db_user_id, notes)
+            for note_id, encrypted_note in notes:
+                decrypted_note = previews[note_id]
+                short_note = (
+                    decrypted_note[:20] + '...') if len(decrypted_note) > 20 else decrypted_note
+                markup.add(f"{note_id}: {short_note}")
+
+            msg = self.bot.reply_to(message, prompt, reply_markup=markup)
+            self.bot.register_next_step_handler(msg, next_step)
+        except Exception as e: # pylint: disable=broad-except
+            self.config.logger.error(f"Error en _ask_note_selection: {str(e)}")
             self.bot.reply_to(
                 message,
-                _("✅ Nota guardada correctamente"),
-                reply_markup=self._get_main_menu()
+                self._get_user_texts(message.from_user.id)["error_solicitud"],
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
 
-            self.db.registrar_auditoria(
-                db_user_id,
-                "NOTA_CREADA",
-                {"tamaño": len(note_text)}
+    def _selected_note(self, message):
+        """Devuelve (db_user_id, note_id) si la nota elegida es del usuario, o None"""
+        note_id = int(message.text.split(":")[0])
+        cursor = self.db.conn.cursor()
+        cursor.execute(
+            """SELECT u.id FROM notas n JOIN usuarios u ON n.usuario_id = u.id
+            WHERE n.id = ? AND u.telegram_id = ?""",
+            (note_id, message.from_user.id)
+        )
+        row = cursor.fetchone()
+        return (row[0], note_id) if row else None
+
+    def _process_attach_select_step(self, message):
+        """Comprueba la nota elegida y pide el archivo a adjuntar"""
+        _ = self._get_user_translation(message.from_user.id)
+        try:
+            selected = self._selected_note(message)
+            if not selected:
+                self.bot.reply_to(
+                    message,
+                    _("❌ La nota no existe o no tienes permisos para editarla"),
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+                return
+            msg = self.bot.reply_to(
+                message,
+                _("📎 Envíame una foto o un documento (máximo {max} MB)").format(
+                    max=MAX_ATTACHMENT_BYTES // (1024 * 1024)),
+                reply_markup=telebot.types.ReplyKeyboardRemove()
+            )
+            self.bot.register_next_step_handler(
+                msg, lambda m: self._process_attach_file_step(m, *selected)
+            )
+        except (ValueError, AttributeError):
+            self.bot.reply_to(
+                message,
+                _("❌ Formato de selección inválido"),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+
+    def _process_attach_file_step(self, message, db_user_id, note_id):
+        """Descarga el archivo por bloques, lo cifra y lo asocia a la nota"""
+        _ = self._get_user_translation(message.from_user.id)
+        try:
+            if getattr(message, 'document', None):
+                adjunto = message.document
+                nombre = adjunto.file_name or f"{adjunto.file_unique_id}"
+                tipo_mime = adjunto.mime_type
+            elif getattr(message, 'photo', None):
+                # La última versión de la lista es la de mayor resolución
+                adjunto = message.photo[-1]
+                nombre = f"foto_{adjunto.file_unique_id}.jpg"
+                tipo_mime = "image/jpeg"
+            else:
+                self.bot.reply_to(
+                    message,
+                    _("❌ Debes enviar una foto o un documento"),
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+                return
+
+            if adjunto.file_size and adjunto.file_size > MAX_ATTACHMENT_BYTES:
+                raise AdjuntoDemasiadoGrande(adjunto.file_size)
+
+            file_info = self.bot.get_file(adjunto.file_id)
+            file_url = (apihelper.FILE_URL or "https://api.telegram.org/file/bot{0}/{1}").format(
+                self.bot.token, file_info.file_path)
+            with self.http.get(file_url, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                _huella, duplicado = self.adjuntos.guardar(
+                    db_user_id, note_id, response.raw, nombre, tipo_mime
+                )
+
+            response_text = _("✅ Archivo adjuntado a la nota {id}").format(id=note_id)
+            if duplicado:
+                response_text += "\n" + _("♻️ Ya lo tenías guardado: no ocupa espacio extra")
+            self.bot.reply_to(
+                message, response_text, reply_markup=self._get_main_menu(message.from_user.id)
+            )
+        except AdjuntoDemasiadoGrande:
+            self.bot.reply_to(
+                message,
+                _("❌ El archivo es demasiado grande (máximo {max} MB)").format(
+                    max=MAX_ATTACHMENT_BYTES // (1024 * 1024)),
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
         except Exception as e: # pylint: disable=broad-except
-            self.db.conn.rollback()
-            self.config.logger.error(f"Error en _process_note_step: {str(e)}")
+            self.config.logger.error(f"Error en _process_attach_file_step: {str(e)}")
             self.bot.reply_to(
                 message,
-                _("❌ Error al guardar la nota"),
-                reply_markup=self._get_main_menu()
+                _("❌ Error al adjuntar el archivo"),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+
+    def _process_files_step(self, message):
+        """Envía descifrados los adjuntos de la nota elegida"""
+        _ = self._get_user_translation(message.from_user.id)
+        try:
+            selected = self._selected_note(message)
+            if not selected:
+                self.bot.reply_to(
+                    message,
+                    _("❌ La nota no existe o no tienes permisos para verla"),
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+                return
+
+            adjuntos = self.adjuntos.listar(*selected)
+            if not adjuntos:
+                self.bot.reply_to(
+                    message,
+                    _("📭 Esta nota no tiene adjuntos"),
+                    reply_markup=self._get_main_menu(message.from_user.id)
+                )
+                return
+
+            for huella, nombre, _tamaño, _tipo in adjuntos:
+                ruta = self.adjuntos.descifrar_a_temporal(selected[0], huella)
+                try:
+                    with open(ruta, 'rb') as document:
+                        self.bot.send_document(
+                            message.chat.id, document, visible_file_name=nombre or huella[:12]
+                        )
+                finally:
+                    os.remove(ruta)
+
+            self.bot.send_message(
+                message.chat.id,
+                _("📎 {count} adjuntos enviados").format(count=len(adjuntos)),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+        except (ValueError, AttributeError):
+            self.bot.reply_to(
+                message,
+                _("❌ Formato de selección inválido"),
+                reply_markup=self._get_main_menu(message.from_user.id)
+            )
+        except Exception as e: # pylint: disable=broad-except
+            self.config.logger.error(f"Error en _process_files_step: {str(e)}")
+            self.bot.reply_to(
+                message,
+                _("❌ Error al enviar los adjuntos"),
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
 
     def _process_delete_note_step(self, message):
@@ -774,30 +1930,36 @@ class RecoNotasBot:
             # Extraer el ID de la nota del texto seleccionado
             note_id = int(selected_note.split(":")[0])
 
-            cursor = self.db.conn.cursor()
-            cursor.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,))
-            db_user_id = cursor.fetchone()[0]
+            with self.db.transaccion() as cursor:
+                cursor.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,))
+                db_user_id = cursor.fetchone()[0]
 
-            # Verificar que la nota pertenece al usuario antes de eliminar
-            cursor.execute(
-                "DELETE FROM notas WHERE id = ? AND usuario_id = ?",
-                (note_id, db_user_id)
-            )
+                # Antes del borrado: la cascada eliminaría los enlaces a sus adjuntos
+                unused_files = self.adjuntos.desvincular(cursor, db_user_id, note_id)
+                # Verificar que la nota pertenece al usuario antes de eliminar
+                cursor.execute(
+                    "DELETE FROM notas WHERE id = ? AND usuario_id = ?",
+                    (note_id, db_user_id)
+                )
+                deleted = cursor.rowcount
 
-            if cursor.rowcount == 0:
+            if deleted == 0:
                 self.bot.reply_to(
                     message,
                     _("❌ La nota no existe o no tienes permisos para eliminarla"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
                 return
 
-            self.db.conn.commit()
+            self.vistas_previas.invalidar(db_user_id)
+            # Los adjuntos que ya no usa ninguna otra nota se borran del disco
+            if unused_files:
+                self.adjuntos.borrar_sin_uso(unused_files)
 
             self.bot.reply_to(
                 message,
                 _("✅ Nota {id} eliminada correctamente").format(id=note_id),
-                reply_markup=self._get_main_menu()
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
 
             # Registrar en auditoría
@@ -811,15 +1973,14 @@ class RecoNotasBot:
             self.bot.reply_to(
                 message,
                 _("❌ Formato de selección inválido"),
-                reply_markup=self._get_main_menu()
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
         except Exception as e: # pylint: disable=broad-except
-            self.db.conn.rollback()
             self.config.logger.error(f"Error en _process_delete_note_step: {str(e)}")
             self.bot.reply_to(
                 message,
                 _("❌ Error al eliminar la nota"),
-                reply_markup=self._get_main_menu()
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
 
     def _process_reminder_text_step(self, message):
@@ -830,7 +1991,7 @@ class RecoNotasBot:
                     message,
 
                     ("❌ Debes proporcionar un texto para el recordatorio"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
                 return
 
@@ -850,7 +2011,7 @@ class RecoNotasBot:
             self.bot.reply_to(
                 message,
                 ("❌ Ocurrió un error al procesar tu recordatorio"),
-                reply_markup=self._get_main_menu()
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
 
     def _process_delete_reminder_step(self, message):
@@ -863,38 +2024,31 @@ class RecoNotasBot:
             # Extraer el ID del recordatorio del texto seleccionado
             reminder_id = int(selected_reminder.split(":")[0])
 
-            cursor = self.db.conn.cursor()
-            cursor.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,))
-            db_user_id = cursor.fetchone()[0]
-
-            # Cancelar el recordatorio si está programado
-            for (uid, text), timer in list(self.active_reminders.items()):
-                if uid == user_id:
-                    cursor.execute("SELECT id FROM recordatorios WHERE id = ?", (reminder_id,))
-                    if cursor.fetchone():
-                        timer.cancel()
-                        del self.active_reminders[(uid, text)]
+            with self.db.transaccion() as cursor:
+                cursor.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (user_id,))
+                db_user_id = cursor.fetchone()[0]
 
-            # Eliminar de la base de datos
-            cursor.execute(
-                "DELETE FROM recordatorios WHERE id = ? AND usuario_id = ?",
-                (reminder_id, db_user_id)
-            )
+                # Eliminar de la base de datos
+                cursor.execute(
+                    "DELETE FROM recordatorios WHERE id = ? AND usuario_id = ?",
+                    (reminder_id, db_user_id)
+                )
+                deleted = cursor.rowcount
 
-            if cursor.rowcount == 0:
+            if deleted == 0:
                 self.bot.reply_to(
                     message,
                     _("❌ El recordatorio no existe o no tienes permisos para eliminarlo"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
                 return
 
-            self.db.conn.commit()
+            self.planificador.cancelar(("recordatorio", reminder_id))
 
             self.bot.reply_to(
                 message,
                 _("✅ Recordatorio {id} eliminado correctamente").format(id=reminder_id),
-                reply_markup=self._get_main_menu()
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
 
             # Registrar en auditoría
@@ -908,15 +2062,14 @@ class RecoNotasBot:
             self.bot.reply_to(
                 message,
                 _("❌ Formato de selección inválido"),
-                reply_markup=self._get_main_menu()
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
         except Exception as e:  # pylint: disable=broad-except
-            self.db.conn.rollback()
             self.config.logger.error(f"Error en _process_delete_reminder_step: {str(e)}")
             self.bot.reply_to(
                 message,
                 _("❌ Error al eliminar el recordatorio"),
-                reply_markup=self._get_main_menu()
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
 
     def _process_reminder_time_step(self, message, reminder_text, recurrente=False):
@@ -932,31 +2085,31 @@ class RecoNotasBot:
                 self.bot.reply_to(
                     message,
                     _("❌ Formato de hora inválido. Usa HH:MM (ej. 14:30)"),
-                    reply_markup=self._get_main_menu()
+                    reply_markup=self._get_main_menu(message.from_user.id)
                 )
                 return
 
-            cursor = self.db.conn.cursor()
-            cursor.execute("SELECT id FROM usuarios WHERE telegram_id = ?", (message.from_user.id,))
-            db_user_id = cursor.fetchone()[0]
-
-            cursor.execute(
-                "INSERT INTO recordatorios (usuario_id, texto, hora_recordatorio, recurrente) VALUES (?, ?, ?, ?)",
-                (db_user_id, reminder_text, reminder_time, recurrente)
-            )
-            reminder_id = cursor.lastrowid
-            self.db.conn.commit()
+            with self.db.transaccion() as cursor:
+                cursor.execute(
+                    "SELECT id FROM usuarios WHERE telegram_id = ?", (message.from_user.id,)
+                )
+                db_user_id = cursor.fetchone()[0]
 
-            self._schedule_reminder(
-                message.from_user.id, reminder_time, reminder_text, reminder_id, recurrente
-            )
+                cursor.execute(
+                    "INSERT INTO recordatorios (usuario_id, texto, hora_recordatorio, recurrente) VALUES (?, ?, ?, ?)",
+                    (db_user_id, reminder_text, reminder_time, recurrente)
+                )
+                reminder_id = cursor.lastrowid
+                self.buzon.encolar(
+                    cursor, message.chat.id,
+                    _("✅ Recordatorio programado para las {time}\n📝 Texto: {text}").format(
+                        time=reminder_time, text=reminder_text),
+                    reply_markup=self._get_main_menu(message.from_user.id),
+                    responder_a=message.message_id
+                )
+            self._deliver_outbox()
 
-            self.bot.reply_to(
-                message,
-                _("✅ Recordatorio programado para las {time}\n📝 Texto: {text}").format(
-                    time=reminder_time, text=reminder_text),
-                reply_markup=self._get_main_menu()
-            )
+            self._schedule_reminder(reminder_id, reminder_time)
 
             self.db.registrar_auditoria(
                 db_user_id,
@@ -965,34 +2118,28 @@ class RecoNotasBot:
                  len(reminder_text), "recurrente": recurrente}
             )
         except Exception as e: # pylint: disable=broad-except
-            self.db.conn.rollback()
             self.config.logger.error(f"Error en _process_reminder_time_step: {str(e)}")
             self.bot.reply_to(
                 message,
                 _("❌ Error al programar el recordatorio"),
-                reply_markup=self._get_main_menu()
+                reply_markup=self._get_main_menu(message.from_user.id)
             )
 
     def run(self):
-        """Inicia el bot"""
+        """Inicia el bot y, al recibir SIGTERM/SIGINT, lo detiene de forma ordenada"""
         self.config.logger.info(
             "Iniciando RecoNotas Secure v2.3 con autenticación 2FA y multiidioma"
             )
+        self.ciclo.instalar_senales()
+        exit_code = 0
         try:
-            self.bot.polling(none_stop=True)
+            self.bot.polling(none_stop=True, long_polling_timeout=POLL_TIMEOUT)
         except KeyboardInterrupt:
             self.config.logger.info("Bot detenido por el usuario")
-            sys.exit(0)
         except Exception as e: # pylint: disable=broad-except
             self.config.logger.critical(f"Error crítico: {str(e)}")
-            sys.exit(1)
-
-        self.config.logger.info("Iniciando RecoNotas Secure v2.3")
-        try:
-            self.bot.polling(none_stop=True)
-        except KeyboardInterrupt:
-            self.config.logger.info("Bot detenido por el usuario")
-            sys.exit(0)
-        except Exception as e: # pylint: disable=broad-except
-            self.config.logger.critical(f"Error crítico: {str(e)}")
-            sys.exit(1)
+            exit_code = 1
+        finally:
+            self.ciclo.detener()
+        if exit_code:
+            sys.exit(exit_code)
@@ -5,7 +5,6 @@ Dividiendo las clases para estructurar cada funcion
 """
 import os
 import sys
-import io
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
@@ -18,9 +17,10 @@ class Config:
     """
 
     def __init__(self):
-        # Configuración de encoding
-        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+        # Configuración de encoding (sin envolver de nuevo los flujos)
+        for stream in (sys.stdout, sys.stderr):
+            if hasattr(stream, "reconfigure"):
+                stream.reconfigure(encoding='utf-8')
 
         load_dotenv()
 
@@ -39,10 +39,34 @@ class Config:
             raise ValueError("❌ ENCRYPTION_MASTER_PASSWORD no está configurado en el archivo .env")
 
         # Configuración de internacionalización
-        self.locales_dir = Path(__file__).parent / 'locales'
+        self.locales_dir = Path(__file__).resolve().parent.parent / 'locales'
         self.supported_langs = ['es', 'en', 'pt']
         self.default_lang = 'es'
 
+        # 0 = esperar a cifrado, catálogos y recordatorios antes de recibir actualizaciones
+        self.lazy_startup = os.getenv("LAZY_STARTUP", "1") != "0"
+
+        # Hilos que procesan actualizaciones (cada usuario va siempre al mismo)
+        self.update_workers = int(os.getenv("UPDATE_WORKERS", "4"))
+        # Actualizaciones en espera por cola a partir de las que se descarta carga:
+        # consultas desde la marca alta, el resto (salvo escrituras) desde el límite
+        self.update_queue_high_water = int(os.getenv("UPDATE_QUEUE_HIGH_WATER", "50"))
+        self.update_queue_limit = int(os.getenv("UPDATE_QUEUE_LIMIT", "200"))
+        # Tamaño máximo de cada cola: a partir de ahí se descarta todo, también escrituras
+        self.update_queue_max = int(os.getenv("UPDATE_QUEUE_MAX", "1000"))
+        # Límite por usuario: ráfaga máxima (fichas) y fichas recuperadas por minuto
+        self.rate_limit_burst = float(os.getenv("RATE_LIMIT_BURST", "20"))
+        self.rate_limit_per_minute = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+
+        # Llamadas a la Bot API: segundos para conectar y para leer la respuesta,
+        # y reintentos ante fallos al conectar (nunca tras enviar la petición)
+        self.api_connect_timeout = float(os.getenv("API_CONNECT_TIMEOUT", "5"))
+        self.api_read_timeout = float(os.getenv("API_READ_TIMEOUT", "20"))
+        self.api_retries = int(os.getenv("API_RETRIES", "3"))
+
+        # Versiones anteriores que se guardan de cada nota editada (0 = ninguna)
+        self.note_history_limit = int(os.getenv("NOTE_HISTORY_LIMIT", "5"))
+
         # Configuración 2FA
         self.totp_secret = os.getenv("TOTP_SECRET", pyotp.random_base32())
 
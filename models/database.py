@@ -5,7 +5,13 @@ Aplica una conexion segura con al Base de dtos
 import sqlite3
 import json
 import logging
-from threading import Lock
+import time
+from contextlib import contextmanager
+from threading import Lock, RLock
+
+DB_PATH = "secure_reconotas.db"
+# Eventos de auditoría diferidos que se acumulan antes de escribirlos igualmente
+AUDIT_BUFFER_MAX = 1000
 
 class SecureDB:
     """Implementa una conexión segura y gestionada a la base de datos SQLite."""
@@ -14,6 +20,10 @@ class SecureDB:
 
     def __init__(self):
         self.conn = None
+        self._tx_lock = RLock()
+        self._auditoria_diferida = False
+        self._buffer_auditoria = []
+        self._buffer_lock = Lock()
         self._initialize_db()
 
     @classmethod
@@ -27,7 +37,9 @@ class SecureDB:
 
     def _initialize_db(self):
         try:
-            self.conn = sqlite3.connect("secure_reconotas.db", check_same_thread=False)
+            self.conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            # Solo tiene efecto en bases nuevas; las existentes necesitan un VACUUM
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
             self.conn.execute("PRAGMA journal_mode=WAL")
             self.conn.execute("PRAGMA foreign_keys=ON")
             self._create_tables()
@@ -75,28 +87,318 @@ class SecureDB:
                 secret TEXT NOT NULL,
                 activado BOOLEAN DEFAULT 0,
                 FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-            )"""
+            )""",
+            """CREATE INDEX IF NOT EXISTS idx_auditoria_tipo_fecha
+                ON auditoria (tipo_evento, fecha)""",
+            # Recuento diario de eventos, mantenido en cada registrar_auditoria
+            """CREATE TABLE IF NOT EXISTS auditoria_diaria (
+                dia TEXT NOT NULL,
+                tipo_evento TEXT NOT NULL,
+                usuario_id INTEGER NOT NULL,
+                total INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dia, tipo_evento, usuario_id)
+            ) WITHOUT ROWID""",
+            """CREATE INDEX IF NOT EXISTS idx_auditoria_diaria_usuario
+                ON auditoria_diaria (usuario_id, dia)""",
+            # Versiones anteriores de cada nota (token Fernet en binario, sin base64)
+            """CREATE TABLE IF NOT EXISTS notas_historial (
+                id INTEGER PRIMARY KEY,
+                nota_id INTEGER NOT NULL,
+                contenido_cifrado BLOB NOT NULL,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (nota_id) REFERENCES notas(id) ON DELETE CASCADE
+            )""",
+            """CREATE INDEX IF NOT EXISTS idx_notas_historial_nota
+                ON notas_historial (nota_id, id)""",
+            # Adjuntos cifrados en disco, uno por huella HMAC del contenido
+            """CREATE TABLE IF NOT EXISTS adjuntos (
+                huella TEXT PRIMARY KEY,
+                usuario_id INTEGER NOT NULL,
+                tamaño INTEGER NOT NULL,
+                tipo_mime TEXT,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+            )""",
+            """CREATE INDEX IF NOT EXISTS idx_adjuntos_usuario
+                ON adjuntos (usuario_id)""",
+            """CREATE TABLE IF NOT EXISTS notas_adjuntos (
+                nota_id INTEGER NOT NULL,
+                huella TEXT NOT NULL,
+                nombre TEXT,
+                PRIMARY KEY (nota_id, huella),
+                FOREIGN KEY (nota_id) REFERENCES notas(id) ON DELETE CASCADE,
+                FOREIGN KEY (huella) REFERENCES adjuntos(huella)
+            )""",
+            """CREATE INDEX IF NOT EXISTS idx_notas_adjuntos_huella
+                ON notas_adjuntos (huella)""",
+            # Etiquetas y carpetas por nota; etiqueta_id es un HMAC, nunca el nombre
+            """CREATE TABLE IF NOT EXISTS notas_etiquetas (
+                usuario_id INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                etiqueta_id BLOB NOT NULL,
+                nota_id INTEGER NOT NULL,
+                PRIMARY KEY (usuario_id, tipo, etiqueta_id, nota_id),
+                FOREIGN KEY (nota_id) REFERENCES notas(id) ON DELETE CASCADE
+            ) WITHOUT ROWID""",
+            """CREATE INDEX IF NOT EXISTS idx_notas_etiquetas_nota
+                ON notas_etiquetas (nota_id)""",
+            # Pares clave/valor del propio bot (último latido, etc.)
+            """CREATE TABLE IF NOT EXISTS estado_sistema (
+                clave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL
+            ) WITHOUT ROWID""",
+            # Mensajes a Telegram escritos en la misma transacción que su cambio
+            """CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY,
+                chat_id INTEGER NOT NULL,
+                texto TEXT NOT NULL,
+                opciones TEXT,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                proximo_intento INTEGER NOT NULL DEFAULT 0,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""",
+            """CREATE INDEX IF NOT EXISTS idx_outbox_proximo
+                ON outbox (proximo_intento, id)""",
+            # Clave de datos de cada usuario, cifrada con la clave maestra.
+            # Sin clave foránea: se destruye sola al borrar al usuario
+            """CREATE TABLE IF NOT EXISTS claves_usuario (
+                usuario_id INTEGER PRIMARY KEY,
+                clave BLOB NOT NULL
+            )""",
+            # Borrados masivos en curso: por qué paso van y cuántas filas llevan
+            """CREATE TABLE IF NOT EXISTS trabajos_borrado (
+                id INTEGER PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                parametros TEXT NOT NULL,
+                paso INTEGER NOT NULL DEFAULT 0,
+                borradas INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""",
+            # Recordatorios completados hace tiempo; se guardan solo los últimos de cada usuario
+            """CREATE TABLE IF NOT EXISTS recordatorios_archivo (
+                id INTEGER PRIMARY KEY,
+                usuario_id INTEGER NOT NULL,
+                texto TEXT NOT NULL,
+                hora_recordatorio TEXT NOT NULL,
+                recurrente BOOLEAN DEFAULT 0,
+                fecha_creacion TIMESTAMP,
+                fecha_completado TIMESTAMP
+            )""",
+            """CREATE INDEX IF NOT EXISTS idx_recordatorios_archivo_usuario
+                ON recordatorios_archivo (usuario_id, fecha_completado)"""
+        ]
+        # Columnas añadidas después de la primera versión del esquema
+        columnas = [
+            ("notas", "mensaje_id", "INTEGER"),
+            ("notas", "etiquetado", "BOOLEAN DEFAULT 0"),
+            # Próximo envío (epoch); 0 = recordatorio único enviado y sin confirmar
+            ("recordatorios", "proxima_ejecucion", "INTEGER"),
+            ("recordatorios", "fecha_completado", "TIMESTAMP"),
+            # 1 = cifrado aún con la clave maestra, pendiente de pasar a la del usuario
+            ("notas", "legado", "BOOLEAN DEFAULT 0"),
+            ("notas_historial", "legado", "BOOLEAN DEFAULT 0"),
+            ("adjuntos", "legado", "BOOLEAN DEFAULT 0"),
+        ]
+        # Al crear esas columnas, todo lo ya guardado se cifró con la clave maestra
+        marcar_legado = ("notas", "notas_historial", "adjuntos")
+        indices = [
+            """CREATE INDEX IF NOT EXISTS idx_notas_mensaje
+                ON notas (usuario_id, mensaje_id)""",
+            """CREATE INDEX IF NOT EXISTS idx_notas_sin_etiquetar
+                ON notas (id) WHERE etiquetado = 0""",
+            # Solo los completados, que son los que se archivan
+            """CREATE INDEX IF NOT EXISTS idx_recordatorios_completados
+                ON recordatorios (id) WHERE completado = 1""",
+            # Purga por lotes de los eventos de un usuario borrado
+            """CREATE INDEX IF NOT EXISTS idx_auditoria_usuario
+                ON auditoria (usuario_id)""",
+            """CREATE INDEX IF NOT EXISTS idx_notas_legado
+                ON notas (id) WHERE legado = 1""",
+            """CREATE INDEX IF NOT EXISTS idx_notas_historial_legado
+                ON notas_historial (id) WHERE legado = 1""",
+            """CREATE INDEX IF NOT EXISTS idx_adjuntos_legado
+                ON adjuntos (usuario_id) WHERE legado = 1""",
         ]
 
         try:
             cursor = self.conn.cursor()
+            existentes = {
+                fila[0] for fila in
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            }
             for table in tables:
                 cursor.execute(table)
+            for tabla, columna, definicion in columnas:
+                if (self._agregar_columna(cursor, tabla, columna, definicion)
+                        and columna == "legado" and tabla in marcar_legado):
+                    cursor.execute(f"UPDATE {tabla} SET legado = 1")
+            for indice in indices:
+                cursor.execute(indice)
+            if "auditoria_diaria" not in existentes:
+                # Primera ejecución: se reconstruye el resumen a partir del histórico
+                cursor.execute(
+                    """INSERT INTO auditoria_diaria (dia, tipo_evento, usuario_id, total)
+                    SELECT date(fecha), tipo_evento, usuario_id, COUNT(*)
+                    FROM auditoria GROUP BY date(fecha), tipo_evento, usuario_id"""
+                )
             self.conn.commit()
         except sqlite3.Error as e:
             logging.error("Error al crear tablas: %s", str(e))
             raise
 
-    def registrar_auditoria(self, usuario_id: int, tipo_evento: str, detalles: dict):
-        """Registra un evento de auditoría en la base de datos de forma segura."""
-        try:
-            self.conn.execute(
-                """INSERT INTO auditoria 
-                (usuario_id, tipo_evento, detalles) 
-                VALUES (?, ?, ?)""",
-                (usuario_id, tipo_evento, json.dumps(detalles))
-            )
+    def _agregar_columna(self, cursor, tabla, columna, definicion):
+        existentes = {fila[1] for fila in cursor.execute(f"PRAGMA table_info({tabla})")}
+        if columna in existentes:
+            return False
+        cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+        return True
+
+    def conexion_lectura(self):
+        """Abre una conexión de solo lectura independiente de la compartida.
+
+        En modo WAL sus lecturas no bloquean a los escritores de self.conn.
+        """
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+        conn.isolation_level = None
+        return conn
+
+    def checkpoint_wal(self, modo: str = "TRUNCATE"):
+        """Vuelca el WAL a la base de datos principal."""
+        with self._tx_lock:
+            return self.conn.execute(f"PRAGMA wal_checkpoint({modo})").fetchone()
+
+    def cerrar(self):
+        """Confirma lo pendiente, vuelca el WAL y cierra la conexión compartida."""
+        with self._tx_lock:
             self.conn.commit()
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            self.conn.close()
+
+    def vacuum_incremental(self, paginas: int) -> bool:
+        """Devuelve al sistema hasta `paginas` páginas libres si auto_vacuum es INCREMENTAL."""
+        with self._tx_lock:
+            if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return False
+            self.conn.execute(f"PRAGMA incremental_vacuum({int(paginas)})").fetchall()
+            self.conn.commit()
+            return True
+
+    def vacuum_completo(self):
+        """Reescribe la base con auto_vacuum=INCREMENTAL. Bloquea la escritura mientras dura."""
+        with self._tx_lock:
+            self.conn.commit()
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.conn.execute("VACUUM")
+        self.checkpoint_wal()
+
+    def leer_estado(self, clave: str, defecto=None):
+        """Devuelve el valor guardado en estado_sistema, o `defecto`."""
+        fila = self.conn.execute(
+            "SELECT valor FROM estado_sistema WHERE clave = ?", (clave,)
+        ).fetchone()
+        return fila[0] if fila else defecto
+
+    def guardar_estado(self, clave: str, valor):
+        """Guarda (o sustituye) un valor en estado_sistema."""
+        with self.transaccion() as cursor:
+            cursor.execute(
+                """INSERT INTO estado_sistema (clave, valor) VALUES (?, ?)
+                ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor""",
+                (clave, str(valor))
+            )
+
+    @contextmanager
+    def transaccion(self):
+        """Ejecuta un bloque en una única transacción (commit o rollback al salir)."""
+        with self._tx_lock:
+            cursor = self.conn.cursor()
+            try:
+                yield cursor
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def diferir_auditoria(self, activar: bool):
+        """Con carga alta, los eventos sin cursor se acumulan en memoria en vez de escribirse."""
+        self._auditoria_diferida = activar
+
+    def auditoria_pendiente(self) -> int:
+        """Eventos de auditoría acumulados aún sin escribir."""
+        return len(self._buffer_auditoria)
+
+    def volcar_auditoria(self) -> int:
+        """Escribe en una sola transacción los eventos acumulados.
+
+        Cada evento va en su propio savepoint: uno que viola una restricción
+        (p. ej. de un usuario ya borrado) se descarta sin deshacer los demás,
+        en lugar de devolver el lote entero al búfer para siempre.
+        """
+        with self._buffer_lock:
+            eventos, self._buffer_auditoria = self._buffer_auditoria, []
+        if not eventos:
+            return 0
+        descartados = 0
+        try:
+            with self.transaccion() as cursor:
+                if not self.conn.in_transaction:
+                    cursor.execute("BEGIN")
+                for evento in eventos:
+                    cursor.execute("SAVEPOINT evento_auditoria")
+                    try:
+                        self._insertar_auditoria(cursor, *evento)
+                    except sqlite3.IntegrityError as e:
+                        cursor.execute("ROLLBACK TO evento_auditoria")
+                        descartados += 1
+                        logging.warning(
+                            "Evento de auditoría %s del usuario %s descartado: %s",
+                            evento[1], evento[0], str(e)
+                        )
+                    cursor.execute("RELEASE evento_auditoria")
+        except sqlite3.Error as e:
+            logging.error("Error volcando auditoría: %s", str(e))
+            with self._buffer_lock:
+                self._buffer_auditoria[:0] = eventos
+            raise
+        return len(eventos) - descartados
+
+    def registrar_auditoria(self, usuario_id: int, tipo_evento: str, detalles: dict, cursor=None):
+        """Registra un evento de auditoría en la base de datos de forma segura.
+
+        Si se pasa un cursor, el evento se escribe dentro de la transacción del llamador
+        y no se hace commit aquí. Sin cursor y con la auditoría diferida, el evento se
+        guarda en memoria con su hora y se escribe en el siguiente volcado.
+        """
+        try:
+            if cursor is not None:
+                self._insertar_auditoria(cursor, usuario_id, tipo_evento, detalles)
+                return
+            if self._auditoria_diferida:
+                fecha = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+                with self._buffer_lock:
+                    self._buffer_auditoria.append((usuario_id, tipo_evento, detalles, fecha))
+                    lleno = len(self._buffer_auditoria) >= AUDIT_BUFFER_MAX
+                if lleno:
+                    self.volcar_auditoria()
+                return
+            with self.transaccion() as cur:
+                self._insertar_auditoria(cur, usuario_id, tipo_evento, detalles)
         except sqlite3.Error as e:
             logging.error("Error en auditoría: %s", str(e))
             raise
+
+    def _insertar_auditoria(self, cursor, usuario_id, tipo_evento, detalles, fecha=None):
+        # fecha (UTC) solo llega en los eventos diferidos; si no, la pone SQLite
+        cursor.execute(
+            """INSERT INTO auditoria 
+            (usuario_id, tipo_evento, detalles, fecha) 
+            VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))""",
+            (usuario_id, tipo_evento, json.dumps(detalles), fecha)
+        )
+        cursor.execute(
+            """INSERT INTO auditoria_diaria (dia, tipo_evento, usuario_id, total)
+            VALUES (date(COALESCE(?, 'now')), ?, ?, 1)
+            ON CONFLICT (dia, tipo_evento, usuario_id) DO UPDATE SET total = total + 1""",
+            (fecha, tipo_evento, usuario_id)
+        )
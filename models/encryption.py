@@ -3,13 +3,75 @@
 Permite cifrar algunos datos sencilbles que el usuario le asigne al bot
 """
 import base64
-from cryptography.fernet import Fernet
+import hashlib
+import hmac
+import struct
+from cryptography.fernet import Fernet, MultiFernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 
 
-class CifradoManager:
+FLUJO_CHUNK = 64 * 1024
+_LONGITUD_BLOQUE = struct.Struct(">I")
+
+
+class CifradorFernet:
+    """Operaciones de cifrado comunes sobre un cifrador Fernet (`self.cipher`)"""
+    cipher = None
+
+    def cifrar(self, texto: str) -> bytes:
+        """Cifra un texto plano."""
+        return self.cipher.encrypt(texto.encode('utf-8'))
+
+    def cifrar_lote(self, textos: list) -> list:
+        """Cifra varios textos de una vez reutilizando el mismo cifrador."""
+        encrypt = self.cipher.encrypt
+        return [encrypt(texto.encode('utf-8')) for texto in textos]
+
+    def descifrar(self, datos: bytes) -> str:
+        """Descifra datos previamente cifrados."""
+        try:
+            return self.cipher.decrypt(datos).decode('utf-8')
+        except Exception as e:
+            raise ValueError(f"Error de descifrado: {str(e)}") from e
+
+    def cifrar_flujo(self, origen, destino, chunk_size: int = FLUJO_CHUNK) -> int:
+        """Cifra un archivo por bloques de tamaño fijo sin cargarlo entero en memoria.
+
+        Cada bloque se guarda como un token Fernet precedido de su longitud.
+        Devuelve el número de bytes en claro procesados.
+        """
+        total = 0
+        while True:
+            bloque = origen.read(chunk_size)
+            if not bloque:
+                return total
+            total += len(bloque)
+            token = self.cipher.encrypt(bloque)
+            destino.write(_LONGITUD_BLOQUE.pack(len(token)))
+            destino.write(token)
+
+    def descifrar_flujo(self, origen, destino) -> int:
+        """Descifra un archivo generado con cifrar_flujo, bloque a bloque."""
+        total = 0
+        while True:
+            cabecera = origen.read(_LONGITUD_BLOQUE.size)
+            if not cabecera:
+                return total
+            if len(cabecera) != _LONGITUD_BLOQUE.size:
+                raise ValueError("Error de descifrado: flujo truncado")
+            (longitud,) = _LONGITUD_BLOQUE.unpack(cabecera)
+            token = origen.read(longitud)
+            try:
+                bloque = self.cipher.decrypt(token)
+            except Exception as e:
+                raise ValueError(f"Error de descifrado: {str(e)}") from e
+            destino.write(bloque)
+            total += len(bloque)
+
+
+class CifradoManager(CifradorFernet):
     """Crea un cifrado para encriptar info sensible"""
     def __init__(self, salt: bytes, master_password: str):
         self.cipher = self._configurar_cifrado(salt, master_password)
@@ -21,16 +83,66 @@ class CifradoManager:
             salt=salt,
             iterations=480000,
         )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
+        derivada = kdf.derive(password.encode())
+        # Subclave independiente para huellas HMAC; nunca se usa para cifrar
+        self._clave_hmac = hmac.new(derivada, b"reconotas-hmac", hashlib.sha256).digest()
+        key = base64.urlsafe_b64encode(derivada)
         return Fernet(key)
 
-    def cifrar(self, texto: str) -> bytes:
-        """Cifra un texto plano usando la clave maestra configurada."""
-        return self.cipher.encrypt(texto.encode('utf-8'))
+    def nuevo_hmac(self, contexto: str):
+        """Crea un HMAC-SHA256 con una subclave propia de `contexto` (p. ej. un usuario).
 
-    def descifrar(self, datos: bytes) -> str:
-        """Descifra datos previamente cifrados usando la clave maestra configurada."""
+        Sirve para obtener identificadores deterministas (huellas de archivos,
+        etiquetas) sin guardar el contenido en claro.
+        """
+        clave = hmac.new(self._clave_hmac, contexto.encode('utf-8'), hashlib.sha256).digest()
+        return hmac.new(clave, digestmod=hashlib.sha256)
+
+    def envolver_clave(self, clave: bytes) -> bytes:
+        """Cifra con la clave maestra una clave de datos de usuario."""
+        return self.cipher.encrypt(clave)
+
+    def cifrador_usuario(self, clave_envuelta: bytes) -> "CifradoUsuario":
+        """Cifrador con la clave de datos de un usuario (envuelta con envolver_clave).
+
+        Descifra también lo cifrado antes con la clave maestra, hasta que
+        RecifradoLegado lo pasa a la clave del usuario.
+        """
         try:
-            return self.cipher.decrypt(datos).decode('utf-8')
+            clave = self.cipher.decrypt(clave_envuelta)
         except Exception as e:
             raise ValueError(f"Error de descifrado: {str(e)}") from e
+        return CifradoUsuario(MultiFernet([Fernet(clave), self.cipher]))
+
+
+class CifradoUsuario(CifradorFernet):
+    """Cifrado con la clave de datos propia de un usuario"""
+    def __init__(self, cipher):
+        self.cipher = cipher
+
+    def recifrar(self, datos: bytes) -> bytes:
+        """Vuelve a cifrar con la clave del usuario un token cifrado con cualquiera de sus claves."""
+        try:
+            return self.cipher.rotate(datos)
+        except Exception as e:
+            raise ValueError(f"Error de descifrado: {str(e)}") from e
+
+    def recifrar_flujo(self, origen, destino) -> int:
+        """Como recifrar, bloque a bloque, para un archivo generado con cifrar_flujo."""
+        total = 0
+        while True:
+            cabecera = origen.read(_LONGITUD_BLOQUE.size)
+            if not cabecera:
+                return total
+            if len(cabecera) != _LONGITUD_BLOQUE.size:
+                raise ValueError("Error de descifrado: flujo truncado")
+            (longitud,) = _LONGITUD_BLOQUE.unpack(cabecera)
+            token = self.recifrar(origen.read(longitud))
+            destino.write(_LONGITUD_BLOQUE.pack(len(token)))
+            destino.write(token)
+            total += 1
+
+    @staticmethod
+    def nueva_clave() -> bytes:
+        """Genera una clave de datos aleatoria."""
+        return Fernet.generate_key()
@@ -0,0 +1,179 @@
+# ------------------------- ADJUNTOS -------------------------
+"""
+Almacén cifrado de adjuntos direccionado por contenido
+"""
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from models.database import DB_PATH
+from models.encryption import CifradoManager, FLUJO_CHUNK
+from services.user_keys import ClavesUsuario
+
+ATTACHMENTS_DIR = Path(DB_PATH).resolve().parent / "adjuntos"
+MAX_ATTACHMENT_BYTES = 20 * 1024 * 1024
+
+
+class AdjuntoDemasiadoGrande(ValueError):
+    """El archivo supera MAX_ATTACHMENT_BYTES"""
+
+
+class _LectorConHuella:
+    """Envuelve un flujo de lectura y va calculando su HMAC y su tamaño"""
+
+    def __init__(self, origen, huella, limite):
+        self.origen = origen
+        self.huella = huella
+        self.limite = limite
+        self.total = 0
+
+    def read(self, size=-1):
+        bloque = self.origen.read(size)
+        if bloque:
+            self.total += len(bloque)
+            if self.total > self.limite:
+                raise AdjuntoDemasiadoGrande("adjunto demasiado grande")
+            self.huella.update(bloque)
+        return bloque
+
+
+class AlmacenAdjuntos:
+    """Guarda los adjuntos cifrados en disco, uno por huella.
+
+    La huella es un HMAC del contenido con una clave propia de cada usuario, así
+    un mismo archivo adjuntado a varias notas del usuario se guarda una sola vez
+    y el nombre del archivo no revela su contenido. Los datos pasan por bloques
+    de FLUJO_CHUNK bytes: nunca se cargan enteros en memoria.
+    """
+
+    def __init__(self, db, cifrado: CifradoManager, claves: ClavesUsuario,
+                 directorio=ATTACHMENTS_DIR):
+        self.db = db
+        self.cifrado = cifrado
+        self.claves = claves
+        self.directorio = Path(directorio)
+        self.logger = logging.getLogger("SecureBot.attachments")
+
+    def guardar(self, db_user_id: int, nota_id: int, origen, nombre: str, tipo_mime: str = None):
+        """Cifra el flujo `origen`, lo asocia a la nota y devuelve (huella, duplicado)."""
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        lector = _LectorConHuella(
+            origen, self.cifrado.nuevo_hmac(f"adjunto:{db_user_id}"), MAX_ATTACHMENT_BYTES
+        )
+
+        fd, temporal = tempfile.mkstemp(dir=str(self.directorio), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as destino:
+                self.claves.de(db_user_id).cifrar_flujo(lector, destino, FLUJO_CHUNK)
+            huella = lector.huella.hexdigest()
+            ruta = self.ruta(huella)
+            # La fila se escribe antes de publicar o reutilizar el archivo, en la
+            # misma transacción: borrar_sin_uso no puede quitarlo entre medias
+            with self.db.transaccion() as cursor:
+                cursor.execute(
+                    """INSERT OR IGNORE INTO adjuntos (huella, usuario_id, tamaño, tipo_mime)
+                    VALUES (?, ?, ?, ?)""",
+                    (huella, db_user_id, lector.total, tipo_mime)
+                )
+                cursor.execute(
+                    """INSERT OR IGNORE INTO notas_adjuntos (nota_id, huella, nombre)
+                    VALUES (?, ?, ?)""",
+                    (nota_id, huella, nombre)
+                )
+                duplicado = ruta.exists()
+                self.db.registrar_auditoria(
+                    db_user_id,
+                    "ADJUNTO_AÑADIDO",
+                    {"nota_id": nota_id, "tamaño": lector.total, "duplicado": duplicado},
+                    cursor=cursor
+                )
+                if not duplicado:
+                    ruta.parent.mkdir(exist_ok=True)
+                    os.replace(temporal, ruta)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        return huella, duplicado
+
+    def listar(self, db_user_id: int, nota_id: int) -> list:
+        """Adjuntos de una nota del usuario: [(huella, nombre, tamaño, tipo_mime)]."""
+        cursor = self.db.conn.cursor()
+        cursor.execute(
+            """SELECT a.huella, na.nombre, a.tamaño, a.tipo_mime
+            FROM notas_adjuntos na
+            JOIN adjuntos a ON a.huella = na.huella
+            WHERE na.nota_id = ? AND a.usuario_id = ?
+            ORDER BY na.rowid""",
+            (nota_id, db_user_id)
+        )
+        return cursor.fetchall()
+
+    def descifrar_a_temporal(self, db_user_id: int, huella: str) -> str:
+        """Descifra un adjunto a un archivo temporal y devuelve su ruta.
+
+        El llamador debe borrar el archivo cuando termine de usarlo.
+        """
+        fd, temporal = tempfile.mkstemp(prefix="reconotas_adj_")
+        try:
+            with open(self.ruta(huella), "rb") as origen, os.fdopen(fd, "wb") as destino:
+                self.claves.de(db_user_id).descifrar_flujo(origen, destino)
+        except Exception:
+            os.remove(temporal)
+            raise
+        return temporal
+
+    def desvincular(self, cursor, db_user_id: int, nota_id: int) -> list:
+        """Quita los adjuntos de una nota del usuario dentro de la transacción de `cursor`.
+
+        Borra también las filas de los que ya no usa ninguna otra nota y devuelve
+        sus huellas; sus archivos se eliminan con borrar_sin_uso tras confirmar.
+        """
+        cursor.execute(
+            """SELECT na.huella FROM notas_adjuntos na
+            JOIN notas n ON n.id = na.nota_id
+            WHERE na.nota_id = ? AND n.usuario_id = ?""",
+            (nota_id, db_user_id)
+        )
+        huellas = [fila[0] for fila in cursor.fetchall()]
+        if not huellas:
+            return []
+        cursor.execute("DELETE FROM notas_adjuntos WHERE nota_id = ?", (nota_id,))
+        huerfanas = [
+            huella for huella in huellas
+            if not cursor.execute(
+                "SELECT 1 FROM notas_adjuntos WHERE huella = ? LIMIT 1", (huella,)
+            ).fetchone()
+        ]
+        cursor.executemany(
+            "DELETE FROM adjuntos WHERE huella = ?", [(huella,) for huella in huerfanas]
+        )
+        return huerfanas
+
+    def borrar_sin_uso(self, huellas) -> int:
+        """Borra del disco los archivos de `huellas` que siguen sin fila en adjuntos.
+
+        Se comprueba en una transacción porque guardar pudo volver a usar alguno
+        después de que se confirmara su borrado.
+        """
+        with self.db.transaccion() as cursor:
+            sin_uso = [
+                huella for huella in huellas
+                if not cursor.execute(
+                    "SELECT 1 FROM adjuntos WHERE huella = ?", (huella,)
+                ).fetchone()
+            ]
+            self.borrar_archivos(sin_uso)
+        return len(sin_uso)
+
+    def borrar_archivos(self, huellas):
+        """Borra del disco los archivos cifrados (una vez eliminadas sus filas)."""
+        for huella in huellas:
+            try:
+                self.ruta(huella).unlink(missing_ok=True)
+            except OSError as e:
+                self.logger.error(f"No se pudo borrar el adjunto {huella}: {str(e)}")
+
+    def ruta(self, huella: str) -> Path:
+        """Ruta del archivo cifrado de una huella."""
+        return self.directorio / huella[:2] / huella
@@ -0,0 +1,204 @@
+# ------------------------- RETENCIÓN DE AUDITORÍA -------------------------
+"""
+Aplica la política de retención de la tabla auditoria y compacta la base de datos
+
+Las filas caducadas se mueven a archivos mensuales comprimidos
+(auditoria-AAAA-MM.jsonl.gz) y después se borran por lotes.
+
+Uso:
+    python -m services.audit_archive [--solo-compactar] [--vacuum-completo]
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from models.database import SecureDB
+from services.deletion_jobs import DELETION_PAUSE
+
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "archivo_auditoria")
+AUDIT_ARCHIVE_INTERVAL = 6 * 3600
+ARCHIVE_BATCH_ROWS = 1000
+VACUUM_PAGES_PER_RUN = 2000
+TAREA_LOTE = "archivo_auditoria_lote"
+
+# Días que se conserva cada tipo de evento en la base de datos activa.
+# None = no se archiva nunca. "*" aplica a los tipos no listados.
+RETENCION_POR_DEFECTO = {
+    "INICIO_SESION": 30,
+    "NOTA_CREADA": 180,
+    "NOTA_ELIMINADA": 180,
+    "NOTAS_IMPORTADAS": 180,
+    "RECORDATORIO_CREADO": 180,
+    "RECORDATORIO_ELIMINADO": 180,
+    "RESPALDO_EXPORTADO": 365,
+    "GDPR_DELETE_REQUEST": None,
+    "*": 365,
+}
+
+
+def politica_retencion(valor: str = None) -> dict:
+    """Construye la política a partir de AUDIT_RETENTION.
+
+    Formato: "INICIO_SESION=30,NOTA_CREADA=90,*=365"; un valor vacío o "0"
+    desactiva el archivado de ese tipo.
+    """
+    politica = dict(RETENCION_POR_DEFECTO)
+    valor = os.getenv("AUDIT_RETENTION", "") if valor is None else valor
+    for entrada in filter(None, (parte.strip() for parte in valor.split(","))):
+        tipo, _, dias = entrada.partition("=")
+        dias = dias.strip()
+        politica[tipo.strip()] = int(dias) if dias and dias != "0" else None
+    return politica
+
+
+class ArchivadorAuditoria:
+    """Archiva la auditoría caducada y mantiene pequeña la base de datos activa.
+
+    Con un planificador, `lanzar` mueve un lote por tarea y programa el
+    siguiente tras DELETION_PAUSE segundos, así el primer archivado de una tabla
+    enorme no ocupa un hilo del planificador mientras esperan los recordatorios.
+    """
+
+    def __init__(self, db: SecureDB, archive_dir=AUDIT_ARCHIVE_DIR, politica: dict = None,
+                 batch_rows: int = ARCHIVE_BATCH_ROWS, planificador=None):
+        self.db = db
+        self.archive_dir = Path(archive_dir)
+        self.politica = politica if politica is not None else politica_retencion()
+        self.batch_rows = batch_rows
+        self.planificador = planificador
+        self._archivadas = 0
+        self.logger = logging.getLogger("SecureBot.audit_archive")
+
+    def ejecutar(self):
+        """Archiva todo de una vez, compacta y devuelve el número de filas movidas."""
+        archivadas = self.archivar()
+        self.compactar()
+        if archivadas:
+            self.logger.info("Auditoría: %d eventos archivados en %s", archivadas, self.archive_dir)
+        return archivadas
+
+    def archivar(self) -> int:
+        """Mueve a los archivos mensuales las filas que superan su retención."""
+        total = 0
+        while True:
+            filas = self.archivar_lote()
+            if not filas:
+                return total
+            total += filas
+            time.sleep(DELETION_PAUSE)
+
+    def lanzar(self, retraso: float = 0):
+        """Programa el siguiente lote en el planificador."""
+        self.planificador.programar(TAREA_LOTE, time.time() + retraso, self.ejecutar_lote)
+
+    def ejecutar_lote(self) -> int:
+        """Tarea del planificador: un lote y, si queda algo, se vuelve a programar."""
+        filas = self.archivar_lote()
+        if filas:
+            self._archivadas += filas
+            self.lanzar(DELETION_PAUSE)
+            return filas
+        self.compactar()
+        if self._archivadas:
+            self.logger.info(
+                "Auditoría: %d eventos archivados en %s", self._archivadas, self.archive_dir
+            )
+        self._archivadas = 0
+        return 0
+
+    def archivar_lote(self) -> int:
+        """Archiva como mucho batch_rows filas caducadas. Devuelve cuántas movió."""
+        explicitos = [tipo for tipo in self.politica if tipo != "*"]
+        for tipo, dias in self.politica.items():
+            if dias is None:
+                continue
+            if tipo == "*":
+                condicion = "tipo_evento NOT IN ({})".format(",".join("?" * len(explicitos)))
+                params = tuple(explicitos)
+            else:
+                condicion = "tipo_evento = ?"
+                params = (tipo,)
+            filas = self._archivar_condicion(condicion, params, dias)
+            if filas:
+                return filas
+        return 0
+
+    def _archivar_condicion(self, condicion, params, dias):
+        lectura = self.db.conexion_lectura()
+        try:
+            filas = lectura.execute(
+                f"""SELECT id, usuario_id, tipo_evento, detalles, fecha FROM auditoria
+                WHERE {condicion} AND fecha < datetime('now', ?)
+                ORDER BY id LIMIT ?""",
+                params + (f"-{dias} days", self.batch_rows)
+            ).fetchall()
+        finally:
+            lectura.close()
+        if not filas:
+            return 0
+
+        # Primero se escribe el archivo y después se borra: ante un fallo
+        # intermedio un evento puede quedar duplicado, pero nunca se pierde
+        self._escribir_archivo(filas)
+        with self.db.transaccion() as cursor:
+            cursor.executemany(
+                "DELETE FROM auditoria WHERE id = ?", [(fila[0],) for fila in filas]
+            )
+        return len(filas)
+
+    def _escribir_archivo(self, filas):
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        por_mes = defaultdict(list)
+        for fila in filas:
+            por_mes[str(fila[4])[:7]].append(fila)
+
+        for mes, registros in por_mes.items():
+            ruta = self.archive_dir / f"auditoria-{mes}.jsonl.gz"
+            # Cada apertura en modo 'ab' añade un miembro gzip; el archivo sigue siendo válido
+            with gzip.open(ruta, "ab") as out:
+                for event_id, usuario_id, tipo, detalles, fecha in registros:
+                    out.write(json.dumps({
+                        "id": event_id,
+                        "usuario_id": usuario_id,
+                        "tipo_evento": tipo,
+                        "detalles": json.loads(detalles),
+                        "fecha": fecha,
+                    }, ensure_ascii=False).encode("utf-8") + b"\n")
+                out.flush()
+                os.fsync(out.fileobj.fileno())
+
+    def compactar(self, paginas: int = VACUUM_PAGES_PER_RUN):
+        """Libera páginas vacías y trunca el WAL."""
+        if not self.db.vacuum_incremental(paginas):
+            self.logger.debug("auto_vacuum no es INCREMENTAL; ejecuta --vacuum-completo una vez")
+        self.db.checkpoint_wal()
+
+
+def main(argv=None):
+    """Punto de entrada para ejecutar el archivado a mano o desde cron."""
+    parser = argparse.ArgumentParser(description="Retención y compactación de la auditoría")
+    parser.add_argument("--dir", default=AUDIT_ARCHIVE_DIR)
+    parser.add_argument("--solo-compactar", action="store_true")
+    parser.add_argument("--vacuum-completo", action="store_true",
+                        help="Convierte la base a auto_vacuum=INCREMENTAL (bloquea la escritura)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    archivador = ArchivadorAuditoria(SecureDB.get_instance(), args.dir)
+    if args.vacuum_completo:
+        archivador.db.vacuum_completo()
+    if args.solo_compactar:
+        archivador.compactar()
+    else:
+        print(f"✅ {archivador.ejecutar()} eventos archivados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# ------------------------- ESTADÍSTICAS DE AUDITORÍA -------------------------
+"""
+Consultas de informes sobre el resumen diario auditoria_diaria
+
+Uso:
+    python -m services.audit_stats por-tipo [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+    python -m services.audit_stats por-dia [--tipo TIPO] [--desde ...] [--hasta ...]
+    python -m services.audit_stats usuario <telegram_id> [--desde ...] [--hasta ...]
+    python -m services.audit_stats top-usuarios [--tipo TIPO] [--limite N]
+"""
+import argparse
+import sys
+
+from models.database import SecureDB
+
+
+class EstadisticasAuditoria:
+    """Responde a las preguntas de informes sin recorrer la tabla auditoria."""
+
+    def __init__(self, db: SecureDB):
+        self.db = db
+
+    def por_tipo(self, desde: str = None, hasta: str = None) -> list:
+        """Total de eventos por tipo en el rango de días."""
+        filtro, params = self._rango(desde, hasta)
+        return self._consultar(
+            f"""SELECT tipo_evento, SUM(total) FROM auditoria_diaria {filtro}
+            GROUP BY tipo_evento ORDER BY SUM(total) DESC""",
+            params
+        )
+
+    def por_dia(self, tipo: str = None, desde: str = None, hasta: str = None) -> list:
+        """Eventos por día, opcionalmente de un solo tipo."""
+        filtro, params = self._rango(desde, hasta, tipo=tipo)
+        return self._consultar(
+            f"""SELECT dia, SUM(total) FROM auditoria_diaria {filtro}
+            GROUP BY dia ORDER BY dia""",
+            params
+        )
+
+    def por_usuario(self, telegram_id: int, desde: str = None, hasta: str = None) -> list:
+        """Eventos de un usuario agrupados por tipo."""
+        filtro, params = self._rango(desde, hasta)
+        filtro = (filtro + " AND" if filtro else "WHERE") + \
+            " usuario_id = (SELECT id FROM usuarios WHERE telegram_id = ?)"
+        return self._consultar(
+            f"""SELECT tipo_evento, SUM(total) FROM auditoria_diaria {filtro}
+            GROUP BY tipo_evento ORDER BY SUM(total) DESC""",
+            params + (telegram_id,)
+        )
+
+    def top_usuarios(self, tipo: str = None, limite: int = 10) -> list:
+        """Usuarios con más eventos (de un tipo, si se indica)."""
+        filtro = "WHERE a.tipo_evento = ?" if tipo else ""
+        params = (tipo,) if tipo else ()
+        return self._consultar(
+            f"""SELECT u.telegram_id, SUM(a.total) FROM auditoria_diaria a
+            JOIN usuarios u ON u.id = a.usuario_id {filtro}
+            GROUP BY a.usuario_id ORDER BY SUM(a.total) DESC LIMIT ?""",
+            params + (limite,)
+        )
+
+    @staticmethod
+    def _rango(desde, hasta, tipo=None):
+        condiciones, params = [], []
+        if tipo:
+            condiciones.append("tipo_evento = ?")
+            params.append(tipo)
+        if desde:
+            condiciones.append("dia >= ?")
+            params.append(desde)
+        if hasta:
+            condiciones.append("dia <= ?")
+            params.append(hasta)
+        filtro = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+        return filtro, tuple(params)
+
+    def _consultar(self, query, params):
+        conn = self.db.conexion_lectura()
+        try:
+            return conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+
+
+def main(argv=None):
+    """Punto de entrada de la consola de informes."""
+    parser = argparse.ArgumentParser(description="Estadísticas de auditoría de RecoNotas")
+    sub = parser.add_subparsers(dest="informe", required=True)
+
+    for nombre in ("por-tipo", "por-dia", "usuario"):
+        informe = sub.add_parser(nombre)
+        informe.add_argument("--desde", metavar="AAAA-MM-DD")
+        informe.add_argument("--hasta", metavar="AAAA-MM-DD")
+        if nombre == "por-dia":
+            informe.add_argument("--tipo")
+        if nombre == "usuario":
+            informe.add_argument("telegram_id", type=int)
+    top = sub.add_parser("top-usuarios")
+    top.add_argument("--tipo")
+    top.add_argument("--limite", type=int, default=10)
+
+    args = parser.parse_args(argv)
+    stats = EstadisticasAuditoria(SecureDB.get_instance())
+
+    if args.informe == "por-tipo":
+        filas = stats.por_tipo(args.desde, args.hasta)
+    elif args.informe == "por-dia":
+        filas = stats.por_dia(args.tipo, args.desde, args.hasta)
+    elif args.informe == "usuario":
+        filas = stats.por_usuario(args.telegram_id, args.desde, args.hasta)
+    else:
+        filas = stats.top_usuarios(args.tipo, args.limite)
+
+    for clave, total in filas:
+        print(f"{clave}\t{total}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# ------------------------- DEDUPLICACIÓN -------------------------
+"""
+Registro de update_id recientes para no procesar dos veces la misma actualización
+"""
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+from threading import Condition
+
+DEDUP_CAPACITY = 4096
+DEDUP_STATE_KEY = "updates_recientes"
+DEDUP_SAVE_INTERVAL = 2
+# Una foto guardada hace más de esto ya no se carga al arrancar
+DEDUP_WINDOW = 15 * 60
+
+
+class UpdatesRecientes:
+    """Anillo de los últimos `capacidad` update_id más un conjunto para buscar en O(1).
+
+    El anillo solo vive en memoria y evita procesar dos veces una actualización
+    repetida mientras el bot está en marcha. Además lleva las admitidas que aún
+    no terminaron: `confirmado` es el mayor update_id tal que todo lo recibido
+    hasta él ya se procesó (o se descartó), y es lo único que se confirma a
+    Telegram. Si el proceso muere con actualizaciones en cola, Telegram las
+    vuelve a entregar. El mismo valor se guarda en estado_sistema fuera del
+    camino caliente (tarea periódica y parada) para el primer getUpdates tras
+    un reinicio, así la comprobación nunca consulta la base de datos.
+    """
+
+    def __init__(self, db, capacidad: int = DEDUP_CAPACITY):
+        self.db = db
+        self._anillo = deque(maxlen=capacidad)
+        self._vistos = set()
+        # update_id admitidos sin terminar, en orden de llegada (creciente)
+        self._en_curso = OrderedDict()
+        self._maximo = None
+        self._guardado = None
+        self._avance = Condition()
+        self.logger = logging.getLogger("SecureBot.dedup")
+
+    def nuevo(self, update_id: int) -> bool:
+        """Registra el id como en curso y devuelve False si ya se había visto.
+
+        Cada id admitido debe cerrarse con `terminado`.
+        """
+        with self._avance:
+            if self._maximo is None or update_id > self._maximo:
+                self._maximo = update_id
+            if update_id in self._vistos or update_id in self._en_curso:
+                return False
+            self._anotar(update_id)
+            self._en_curso[update_id] = None
+            return True
+
+    def terminado(self, update_id: int):
+        """Marca como procesada (o descartada) una actualización admitida."""
+        with self._avance:
+            if self._en_curso.pop(update_id, False) is None:
+                self._avance.notify_all()
+
+    def confirmado(self):
+        """Mayor update_id que puede confirmarse a Telegram, o None si no se sabe."""
+        with self._avance:
+            return self._confirmado()
+
+    def esperar_avance(self, desde, timeout: float) -> bool:
+        """Espera hasta `timeout` segundos a que `confirmado` supere `desde`."""
+        with self._avance:
+            return self._avance.wait_for(lambda: self._confirmado() != desde, timeout)
+
+    def __len__(self):
+        return len(self._anillo)
+
+    def guardar(self):
+        """Persiste el update_id confirmado si cambió desde la última vez."""
+        with self._avance:
+            ultimo = self._confirmado()
+            if ultimo is None or ultimo == self._guardado:
+                return False
+            self._guardado = ultimo
+        self.db.guardar_estado(
+            DEDUP_STATE_KEY, json.dumps({"fecha": int(time.time()), "ultimo": ultimo})
+        )
+        return True
+
+    def cargar(self, ventana: float = DEDUP_WINDOW):
+        """Devuelve el último update_id guardado si es reciente, o None.
+
+        Pasada la ventana no se usa: Telegram puede reiniciar la numeración
+        tras una semana sin actualizaciones.
+        """
+        valor = self.db.leer_estado(DEDUP_STATE_KEY)
+        if not valor:
+            return None
+        try:
+            foto = json.loads(valor)
+        except ValueError:
+            self.logger.warning("Último update_id ilegible; se ignora")
+            return None
+        if time.time() - foto.get("fecha", 0) > ventana:
+            return None
+        # Las versiones anteriores guardaban la lista completa de ids
+        ultimo = foto.get("ultimo") or max(foto.get("ids") or [0]) or None
+        with self._avance:
+            self._maximo = self._guardado = ultimo
+        return ultimo
+
+    def _confirmado(self):
+        if self._en_curso:
+            return next(iter(self._en_curso)) - 1
+        return self._maximo
+
+    def _anotar(self, update_id):
+        if len(self._anillo) == self._anillo.maxlen:
+            self._vistos.discard(self._anillo[0])
+        self._anillo.append(update_id)
+        self._vistos.add(update_id)
@@ -0,0 +1,135 @@
+# ------------------------- TRABAJOS DE BORRADO -------------------------
+"""
+Borrados masivos por lotes, en segundo plano y reanudables tras un reinicio
+"""
+import json
+import logging
+import time
+from threading import Lock
+
+from services.metrics import REGISTRO
+
+DELETION_BATCH = 500
+# Pausa entre lotes: deja pasar a las escrituras interactivas
+DELETION_PAUSE = 0.05
+DELETION_INTERVAL = 10 * 60
+# Clave en el planificador del siguiente lote; hay como mucho uno programado
+TAREA_LOTE = "trabajos_borrado_lote"
+
+
+class TrabajosBorrado:
+    """Motor de trabajos de borrado con su progreso en la tabla trabajos_borrado.
+
+    Cada tipo de trabajo es una lista de pasos. Un paso es una sentencia DELETE
+    que borra como mucho :lote filas (con los parámetros del trabajo como
+    nombres) o una función f(cursor, parametros, lote) -> filas borradas. Cada
+    lote se confirma en su propia transacción junto con el avance del trabajo,
+    así una transacción nunca retiene el bloqueo mucho tiempo y, tras un
+    reinicio, el trabajo sigue por el mismo paso. Cada lote es una tarea corta
+    del planificador que programa la siguiente: una purga grande nunca ocupa
+    sus hilos mientras esperan recordatorios u otros envíos.
+    """
+
+    def __init__(self, db, planificador, lote: int = DELETION_BATCH,
+                 pausa: float = DELETION_PAUSE, metricas=REGISTRO):
+        self.db = db
+        self.planificador = planificador
+        self.lote = lote
+        self.pausa = pausa
+        self._tipos = {}
+        self._lock = Lock()
+        self.logger = logging.getLogger("SecureBot.deletion")
+        self._borradas = metricas.contador(
+            "reconotas_borrado_filas_total", "Filas eliminadas por trabajos de borrado")
+        metricas.medidor(
+            "reconotas_borrado_pendientes", self.pendientes, "Trabajos de borrado sin terminar")
+
+    def registrar(self, tipo: str, pasos, lote: int = None):
+        """Define los pasos, en orden, de un tipo de trabajo y, si hace falta, su propio lote."""
+        self._tipos[tipo] = (list(pasos), lote or self.lote)
+
+    def encolar(self, cursor, tipo: str, unico: bool = False, **parametros):
+        """Crea un trabajo dentro de la transacción de `cursor`.
+
+        Con `unico`, no hace nada si ya hay otro trabajo pendiente del mismo tipo.
+        """
+        if tipo not in self._tipos:
+            raise ValueError(f"Tipo de trabajo de borrado desconocido: {tipo}")
+        if unico and cursor.execute(
+            "SELECT 1 FROM trabajos_borrado WHERE tipo = ? LIMIT 1", (tipo,)
+        ).fetchone():
+            return
+        cursor.execute(
+            "INSERT INTO trabajos_borrado (tipo, parametros) VALUES (?, ?)",
+            (tipo, json.dumps(parametros))
+        )
+
+    def pendientes(self) -> int:
+        """Trabajos aún sin terminar."""
+        return self.db.conn.execute("SELECT COUNT(*) FROM trabajos_borrado").fetchone()[0]
+
+    def lanzar(self, retraso: float = 0):
+        """Programa el siguiente lote (p. ej. justo después de encolar un trabajo)."""
+        self.planificador.programar(TAREA_LOTE, time.time() + retraso, self.ejecutar_lote)
+
+    def reanudar(self):
+        """Vuelve a intentar los trabajos que fallaron y sigue con los pendientes."""
+        with self.db.transaccion() as cursor:
+            cursor.execute("UPDATE trabajos_borrado SET error = NULL WHERE error IS NOT NULL")
+        self.lanzar()
+
+    def ejecutar_lote(self) -> int:
+        """Avanza un lote del trabajo pendiente más antiguo. Devuelve las filas borradas.
+
+        Si queda trabajo, se vuelve a programar tras `pausa` segundos en lugar de
+        seguir en el mismo hilo del planificador.
+        """
+        with self._lock:
+            trabajo = self.db.conn.execute(
+                """SELECT id, tipo, parametros, paso, borradas FROM trabajos_borrado
+                WHERE error IS NULL ORDER BY id LIMIT 1"""
+            ).fetchone()
+            if trabajo is None:
+                return 0
+            try:
+                filas = self._avanzar(*trabajo)
+            except Exception as e: # pylint: disable=broad-except
+                # Se reintenta en la siguiente pasada periódica (reanudar)
+                self.logger.error(f"Error en el trabajo de borrado {trabajo[0]}: {str(e)}")
+                with self.db.transaccion() as cursor:
+                    cursor.execute(
+                        "UPDATE trabajos_borrado SET error = ? WHERE id = ?", (str(e), trabajo[0])
+                    )
+                filas = 0
+        self.lanzar(self.pausa)
+        return filas
+
+    def _avanzar(self, trabajo_id, tipo, parametros, paso, borradas):
+        if tipo not in self._tipos:
+            raise ValueError(f"Tipo de trabajo de borrado desconocido: {tipo}")
+        pasos, lote = self._tipos[tipo]
+        with self.db.transaccion() as cursor:
+            filas = self._ejecutar_paso(cursor, pasos[paso], json.loads(parametros), lote)
+            borradas += filas
+            # Un lote incompleto indica que el paso terminó
+            if filas < lote:
+                paso += 1
+            if paso < len(pasos):
+                cursor.execute(
+                    "UPDATE trabajos_borrado SET paso = ?, borradas = ? WHERE id = ?",
+                    (paso, borradas, trabajo_id)
+                )
+            else:
+                cursor.execute("DELETE FROM trabajos_borrado WHERE id = ?", (trabajo_id,))
+        self._borradas(filas)
+        if paso == len(pasos):
+            self.logger.info(
+                "Trabajo de borrado %d (%s) terminado: %d filas", trabajo_id, tipo, borradas
+            )
+        return filas
+
+    def _ejecutar_paso(self, cursor, paso, parametros, lote):
+        if callable(paso):
+            return paso(cursor, parametros, lote)
+        cursor.execute(paso, dict(parametros, lote=lote))
+        return max(cursor.rowcount, 0)
@@ -0,0 +1,221 @@
+# ------------------------- DESPACHO DE ACTUALIZACIONES -------------------------
+"""
+Pool de trabajadores que mantiene el orden de las actualizaciones de cada usuario
+"""
+import logging
+import queue
+import time
+from threading import Event, Lock, Thread
+
+from services.metrics import REGISTRO
+
+# Tipos de actualización de Telegram que traen el usuario que la origina
+_CAMPOS_USUARIO = (
+    "message", "edited_message", "callback_query", "inline_query",
+    "chosen_inline_result", "shipping_query", "pre_checkout_query",
+    "poll_answer", "my_chat_member", "chat_member", "chat_join_request",
+)
+_FIN = object()
+
+# Prioridad de una actualización cuando las colas se llenan
+PRIORIDAD_ALTA = "alta"      # escrituras y pasos de un flujo en curso: solo al llegar al tope
+PRIORIDAD_NORMAL = "normal"  # se descartan al llegar al límite de la cola
+PRIORIDAD_BAJA = "baja"      # consultas: se descartan desde la marca de agua alta
+
+
+def usuario_de(update) -> int:
+    """Id del usuario que originó la actualización (o del chat, o el update_id)."""
+    for campo in _CAMPOS_USUARIO:
+        contenido = getattr(update, campo, None)
+        if contenido is None:
+            continue
+        usuario = getattr(contenido, "from_user", None) or getattr(contenido, "user", None)
+        if usuario is not None:
+            return usuario.id
+        chat = getattr(contenido, "chat", None)
+        if chat is not None:
+            return chat.id
+    return update.update_id
+
+
+class DespachadorOrdenado:
+    """Reparte las actualizaciones en N colas según el usuario.
+
+    Cada cola tiene un único hilo, así que las actualizaciones de un mismo
+    usuario se procesan de una en una y en orden (los pasos de
+    register_next_step_handler no se adelantan entre sí), mientras que
+    usuarios de colas distintas se atienden en paralelo.
+
+    Cuando una cola pasa de `marca_alta` se descartan las actualizaciones de
+    prioridad baja, y al llegar a `limite` también las normales. `tope` es el
+    tamaño máximo de cada cola: ahí se descarta cualquier actualización, así la
+    memoria queda acotada aunque llegue una avalancha de escrituras. `al_descartar`
+    recibe cada una para poder responder "ocupado". `al_cambiar_presion(bool)`
+    avisa al entrar en saturación y al bajar de la mitad de la marca, y
+    `al_terminar` recibe cada actualización ya procesada.
+    """
+
+    def __init__(self, procesar, workers: int = 4, metricas=REGISTRO, al_terminar=None,
+                 marca_alta: int = 50, limite: int = 200, tope: int = 1000, clasificar=None,
+                 al_descartar=None, al_cambiar_presion=None):
+        self.procesar = procesar
+        self.al_terminar = al_terminar
+        self.marca_alta = marca_alta
+        self.limite = max(limite, marca_alta)
+        self.tope = max(tope, self.limite)
+        self.clasificar = clasificar
+        self.al_descartar = al_descartar
+        self.al_cambiar_presion = al_cambiar_presion
+        self._colas = [queue.Queue(maxsize=self.tope) for _ in range(max(1, workers))]
+        self._hilos = []
+        self._presion = False
+        self._presion_lock = Lock()
+        self._detenido = Event()
+        self._abandonar = Event()
+        self.logger = logging.getLogger("SecureBot.dispatch")
+
+        self._procesadas = metricas.contador(
+            "reconotas_updates_procesadas_total", "Actualizaciones procesadas")
+        self._errores = metricas.contador(
+            "reconotas_updates_errores_total", "Actualizaciones cuyo manejador falló")
+        self._segundos = metricas.contador(
+            "reconotas_updates_segundos_total", "Tiempo total en manejadores")
+        self._descartadas = {
+            prioridad: metricas.contador(
+                "reconotas_updates_descartadas_total",
+                "Actualizaciones descartadas por saturación", prioridad=prioridad)
+            for prioridad in (PRIORIDAD_ALTA, PRIORIDAD_NORMAL, PRIORIDAD_BAJA)
+        }
+        self._abandonadas = metricas.contador(
+            "reconotas_updates_abandonadas_total",
+            "Actualizaciones en cola sin procesar al agotarse el plazo de parada")
+        for i, cola in enumerate(self._colas):
+            metricas.medidor(
+                "reconotas_cola_updates", cola.qsize,
+                "Actualizaciones en espera por cola", cola=i
+            )
+        metricas.medidor(
+            "reconotas_saturado", lambda: int(self._presion), "1 si se está descartando carga")
+
+    def iniciar(self):
+        """Arranca un hilo por cola."""
+        for i, cola in enumerate(self._colas):
+            hilo = Thread(target=self._bucle, args=(cola,), name=f"updates-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def enviar(self, updates):
+        """Encola cada actualización en la cola de su usuario, o la descarta si no cabe.
+
+        Tras `detener` no encola nada: sin confirmar, Telegram la vuelve a entregar.
+        """
+        if self._detenido.is_set():
+            self._abandonadas(len(updates))
+            return
+        for update in updates:
+            cola = self._colas[hash(usuario_de(update)) % len(self._colas)]
+            profundidad = cola.qsize()
+            prioridad = PRIORIDAD_ALTA
+            if profundidad >= self.marca_alta:
+                prioridad = self.clasificar(update) if self.clasificar else PRIORIDAD_NORMAL
+                if (prioridad == PRIORIDAD_BAJA or
+                        (prioridad == PRIORIDAD_NORMAL and profundidad >= self.limite)):
+                    self._descartar(update, prioridad)
+                    continue
+            try:
+                cola.put_nowait(update)
+            except queue.Full:
+                self._descartar(update, prioridad)
+        self._revisar_presion()
+
+    def pendientes(self) -> int:
+        """Actualizaciones en espera en todas las colas."""
+        return sum(cola.qsize() for cola in self._colas)
+
+    @property
+    def saturado(self) -> bool:
+        """Indica si alguna cola superó la marca de agua alta."""
+        return self._presion
+
+    def _descartar(self, update, prioridad):
+        self._descartadas[prioridad]()
+        if self.al_descartar:
+            try:
+                self.al_descartar(update)
+            except Exception as e: # pylint: disable=broad-except
+                self.logger.error(f"Error respondiendo a una actualización descartada: {str(e)}")
+
+    def _revisar_presion(self):
+        maxima = max(cola.qsize() for cola in self._colas)
+        if self._presion:
+            nueva = maxima > self.marca_alta // 2
+        else:
+            nueva = maxima >= self.marca_alta
+        if nueva == self._presion:
+            return
+        with self._presion_lock:
+            if nueva == self._presion:
+                return
+            self._presion = nueva
+        self.logger.warning(
+            "Colas de actualizaciones %s (máx. %d en espera)",
+            "saturadas: se descarta carga" if nueva else "de nuevo bajo la marca", maxima
+        )
+        if self.al_cambiar_presion:
+            self.al_cambiar_presion(nueva)
+
+    def detener(self, esperar: bool = True, plazo: float = None):
+        """Procesa lo ya encolado durante como mucho `plazo` segundos y detiene los hilos.
+
+        Lo que siga en cola al vencer el plazo se abandona sin procesar (no llega
+        a confirmarse, así que Telegram lo reenvía al arrancar) y solo se espera a
+        los manejadores en curso: ninguno empieza después de que se cierre la base
+        de datos. Nunca se bloquea encolando el fin en una cola llena.
+        """
+        self._detenido.set()
+        for cola in self._colas:
+            try:
+                cola.put_nowait(_FIN)
+            except queue.Full:
+                # El hilo sale al vaciarla (ver _bucle)
+                pass
+        if not esperar:
+            return
+        limite = None if plazo is None else time.monotonic() + plazo
+        for hilo in self._hilos:
+            hilo.join(None if limite is None else max(limite - time.monotonic(), 0))
+        if any(hilo.is_alive() for hilo in self._hilos):
+            self._abandonar.set()
+            pendientes = self.pendientes()
+            self.logger.warning(
+                "Plazo de parada agotado: se abandonan ~%d actualizaciones en cola", pendientes
+            )
+            for hilo in self._hilos:
+                hilo.join()
+
+    def _bucle(self, cola):
+        while True:
+            update = cola.get()
+            if update is _FIN:
+                return
+            if self._abandonar.is_set():
+                self._abandonadas()
+            else:
+                self._atender(update)
+            if self._detenido.is_set() and cola.empty():
+                # Parada con la cola llena: el fin no cupo
+                return
+
+    def _atender(self, update):
+        inicio = time.monotonic()
+        try:
+            self.procesar([update])
+        except Exception as e: # pylint: disable=broad-except
+            self._errores()
+            self.logger.error(f"Error procesando la actualización {update.update_id}: {str(e)}")
+        self._procesadas()
+        self._segundos(time.monotonic() - inicio)
+        if self._presion:
+            self._revisar_presion()
+        if self.al_terminar:
+            self.al_terminar(update)
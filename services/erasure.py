@@ -0,0 +1,93 @@
+# ------------------------- BORRADO DE CUENTAS -------------------------
+"""
+Borrado GDPR en dos fases: destrucción inmediata de la clave y purga por lotes
+"""
+from services.attachments import AlmacenAdjuntos
+from services.deletion_jobs import TrabajosBorrado
+from services.user_keys import ClavesUsuario
+
+TRABAJO_USUARIO = "usuario"
+
+
+def lapida(db_user_id: int) -> int:
+    """telegram_id de un usuario borrado: negativo, nunca choca con uno real."""
+    return -db_user_id
+
+
+class PurgaUsuarios:
+    """Borra los datos de un usuario.
+
+    `borrar` solo destruye su clave, elimina lo que no está cifrado con ella
+    (secreto 2FA, recordatorios y lo que aún va con la clave maestra),
+    sustituye su telegram_id por una lápida y encola el trabajo que elimina el
+    resto, todo en una transacción corta. Lo que queda ya es ilegible;
+    TrabajosBorrado lo elimina después por lotes.
+    """
+
+    def __init__(self, claves: ClavesUsuario, adjuntos: AlmacenAdjuntos,
+                 trabajos: TrabajosBorrado):
+        self.claves = claves
+        self.adjuntos = adjuntos
+        self.trabajos = trabajos
+        trabajos.registrar(TRABAJO_USUARIO, (
+            # Borrar notas arrastra en cascada su historial, etiquetas y enlaces a adjuntos
+            """DELETE FROM notas WHERE id IN (
+                SELECT id FROM notas WHERE usuario_id = :usuario LIMIT :lote)""",
+            self._lote_adjuntos,
+            """DELETE FROM auditoria WHERE id IN (
+                SELECT id FROM auditoria WHERE usuario_id = :usuario LIMIT :lote)""",
+            # WITHOUT ROWID: se borra por días completos del usuario
+            """DELETE FROM auditoria_diaria WHERE usuario_id = :usuario AND dia IN (
+                SELECT dia FROM auditoria_diaria WHERE usuario_id = :usuario LIMIT :lote)""",
+            # Una clave creada por una petición que estaba en curso durante el borrado
+            "DELETE FROM claves_usuario WHERE usuario_id = :usuario",
+            "DELETE FROM usuarios WHERE id = :usuario",
+        ))
+
+    def borrar(self, cursor, db_user_id: int) -> list:
+        """Fase inmediata, dentro de la transacción de `cursor`.
+
+        Devuelve las huellas de los adjuntos legados eliminados; sus archivos se
+        borran con AlmacenAdjuntos.borrar_sin_uso después de confirmar.
+        """
+        huellas = self._borrar_legado(cursor, db_user_id)
+        self.claves.destruir(cursor, db_user_id)
+        cursor.execute("DELETE FROM auth_2fa WHERE usuario_id = ?", (db_user_id,))
+        # Los textos de los recordatorios no van cifrados: no pueden esperar a la purga
+        cursor.execute("DELETE FROM recordatorios WHERE usuario_id = ?", (db_user_id,))
+        cursor.execute("DELETE FROM recordatorios_archivo WHERE usuario_id = ?", (db_user_id,))
+        cursor.execute(
+            "UPDATE usuarios SET telegram_id = ? WHERE id = ?", (lapida(db_user_id), db_user_id)
+        )
+        self.trabajos.encolar(cursor, TRABAJO_USUARIO, usuario=db_user_id)
+        return huellas
+
+    def _borrar_legado(self, cursor, db_user_id):
+        """Elimina ya lo que sigue cifrado con la clave maestra (RecifradoLegado no llegó)."""
+        cursor.execute(
+            "SELECT huella FROM adjuntos WHERE usuario_id = ? AND legado = 1", (db_user_id,)
+        )
+        huellas = [fila[0] for fila in cursor.fetchall()]
+        cursor.executemany("DELETE FROM notas_adjuntos WHERE huella = ?", [(h,) for h in huellas])
+        cursor.executemany("DELETE FROM adjuntos WHERE huella = ?", [(h,) for h in huellas])
+        cursor.execute(
+            """DELETE FROM notas_historial WHERE legado = 1 AND nota_id IN (
+                SELECT id FROM notas WHERE usuario_id = ?)""",
+            (db_user_id,)
+        )
+        # Arrastra en cascada su historial, etiquetas y enlaces a adjuntos
+        cursor.execute("DELETE FROM notas WHERE usuario_id = ? AND legado = 1", (db_user_id,))
+        # Siguen siendo legibles con la clave maestra: si la transacción se deshace,
+        # filas y archivos deben seguir juntos, así que no se tocan hasta confirmar
+        return huellas
+
+    def _lote_adjuntos(self, cursor, parametros, lote):
+        cursor.execute(
+            "SELECT huella FROM adjuntos WHERE usuario_id = ? LIMIT ?",
+            (parametros["usuario"], lote)
+        )
+        huellas = [fila[0] for fila in cursor.fetchall()]
+        cursor.executemany("DELETE FROM adjuntos WHERE huella = ?", [(h,) for h in huellas])
+        # Sin la clave del usuario ya son ilegibles: da igual si la transacción se deshace
+        self.adjuntos.borrar_archivos(huellas)
+        return len(huellas)
@@ -0,0 +1,182 @@
+# ------------------------- EXPORTACIÓN (/backup) -------------------------
+"""
+Genera la copia de seguridad de un usuario recorriendo sus datos por bloques
+"""
+import json
+import os
+import tempfile
+import zipfile
+from datetime import datetime
+
+from models.encryption import CifradoManager
+from services.user_keys import ClavesUsuario
+
+EXPORT_CHUNK_ROWS = 200
+PASSPHRASE_MIN_LENGTH = 8
+CABECERA_CIFRADO = b"RNBK1"
+SALT_BYTES = 16
+
+
+class ExportadorUsuario:
+    """Escribe notas, recordatorios y ajustes de un usuario en un ZIP temporal.
+
+    Las filas se leen con fetchmany sobre una conexión de solo lectura, de modo que
+    la memoria usada no depende del tamaño de la cuenta.
+    """
+
+    def __init__(self, db, claves: ClavesUsuario, chunk_rows: int = EXPORT_CHUNK_ROWS):
+        self.db = db
+        self.claves = claves
+        self.chunk_rows = chunk_rows
+
+    def exportar(self, db_user_id: int, passphrase: str = None) -> tuple:
+        """Crea el archivo de respaldo y devuelve (ruta, resumen).
+
+        El llamador es responsable de borrar el archivo cuando lo haya enviado.
+        """
+        fd, zip_path = tempfile.mkstemp(prefix="reconotas_", suffix=".zip")
+        os.close(fd)
+        try:
+            resumen = self._escribir_zip(db_user_id, zip_path)
+            if not passphrase:
+                return zip_path, resumen
+
+            fd, enc_path = tempfile.mkstemp(prefix="reconotas_", suffix=".zip.enc")
+            os.close(fd)
+            try:
+                self._cifrar_con_passphrase(zip_path, enc_path, passphrase)
+            except Exception:
+                os.remove(enc_path)
+                raise
+            os.remove(zip_path)
+            return enc_path, resumen
+        except Exception:
+            if os.path.exists(zip_path):
+                os.remove(zip_path)
+            raise
+
+    def _escribir_zip(self, db_user_id, zip_path):
+        conn = self.db.conexion_lectura()
+        try:
+            # Una única transacción de lectura da una foto coherente de todas las tablas
+            conn.execute("BEGIN")
+            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                ajustes = self._exportar_ajustes(conn, db_user_id)
+                with zf.open("notas.jsonl", "w") as out:
+                    notas = self._exportar_notas(conn, db_user_id, out)
+                with zf.open("recordatorios.jsonl", "w") as out:
+                    recordatorios = self._exportar_recordatorios(conn, db_user_id, out)
+
+                resumen = {
+                    "version": 1,
+                    "generado": datetime.now().isoformat(timespec="seconds"),
+                    "notas": notas,
+                    "recordatorios": recordatorios,
+                }
+                zf.writestr("ajustes.json", json.dumps(ajustes, ensure_ascii=False, indent=2))
+                zf.writestr("manifest.json", json.dumps(resumen, indent=2))
+            conn.execute("COMMIT")
+            return resumen
+        finally:
+            conn.close()
+
+    def _recorrer(self, conn, query, params):
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(self.chunk_rows)
+            if not rows:
+                return
+            yield from rows
+
+    def _exportar_notas(self, conn, db_user_id, out):
+        cifrador = self.claves.de(db_user_id)
+        total = 0
+        for note_id, encrypted, creada, modificada in self._recorrer(
+            conn,
+            """SELECT id, contenido_cifrado, fecha_creacion, fecha_modificacion
+            FROM notas WHERE usuario_id = ? ORDER BY id""",
+            (db_user_id,)
+        ):
+            _escribir_linea(out, {
+                "id": note_id,
+                "texto": cifrador.descifrar(encrypted),
+                "fecha_creacion": creada,
+                "fecha_modificacion": modificada,
+            })
+            total += 1
+        return total
+
+    def _exportar_recordatorios(self, conn, db_user_id, out):
+        total = 0
+        for reminder_id, texto, hora, recurrente, creado, completado in self._recorrer(
+            conn,
+            """SELECT id, texto, hora_recordatorio, recurrente, fecha_creacion, completado
+            FROM recordatorios WHERE usuario_id = ?
+            UNION ALL
+            SELECT id, texto, hora_recordatorio, recurrente, fecha_creacion, 1
+            FROM recordatorios_archivo WHERE usuario_id = ?
+            ORDER BY id""",
+            (db_user_id, db_user_id)
+        ):
+            _escribir_linea(out, {
+                "id": reminder_id,
+                "texto": texto,
+                "hora": hora,
+                "recurrente": bool(recurrente),
+                "fecha_creacion": creado,
+                "completado": bool(completado),
+            })
+            total += 1
+        return total
+
+    def _exportar_ajustes(self, conn, db_user_id):
+        row = conn.execute(
+            """SELECT telegram_id, fecha_registro, lenguaje, consentimiento_gdpr
+            FROM usuarios WHERE id = ?""",
+            (db_user_id,)
+        ).fetchone()
+        tiene_2fa = conn.execute(
+            "SELECT 1 FROM auth_2fa WHERE usuario_id = ? AND activado = 1", (db_user_id,)
+        ).fetchone() is not None
+        telegram_id, fecha_registro, lenguaje, consentimiento = row
+        # El secreto TOTP no se exporta nunca
+        return {
+            "telegram_id": telegram_id,
+            "fecha_registro": fecha_registro,
+            "lenguaje": lenguaje,
+            "consentimiento_gdpr": bool(consentimiento),
+            "2fa_activado": tiene_2fa,
+        }
+
+    def _cifrar_con_passphrase(self, origen_path, destino_path, passphrase):
+        salt = os.urandom(SALT_BYTES)
+        cifrador = CifradoManager(salt, passphrase)
+        with open(origen_path, "rb") as origen, open(destino_path, "wb") as destino:
+            destino.write(CABECERA_CIFRADO)
+            destino.write(salt)
+            cifrador.cifrar_flujo(origen, destino)
+
+
+def descifrar_respaldo(origen_path: str, destino_path: str, passphrase: str):
+    """Recupera el ZIP original de un respaldo cifrado con passphrase."""
+    with open(origen_path, "rb") as origen, open(destino_path, "wb") as destino:
+        if origen.read(len(CABECERA_CIFRADO)) != CABECERA_CIFRADO:
+            raise ValueError("El archivo no es un respaldo cifrado de RecoNotas")
+        salt = origen.read(SALT_BYTES)
+        CifradoManager(salt, passphrase).descifrar_flujo(origen, destino)
+
+
+def _escribir_linea(out, registro):
+    out.write(json.dumps(registro, ensure_ascii=False).encode("utf-8"))
+    out.write(b"\n")
+
+
+if __name__ == "__main__":
+    import getpass
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Uso: python -m services.export <respaldo.zip.enc> <salida.zip>")
+        sys.exit(1)
+    descifrar_respaldo(sys.argv[1], sys.argv[2], getpass.getpass("Contraseña del respaldo: "))
+    print(f"✅ Respaldo descifrado en {sys.argv[2]}")
@@ -0,0 +1,145 @@
+# ------------------------- MIGRACIÓN A CLAVES DE USUARIO -------------------------
+"""
+Vuelve a cifrar con la clave de cada usuario lo guardado con la clave maestra
+"""
+import base64
+import logging
+import os
+import tempfile
+
+from services.attachments import AlmacenAdjuntos
+from services.deletion_jobs import TrabajosBorrado
+from services.tags import IndiceEtiquetas
+from services.user_keys import ClavesUsuario
+
+TRABAJO_RECIFRADO = "recifrado"
+TRABAJO_RECIFRADO_ADJUNTOS = "recifrado_adjuntos"
+# Cada adjunto puede ocupar hasta 20 MB: lotes pequeños para no retener el bloqueo
+RECIFRADO_ADJUNTOS_LOTE = 10
+
+
+class RecifradoLegado:
+    """Pasa a la clave del usuario las filas con legado = 1 (notas, historial y adjuntos).
+
+    Mientras quede alguna, destruir la clave no basta para borrar a un usuario:
+    PurgaUsuarios elimina esas filas de inmediato. Se ejecuta como trabajos de
+    TrabajosBorrado, por lotes y reanudable tras un reinicio. Los usuarios ya
+    borrados (lápida) se saltan: su purga elimina sus filas y no deben recibir
+    una clave nueva.
+    """
+
+    def __init__(self, db, claves: ClavesUsuario, adjuntos: AlmacenAdjuntos,
+                 etiquetas: IndiceEtiquetas, trabajos: TrabajosBorrado):
+        self.db = db
+        self.claves = claves
+        self.adjuntos = adjuntos
+        self.etiquetas = etiquetas
+        self.trabajos = trabajos
+        self.logger = logging.getLogger("SecureBot.key_migration")
+        trabajos.registrar(TRABAJO_RECIFRADO, (self._lote_notas, self._lote_historial))
+        trabajos.registrar(
+            TRABAJO_RECIFRADO_ADJUNTOS, (self._lote_adjuntos,), lote=RECIFRADO_ADJUNTOS_LOTE
+        )
+
+    def iniciar(self):
+        """Encola la migración si queda algo cifrado con la clave maestra."""
+        pendientes = {
+            TRABAJO_RECIFRADO: self._queda("notas") or self._queda("notas_historial"),
+            TRABAJO_RECIFRADO_ADJUNTOS: self._queda("adjuntos"),
+        }
+        if not any(pendientes.values()):
+            return
+        with self.db.transaccion() as cursor:
+            for tipo, queda in pendientes.items():
+                if queda:
+                    self.trabajos.encolar(cursor, tipo, unico=True)
+        self.trabajos.lanzar()
+
+    def _queda(self, tabla):
+        return self.db.conn.execute(
+            f"SELECT 1 FROM {tabla} WHERE legado = 1 LIMIT 1"
+        ).fetchone() is not None
+
+    def _lote_notas(self, cursor, _parametros, lote):
+        cursor.execute(
+            """SELECT n.id, n.usuario_id, n.contenido_cifrado, n.etiquetado
+            FROM notas n JOIN usuarios u ON u.id = n.usuario_id
+            WHERE n.legado = 1 AND u.telegram_id > 0
+            ORDER BY n.id LIMIT ?""",
+            (lote,)
+        )
+        filas = cursor.fetchall()
+        for nota_id, db_user_id, contenido, etiquetado in filas:
+            cifrador = self.claves.de(db_user_id, cursor=cursor)
+            try:
+                nuevo = cifrador.recifrar(contenido)
+                if not etiquetado:
+                    # indexar_pendientes solo sabe descifrar con la clave maestra
+                    self.etiquetas.indexar(
+                        cursor, db_user_id, nota_id, cifrador.descifrar(contenido)
+                    )
+            except ValueError as e:
+                # Ilegible con cualquier clave: no hay nada que migrar
+                self.logger.error(f"Nota {nota_id} ilegible, no se migra: {str(e)}")
+                nuevo = contenido
+            cursor.execute(
+                "UPDATE notas SET contenido_cifrado = ?, legado = 0 WHERE id = ?",
+                (nuevo, nota_id)
+            )
+        return len(filas)
+
+    def _lote_historial(self, cursor, _parametros, lote):
+        cursor.execute(
+            """SELECT h.id, n.usuario_id, h.contenido_cifrado
+            FROM notas_historial h
+            JOIN notas n ON n.id = h.nota_id
+            JOIN usuarios u ON u.id = n.usuario_id
+            WHERE h.legado = 1 AND u.telegram_id > 0
+            ORDER BY h.id LIMIT ?""",
+            (lote,)
+        )
+        filas = cursor.fetchall()
+        for version_id, db_user_id, contenido in filas:
+            # El historial guarda el token decodificado (sin base64)
+            try:
+                nuevo = base64.urlsafe_b64decode(
+                    self.claves.de(db_user_id, cursor=cursor).recifrar(
+                        base64.urlsafe_b64encode(contenido))
+                )
+            except ValueError as e:
+                self.logger.error(f"Versión {version_id} ilegible, no se migra: {str(e)}")
+                nuevo = contenido
+            cursor.execute(
+                "UPDATE notas_historial SET contenido_cifrado = ?, legado = 0 WHERE id = ?",
+                (nuevo, version_id)
+            )
+        return len(filas)
+
+    def _lote_adjuntos(self, cursor, _parametros, lote):
+        cursor.execute(
+            """SELECT a.huella, a.usuario_id
+            FROM adjuntos a JOIN usuarios u ON u.id = a.usuario_id
+            WHERE a.legado = 1 AND u.telegram_id > 0
+            LIMIT ?""",
+            (lote,)
+        )
+        filas = cursor.fetchall()
+        for huella, db_user_id in filas:
+            try:
+                self._recifrar_archivo(huella, self.claves.de(db_user_id, cursor=cursor))
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Adjunto {huella} ilegible, no se migra: {str(e)}")
+            cursor.execute("UPDATE adjuntos SET legado = 0 WHERE huella = ?", (huella,))
+        return len(filas)
+
+    def _recifrar_archivo(self, huella, cifrador):
+        # Dentro de la transacción del lote: guardar y borrar_sin_uso no lo tocan a la vez
+        ruta = self.adjuntos.ruta(huella)
+        fd, temporal = tempfile.mkstemp(dir=str(ruta.parent), suffix=".tmp")
+        try:
+            with open(ruta, "rb") as origen, os.fdopen(fd, "wb") as destino:
+                cifrador.recifrar_flujo(origen, destino)
+            os.replace(temporal, ruta)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
@@ -0,0 +1,141 @@
+# ------------------------- TECLADOS -------------------------
+"""
+Teclados prefabricados por idioma con su JSON serializado una sola vez
+"""
+from types import MappingProxyType
+
+import telebot
+
+# Acción del enrutador -> etiqueta original (msgid) del botón
+MENU_PRINCIPAL = (
+    ("add_note", "📝 Añadir Nota"),
+    ("list_notes", "📖 Listar Notas"),
+    ("delete_note", "🗑 Eliminar Nota"),
+    ("add_reminder", "⏰ Añadir Recordatorio"),
+    ("list_reminders", "🔄 Listar Recordatorios"),
+    ("delete_reminder", "❌ Eliminar Recordatorio"),
+    ("settings", "⚙️ Configuración"),
+)
+
+IDIOMAS = (
+    ("en", "English"),
+    ("es", "Español"),
+    ("pt", "Português"),
+)
+
+# Minutos de cada botón "posponer" -> etiqueta original (msgid)
+POSPONER = (
+    (10, "⏰ 10 min"),
+    (60, "⏰ 1 h"),
+)
+
+
+class _JsonCacheado:
+    """Serializa el teclado la primera vez y reutiliza el JSON en cada envío.
+
+    Los teclados de esta caché no se modifican después de construirse.
+    """
+    _json = None
+
+    def to_json(self):
+        if self._json is None:
+            self._json = super().to_json()
+        return self._json
+
+
+class TecladoRespuesta(_JsonCacheado, telebot.types.ReplyKeyboardMarkup):
+    """ReplyKeyboardMarkup con JSON cacheado"""
+
+
+class TecladoInline(_JsonCacheado, telebot.types.InlineKeyboardMarkup):
+    """InlineKeyboardMarkup con JSON cacheado"""
+
+
+class _Juego:
+    """Teclados ya construidos de todos los idiomas"""
+
+    def __init__(self, traducciones, idiomas):
+        self.menu = {}
+        self.confirmar_borrado = {}
+        acciones = {}
+        for lang in idiomas:
+            _ = traducciones.gettext(lang)
+
+            menu = TecladoRespuesta(resize_keyboard=True, row_width=2)
+            etiquetas = []
+            for accion, etiqueta in MENU_PRINCIPAL:
+                traducida = _(etiqueta)
+                etiquetas.append(traducida)
+                acciones[traducida.lower()] = accion
+                acciones[etiqueta.lower()] = accion
+            menu.add(*etiquetas)
+            menu.to_json()
+            self.menu[lang] = menu
+
+            confirmar = TecladoInline()
+            confirmar.row(
+                telebot.types.InlineKeyboardButton(
+                    _("Sí, eliminar todo"), callback_data="confirm_clear"),
+                telebot.types.InlineKeyboardButton(
+                    _("Cancelar"), callback_data="cancel_clear")
+            )
+            confirmar.to_json()
+            self.confirmar_borrado[lang] = confirmar
+
+        self.idiomas = TecladoInline()
+        self.idiomas.row(*[
+            telebot.types.InlineKeyboardButton(nombre, callback_data=f"setlang_{lang}")
+            for lang, nombre in IDIOMAS
+        ])
+        self.idiomas.to_json()
+        self.acciones = MappingProxyType(acciones)
+
+
+class Teclados:
+    """Caché de teclados por idioma.
+
+    El enrutador del menú usa las mismas etiquetas traducidas con las que se
+    construyen los botones, así cualquier idioma llega a la misma acción.
+    """
+
+    def __init__(self, traducciones, idiomas, default_lang):
+        self.traducciones = traducciones
+        self.idiomas_soportados = list(idiomas)
+        self.default_lang = default_lang
+        self._juego = _Juego(traducciones, self.idiomas_soportados)
+
+    def reconstruir(self):
+        """Vuelve a construir todos los teclados (p. ej. tras recargar catálogos)."""
+        self._juego = _Juego(self.traducciones, self.idiomas_soportados)
+
+    def menu_principal(self, lang: str):
+        """Teclado del menú principal en el idioma indicado."""
+        juego = self._juego
+        return juego.menu.get(lang) or juego.menu[self.default_lang]
+
+    def selector_idioma(self):
+        """Botones inline para elegir idioma."""
+        return self._juego.idiomas
+
+    def confirmar_borrado(self, lang: str):
+        """Botones inline de confirmación de /clearall."""
+        juego = self._juego
+        return juego.confirmar_borrado.get(lang) or juego.confirmar_borrado[self.default_lang]
+
+    def recordatorio(self, lang: str, reminder_id: int):
+        """Botones posponer / hecho de un recordatorio enviado.
+
+        Llevan el id en callback_data, así que se construyen en cada envío.
+        """
+        _ = self.traducciones.gettext(lang)
+        markup = telebot.types.InlineKeyboardMarkup()
+        markup.row(*[
+            telebot.types.InlineKeyboardButton(
+                _(etiqueta), callback_data=f"snooze_{reminder_id}_{minutos}")
+            for minutos, etiqueta in POSPONER
+        ], telebot.types.InlineKeyboardButton(_("✅ Hecho"), callback_data=f"done_{reminder_id}"))
+        return markup
+
+    def accion_menu(self, texto: str):
+        """Acción asociada a la etiqueta de un botón del menú, o None."""
+        return self._juego.acciones.get((texto or "").strip().lower())
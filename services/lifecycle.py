@@ -0,0 +1,95 @@
+# ------------------------- CICLO DE VIDA -------------------------
+"""
+Parada ordenada del proceso: deja de aceptar trabajo, drena y cierra
+"""
+import logging
+import os
+import signal
+import time
+from threading import Event, Lock, Thread
+
+# Segundos que puede durar la parada completa antes de abandonar lo pendiente
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "30"))
+
+
+class CicloVida:
+    """Coordina la parada del bot ante SIGTERM/SIGINT.
+
+    `al_parar` registra lo que corta la entrada de trabajo (se ejecuta dentro del
+    manejador de la señal y debe ser inmediato). `al_drenar` registra los pasos
+    de drenado y cierre, que `detener` ejecuta en orden de registro compartiendo
+    un único plazo: un paso que no acaba a tiempo se abandona y se pasa al
+    siguiente, para que el volcado final de la base de datos ocurra siempre.
+    """
+
+    def __init__(self, plazo: float = SHUTDOWN_TIMEOUT):
+        self.plazo = plazo
+        self._parar = []
+        self._drenar = []
+        self._parada = Event()
+        self._lock = Lock()
+        self._detenido = False
+        self.logger = logging.getLogger("SecureBot.lifecycle")
+
+    def al_parar(self, funcion):
+        """Registra una función que deja de aceptar trabajo nuevo."""
+        self._parar.append(funcion)
+
+    def al_drenar(self, nombre: str, funcion):
+        """Registra un paso de drenado o cierre."""
+        self._drenar.append((nombre, funcion))
+
+    def instalar_senales(self):
+        """Atiende SIGTERM y SIGINT con una parada ordenada (solo en el hilo principal)."""
+        for senal in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(senal, self._manejar_senal)
+
+    @property
+    def parando(self) -> bool:
+        """Indica si ya se pidió la parada."""
+        return self._parada.is_set()
+
+    def solicitar_parada(self, motivo: str = "solicitud"):
+        """Deja de aceptar trabajo; el drenado lo hace `detener`."""
+        if self._parada.is_set():
+            return
+        self._parada.set()
+        self.logger.info("Parada solicitada (%s)", motivo)
+        for funcion in self._parar:
+            try:
+                funcion()
+            except Exception as e: # pylint: disable=broad-except
+                self.logger.error(f"Error al dejar de aceptar trabajo: {str(e)}")
+
+    def detener(self):
+        """Ejecuta los pasos de drenado dentro del plazo. Solo la primera llamada tiene efecto."""
+        with self._lock:
+            if self._detenido:
+                return
+            self._detenido = True
+        self.solicitar_parada()
+
+        limite = time.monotonic() + self.plazo
+        for nombre, funcion in self._drenar:
+            restante = limite - time.monotonic()
+            hilo = Thread(
+                target=self._ejecutar, args=(nombre, funcion), name=f"drenar-{nombre}", daemon=True
+            )
+            hilo.start()
+            # Aunque el plazo se haya agotado, cada paso tiene al menos un segundo
+            hilo.join(max(restante, 1.0))
+            if hilo.is_alive():
+                self.logger.warning("Parada: '%s' no terminó a tiempo; se abandona", nombre)
+        self.logger.info("Parada completada")
+
+    def _ejecutar(self, nombre, funcion):
+        inicio = time.monotonic()
+        try:
+            funcion()
+        except Exception as e: # pylint: disable=broad-except
+            self.logger.error(f"Error en el paso de parada {nombre}: {str(e)}")
+            return
+        self.logger.debug("Parada: '%s' en %.2f s", nombre, time.monotonic() - inicio)
+
+    def _manejar_senal(self, signum, _frame):
+        self.solicitar_parada(signal.Signals(signum).name)
@@ -0,0 +1,107 @@
+# ------------------------- MÉTRICAS -------------------------
+"""
+Registro de métricas del proceso en formato de texto de Prometheus
+
+Si METRICS_PORT está definido, el bot las sirve en http://127.0.0.1:<puerto>/metrics.
+"""
+import logging
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+
+def _clave(nombre: str, etiquetas: dict) -> str:
+    if not etiquetas:
+        return nombre
+    pares = ",".join(f'{k}="{v}"' for k, v in sorted(etiquetas.items()))
+    return f"{nombre}{{{pares}}}"
+
+
+class Metricas:
+    """Contadores y medidores en memoria.
+
+    Los medidores se calculan al leerlos (p. ej. el tamaño de una cola), así
+    que registrarlos no añade trabajo al camino caliente.
+    """
+
+    def __init__(self):
+        self._contadores = {}
+        self._medidores = {}
+        self._ayuda = {}
+        self._lock = Lock()
+
+    def contador(self, nombre: str, ayuda: str = "", **etiquetas):
+        """Devuelve una función que suma al contador (1 por defecto)."""
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            self._contadores.setdefault(clave, 0)
+            self._ayuda.setdefault(nombre, ("counter", ayuda))
+
+        def incrementar(valor=1):
+            with self._lock:
+                self._contadores[clave] += valor
+        return incrementar
+
+    def medidor(self, nombre: str, funcion, ayuda: str = "", **etiquetas):
+        """Registra un medidor cuyo valor es `funcion()` en el momento de leerlo."""
+        with self._lock:
+            self._medidores[_clave(nombre, etiquetas)] = funcion
+            self._ayuda.setdefault(nombre, ("gauge", ayuda))
+
+    def instantanea(self) -> dict:
+        """Valores actuales de todas las métricas."""
+        with self._lock:
+            valores = dict(self._contadores)
+            medidores = list(self._medidores.items())
+        for clave, funcion in medidores:
+            try:
+                valores[clave] = funcion()
+            except Exception: # pylint: disable=broad-except
+                continue
+        return valores
+
+    def a_texto(self) -> str:
+        """Exposición en formato de texto de Prometheus."""
+        valores = self.instantanea()
+        lineas = []
+        for nombre, (tipo, ayuda) in sorted(self._ayuda.items()):
+            if ayuda:
+                lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for clave in sorted(valores):
+                if clave == nombre or clave.startswith(nombre + "{"):
+                    lineas.append(f"{clave} {valores[clave]}")
+        return "\n".join(lineas) + "\n"
+
+    def servir(self, puerto: int = METRICS_PORT, host: str = METRICS_HOST):
+        """Sirve /metrics en un hilo de fondo. Devuelve el servidor, o None si puerto es 0."""
+        if not puerto:
+            return None
+        registro = self
+
+        class _Manejador(BaseHTTPRequestHandler):
+            def do_GET(self): # pylint: disable=invalid-name
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                cuerpo = registro.a_texto().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args): # pylint: disable=arguments-differ
+                pass
+
+        servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+        Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+        logging.getLogger("SecureBot.metrics").info("Métricas en http://%s:%d/metrics", host, puerto)
+        return servidor
+
+
+# Registro compartido por todo el proceso
+REGISTRO = Metricas()
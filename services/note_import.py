@@ -0,0 +1,98 @@
+# ------------------------- IMPORTACIÓN DE NOTAS -------------------------
+"""
+Convierte archivos de texto, JSON o Markdown en una lista de notas
+"""
+import json
+import re
+
+MAX_NOTE_LENGTH = 2000
+MAX_IMPORT_NOTES = 500
+MAX_IMPORT_BYTES = 1024 * 1024
+
+_SEPARADOR = re.compile(r'^\s*(?:-{3,}|\*{3,}|_{3,})\s*$', re.MULTILINE)
+_ENCABEZADO_MD = re.compile(r'^(?=#{1,6}\s)', re.MULTILINE)
+_LINEAS_EN_BLANCO = re.compile(r'\n\s*\n')
+_CLAVES_TEXTO = ('text', 'content', 'contenido', 'texto', 'body', 'note', 'nota')
+_CLAVES_TITULO = ('title', 'titulo', 'título')
+
+
+class FormatoImportacionError(ValueError):
+    """Error de formato en el archivo a importar"""
+
+
+def parse_notes(file_name: str, data: bytes) -> tuple:
+    """Divide el archivo en notas.
+
+    Devuelve (notas_validas, omitidas), donde omitidas cuenta las notas que
+    superan MAX_NOTE_LENGTH o el límite MAX_IMPORT_NOTES.
+    """
+    if len(data) > MAX_IMPORT_BYTES:
+        raise FormatoImportacionError("archivo demasiado grande")
+
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        raise FormatoImportacionError("el archivo no está en UTF-8") from e
+
+    text = text.replace('\r\n', '\n')
+    name = (file_name or '').lower()
+
+    if name.endswith('.json'):
+        candidates = _parse_json(text)
+    elif name.endswith(('.md', '.markdown')):
+        candidates = _parse_markdown(text)
+    else:
+        candidates = _parse_text(text)
+
+    notes = []
+    skipped = 0
+    for note in candidates:
+        note = note.strip()
+        if not note:
+            continue
+        if len(note) > MAX_NOTE_LENGTH:
+            skipped += 1
+            continue
+        notes.append(note)
+
+    if len(notes) > MAX_IMPORT_NOTES:
+        skipped += len(notes) - MAX_IMPORT_NOTES
+        notes = notes[:MAX_IMPORT_NOTES]
+
+    return notes, skipped
+
+
+def _parse_json(text):
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise FormatoImportacionError("JSON inválido") from e
+
+    if isinstance(data, dict):
+        data = data.get('notes') or data.get('notas') or []
+    if not isinstance(data, list):
+        raise FormatoImportacionError("se esperaba una lista de notas")
+
+    notes = []
+    for item in data:
+        if isinstance(item, str):
+            notes.append(item)
+        elif isinstance(item, dict):
+            body = next((item[k] for k in _CLAVES_TEXTO if isinstance(item.get(k), str)), '')
+            title = next((item[k] for k in _CLAVES_TITULO if isinstance(item.get(k), str)), '')
+            notes.append(f"{title}\n{body}" if title and body else title or body)
+    return notes
+
+
+def _parse_markdown(text):
+    if _SEPARADOR.search(text):
+        return _SEPARADOR.split(text)
+    if _ENCABEZADO_MD.search(text):
+        return _ENCABEZADO_MD.split(text)
+    return _LINEAS_EN_BLANCO.split(text)
+
+
+def _parse_text(text):
+    if _SEPARADOR.search(text):
+        return _SEPARADOR.split(text)
+    return _LINEAS_EN_BLANCO.split(text)
@@ -0,0 +1,136 @@
+# ------------------------- BUZÓN DE SALIDA -------------------------
+"""
+Mensajes a Telegram guardados en la tabla outbox y enviados por lotes
+"""
+import json
+import logging
+import os
+import time
+from threading import Lock
+
+from telebot.apihelper import ApiTelegramException
+
+from services.metrics import REGISTRO
+
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "50"))
+OUTBOX_POLL_INTERVAL = 15
+OUTBOX_RETRY_BASE = 5
+OUTBOX_MAX_ATTEMPTS = 8
+
+
+class BuzonSalida:
+    """Cola persistente de mensajes salientes (patrón transactional outbox).
+
+    `encolar` escribe el mensaje con el cursor del llamador, así que el cambio
+    de datos y su aviso se confirman o se deshacen juntos. `enviar_pendientes`
+    los entrega al menos una vez: cada mensaje se borra solo después de
+    enviarse, y los fallos temporales se reintentan con espera exponencial.
+    """
+
+    def __init__(self, db, bot, lote: int = OUTBOX_BATCH, metricas=REGISTRO):
+        self.db = db
+        self.bot = bot
+        self.lote = lote
+        self._estado = Lock()
+        self._enviando = False
+        self._repetir = False
+        self.logger = logging.getLogger("SecureBot.outbox")
+
+        self._enviados = metricas.contador(
+            "reconotas_outbox_enviados_total", "Mensajes del outbox entregados")
+        self._reintentos = metricas.contador(
+            "reconotas_outbox_reintentos_total", "Envíos del outbox que se reintentarán")
+        self._descartados = metricas.contador(
+            "reconotas_outbox_descartados_total", "Mensajes del outbox abandonados")
+
+    def encolar(self, cursor, chat_id: int, texto: str, reply_markup=None, responder_a: int = None):
+        """Guarda un mensaje dentro de la transacción de `cursor`."""
+        opciones = {}
+        if reply_markup is not None:
+            opciones["reply_markup"] = (
+                reply_markup.to_json() if hasattr(reply_markup, "to_json") else reply_markup
+            )
+        if responder_a is not None:
+            opciones["reply_to_message_id"] = responder_a
+            opciones["allow_sending_without_reply"] = True
+        cursor.execute(
+            "INSERT INTO outbox (chat_id, texto, opciones) VALUES (?, ?, ?)",
+            (chat_id, texto, json.dumps(opciones) if opciones else None)
+        )
+
+    def descartar_chat(self, cursor, chat_id: int):
+        """Borra los mensajes aún no enviados a un chat (p. ej. al borrar sus datos)."""
+        cursor.execute("DELETE FROM outbox WHERE chat_id = ?", (chat_id,))
+
+    def enviar_pendientes(self) -> int:
+        """Envía los mensajes ya vencidos, lote a lote. Devuelve cuántos se entregaron.
+
+        Si otra llamada está enviando, solo le pide una vuelta más y regresa.
+        """
+        with self._estado:
+            if self._enviando:
+                self._repetir = True
+                return 0
+            self._enviando = True
+        enviados = 0
+        try:
+            while True:
+                with self._estado:
+                    self._repetir = False
+                entregados, lleno = self._enviar_lote()
+                enviados += entregados
+                with self._estado:
+                    if not (lleno or self._repetir):
+                        return enviados
+        finally:
+            with self._estado:
+                self._enviando = False
+
+    def _enviar_lote(self):
+        filas = self.db.conn.execute(
+            """SELECT id, chat_id, texto, opciones, intentos FROM outbox
+            WHERE proximo_intento <= ? ORDER BY proximo_intento, id LIMIT ?""",
+            (int(time.time()), self.lote)
+        ).fetchall()
+        if not filas:
+            return 0, False
+
+        entregados, rechazados, reintentos = [], [], []
+        for mensaje_id, chat_id, texto, opciones, intentos in filas:
+            try:
+                self.bot.send_message(chat_id, texto, **json.loads(opciones or "{}"))
+                entregados.append((mensaje_id,))
+            except ApiTelegramException as e:
+                if e.error_code == 429:
+                    espera = (e.result_json or {}).get("parameters", {}).get("retry_after")
+                    reintentos.append(self._reintento(mensaje_id, intentos, espera))
+                elif e.error_code < 500:
+                    # Chat inexistente, bot bloqueado...: reintentar no cambiará nada
+                    self.logger.warning(f"Mensaje {mensaje_id} rechazado por Telegram: {str(e)}")
+                    rechazados.append((mensaje_id,))
+                else:
+                    reintentos.append(self._reintento(mensaje_id, intentos))
+            except Exception as e: # pylint: disable=broad-except
+                self.logger.warning(f"Error enviando el mensaje {mensaje_id}: {str(e)}")
+                reintentos.append(self._reintento(mensaje_id, intentos))
+
+        rechazados += [(fila[2],) for fila in reintentos if fila[0] is None]
+        reintentos = [fila for fila in reintentos if fila[0] is not None]
+        with self.db.transaccion() as cursor:
+            cursor.executemany("DELETE FROM outbox WHERE id = ?", entregados + rechazados)
+            cursor.executemany(
+                "UPDATE outbox SET proximo_intento = ?, intentos = ? WHERE id = ?", reintentos
+            )
+        self._enviados(len(entregados))
+        self._reintentos(len(reintentos))
+        self._descartados(len(rechazados))
+        return len(entregados), len(filas) == self.lote
+
+    def _reintento(self, mensaje_id, intentos, espera=None):
+        """(proximo_intento, intentos, id); proximo_intento es None si se abandona."""
+        intentos += 1
+        if intentos >= OUTBOX_MAX_ATTEMPTS:
+            self.logger.error(f"Mensaje {mensaje_id} abandonado tras {intentos} intentos")
+            return None, intentos, mensaje_id
+        espera = espera or OUTBOX_RETRY_BASE * 2 ** (intentos - 1)
+        return int(time.time() + espera), intentos, mensaje_id
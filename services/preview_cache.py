@@ -0,0 +1,107 @@
+# ------------------------- VISTAS PREVIAS DE NOTAS -------------------------
+"""
+Caché en memoria, breve y acotada, de los comienzos descifrados de las notas
+"""
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+# 0 desactiva la caché
+PREVIEW_CACHE_TTL = float(os.getenv("PREVIEW_CACHE_TTL", "60"))
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+# Los listados muestran como mucho 50 caracteres; uno más indica si la nota sigue
+PREVIEW_CHARS = 51
+# Coste aproximado de cada entrada además de su texto
+_BYTES_POR_ENTRADA = 100
+
+
+class CacheVistasPrevias:
+    """Guarda, por usuario, los primeros PREVIEW_CHARS caracteres de cada nota.
+
+    Así /mynotes, /delnote y /editnote seguidos no descifran varias veces las
+    mismas notas. Lo de un usuario caduca a los `ttl` segundos de descifrarse,
+    se descarta entero al cambiar cualquiera de sus notas y, si se supera
+    `max_bytes`, se expulsa primero a los usuarios usados hace más tiempo.
+    Solo contiene fragmentos que el usuario acaba de ver en su propio chat.
+    """
+
+    def __init__(self, ttl: float = PREVIEW_CACHE_TTL, max_bytes: int = PREVIEW_CACHE_MAX_BYTES,
+                 reloj=time.monotonic):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._reloj = reloj
+        self._usuarios = OrderedDict()  # db_user_id -> (caduca, {nota_id: vista}, bytes)
+        # Crece con cada invalidación; una vista descifrada antes de un cambio no se guarda
+        self._generacion = 0
+        self._bytes = 0
+        self._lock = Lock()
+
+    def obtener(self, db_user_id: int, notas, descifrar) -> dict:
+        """Vistas previas {nota_id: texto} de las filas (nota_id, contenido_cifrado, ...).
+
+        Solo se llama a `descifrar` para las notas que no están en caché.
+        """
+        ahora = self._reloj()
+        with self._lock:
+            generacion = self._generacion
+            entrada = self._usuarios.get(db_user_id)
+            if entrada and entrada[0] <= ahora:
+                self._quitar(db_user_id)
+                entrada = None
+            vistas = dict(entrada[1]) if entrada else {}
+            if entrada:
+                self._usuarios.move_to_end(db_user_id)
+
+        faltan = [fila for fila in notas if fila[0] not in vistas]
+        if not faltan:
+            return vistas
+        for fila in faltan:
+            vistas[fila[0]] = descifrar(fila[1])[:PREVIEW_CHARS]
+        if self.ttl > 0:
+            self._guardar(db_user_id, vistas, generacion, ahora)
+        return vistas
+
+    def invalidar(self, db_user_id: int):
+        """Descarta lo guardado del usuario (tras crear, editar o borrar una nota)."""
+        with self._lock:
+            self._generacion += 1
+            self._quitar(db_user_id)
+
+    def purgar(self) -> int:
+        """Descarta lo caducado para no guardar texto en claro más de `ttl` segundos."""
+        ahora = self._reloj()
+        with self._lock:
+            caducados = [uid for uid, entrada in self._usuarios.items() if entrada[0] <= ahora]
+            for db_user_id in caducados:
+                self._quitar(db_user_id)
+        return len(caducados)
+
+    def __len__(self):
+        return len(self._usuarios)
+
+    @property
+    def bytes(self) -> int:
+        """Tamaño aproximado de lo guardado."""
+        return self._bytes
+
+    def _guardar(self, db_user_id, vistas, generacion, ahora):
+        tamaño = sum(len(vista) * 2 + _BYTES_POR_ENTRADA for vista in vistas.values())
+        if tamaño > self.max_bytes:
+            return
+        with self._lock:
+            # Alguna nota cambió mientras se descifraba: estas vistas pueden estar viejas
+            if self._generacion != generacion:
+                return
+            anterior = self._usuarios.get(db_user_id)
+            caduca = anterior[0] if anterior else ahora + self.ttl
+            self._quitar(db_user_id)
+            self._usuarios[db_user_id] = (caduca, vistas, tamaño)
+            self._bytes += tamaño
+            while self._bytes > self.max_bytes:
+                self._quitar(next(iter(self._usuarios)))
+
+    def _quitar(self, db_user_id):
+        entrada = self._usuarios.pop(db_user_id, None)
+        if entrada:
+            self._bytes -= entrada[2]
@@ -0,0 +1,62 @@
+# ------------------------- LÍMITE DE PETICIONES -------------------------
+"""
+Limitador por usuario con cubetas de fichas (token bucket) en memoria
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class LimitadorUsuarios:
+    """Cada usuario tiene una cubeta de `capacidad` fichas que se rellena a
+    `por_minuto` fichas por minuto; cada actualización gasta su coste.
+
+    Una cubeta que lleva inactiva el tiempo de rellenarse entera es idéntica a
+    una nueva, así que se elimina: las entradas se guardan por orden de último
+    uso y se purgan desde el principio, con coste O(1) amortizado. `max_usuarios`
+    acota la memoria aunque llegue a la vez un número enorme de usuarios.
+    """
+
+    def __init__(self, capacidad: float = 20, por_minuto: float = 30,
+                 max_usuarios: int = 10000, reloj=time.monotonic):
+        self.capacidad = float(capacidad)
+        self.por_segundo = por_minuto / 60.0
+        self.max_usuarios = max_usuarios
+        self._reloj = reloj
+        self._inactividad = self.capacidad / self.por_segundo
+        self._cubetas = OrderedDict()
+        self._lock = Lock()
+
+    def permitir(self, usuario, coste: float = 1) -> bool:
+        """Descuenta `coste` fichas al usuario; False si no le quedan suficientes."""
+        ahora = self._reloj()
+        with self._lock:
+            self._purgar(ahora)
+            fichas, ultimo = self._cubetas.pop(usuario, (self.capacidad, ahora))
+            fichas = min(self.capacidad, fichas + (ahora - ultimo) * self.por_segundo)
+            permitido = fichas >= coste
+            if permitido:
+                fichas -= coste
+            self._cubetas[usuario] = (fichas, ahora)
+            if len(self._cubetas) > self.max_usuarios:
+                self._cubetas.popitem(last=False)
+            return permitido
+
+    def espera(self, usuario, coste: float = 1) -> float:
+        """Segundos hasta que el usuario tenga `coste` fichas (0 si ya las tiene)."""
+        with self._lock:
+            fichas, ultimo = self._cubetas.get(usuario, (self.capacidad, self._reloj()))
+        fichas = min(self.capacidad, fichas + (self._reloj() - ultimo) * self.por_segundo)
+        if fichas >= coste:
+            return 0.0
+        return (coste - fichas) / self.por_segundo
+
+    def __len__(self):
+        return len(self._cubetas)
+
+    def _purgar(self, ahora):
+        while self._cubetas:
+            usuario, (_, ultimo) = next(iter(self._cubetas.items()))
+            if ahora - ultimo < self._inactividad:
+                return
+            del self._cubetas[usuario]
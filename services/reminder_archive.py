@@ -0,0 +1,75 @@
+# ------------------------- ARCHIVO DE RECORDATORIOS -------------------------
+"""
+Saca de la tabla activa los recordatorios completados y conserva un historial corto
+"""
+import logging
+import os
+
+from services.deletion_jobs import TrabajosBorrado
+
+REMINDER_ARCHIVE_INTERVAL = 24 * 3600
+# Días que un recordatorio completado sigue en la tabla activa
+REMINDER_ARCHIVE_DAYS = int(os.getenv("REMINDER_ARCHIVE_DAYS", "7"))
+# Recordatorios archivados que se conservan por usuario
+REMINDER_HISTORY = int(os.getenv("REMINDER_HISTORY", "20"))
+
+TRABAJO_ARCHIVO = "archivo_recordatorios"
+
+
+class ArchivadorRecordatorios:
+    """Mueve a recordatorios_archivo los completados hace más de `dias` días.
+
+    Así recordatorios solo contiene los vivos y las consultas de /myreminders,
+    /delreminder y el arranque no recorren filas muertas. Se ejecuta como un
+    trabajo de TrabajosBorrado: por lotes y reanudable tras un reinicio.
+    """
+
+    def __init__(self, db, trabajos: TrabajosBorrado, dias: int = REMINDER_ARCHIVE_DAYS,
+                 historial: int = REMINDER_HISTORY):
+        self.db = db
+        self.trabajos = trabajos
+        self.dias = dias
+        self.historial = historial
+        self.logger = logging.getLogger("SecureBot.reminder_archive")
+        trabajos.registrar(TRABAJO_ARCHIVO, (
+            self._mover_lote,
+            """DELETE FROM recordatorios_archivo WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY usuario_id ORDER BY fecha_completado DESC, id DESC
+                    ) AS orden
+                    FROM recordatorios_archivo)
+                WHERE orden > :historial LIMIT :lote)""",
+        ))
+
+    def ejecutar(self):
+        """Encola el archivado (si no hay uno en curso) y programa su primer lote."""
+        with self.db.transaccion() as cursor:
+            self.trabajos.encolar(
+                cursor, TRABAJO_ARCHIVO, unico=True, dias=self.dias, historial=self.historial
+            )
+        self.trabajos.lanzar()
+
+    def _mover_lote(self, cursor, parametros, lote):
+        cursor.execute(
+            """SELECT id FROM recordatorios
+            WHERE completado = 1
+              AND COALESCE(fecha_completado, fecha_creacion) < datetime('now', ?)
+            ORDER BY id LIMIT ?""",
+            (f"-{parametros['dias']} days", lote)
+        )
+        ids = [fila[0] for fila in cursor.fetchall()]
+        if not ids:
+            return 0
+        marcas = ",".join("?" * len(ids))
+        cursor.execute(
+            f"""INSERT OR REPLACE INTO recordatorios_archivo
+                (id, usuario_id, texto, hora_recordatorio, recurrente,
+                 fecha_creacion, fecha_completado)
+            SELECT id, usuario_id, texto, hora_recordatorio, recurrente,
+                fecha_creacion, COALESCE(fecha_completado, fecha_creacion)
+            FROM recordatorios WHERE id IN ({marcas})""",
+            ids
+        )
+        cursor.execute(f"DELETE FROM recordatorios WHERE id IN ({marcas})", ids)
+        return len(ids)
@@ -0,0 +1,57 @@
+# ------------------------- RECORDATORIOS -------------------------
+"""
+Cálculo de ejecuciones de recordatorios y recuperación de las perdidas
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+HEARTBEAT_INTERVAL = 60
+HEARTBEAT_KEY = "latido"
+# Separación entre envíos de la ráfaga de recuperación (~10 mensajes/s,
+# por debajo del límite global de la Bot API)
+CATCHUP_INTERVAL = 0.1
+# Días hacia atrás que se revisan como máximo
+CATCHUP_MAX_DAYS = 7
+
+
+def ocurrencias(hora: str, desde: float, hasta: float) -> list:
+    """Instantes diarios a la hora `hora` (HH:MM) en el intervalo (desde, hasta]."""
+    desde = max(desde, hasta - CATCHUP_MAX_DAYS * 86400)
+    inicio = datetime.fromtimestamp(desde)
+    fin = datetime.fromtimestamp(hasta)
+    objetivo = datetime.strptime(hora, "%H:%M").time()
+
+    resultado = []
+    instante = datetime.combine(inicio.date(), objetivo)
+    while instante <= fin:
+        if instante > inicio:
+            resultado.append(instante)
+        instante += timedelta(days=1)
+    return resultado
+
+
+def recordatorios_perdidos(pendientes, latido: float, ahora: float) -> dict:
+    """Agrupa por usuario los recordatorios que debieron enviarse con el bot parado.
+
+    `pendientes` son filas (id, telegram_id, texto, hora, recurrente, proxima_ejecucion)
+    de recordatorios no completados. Si la fila tiene proxima_ejecucion, esa
+    ejecución (que tras posponer no cae a la hora HH:MM) es la primera perdida y
+    el hueco sigue desde ahí; si no, empieza en el último latido registrado.
+    Devuelve {telegram_id: [(id, texto, recurrente, [instantes perdidos])]}.
+    """
+    perdidos = defaultdict(list)
+    for reminder_id, telegram_id, texto, hora, recurrente, proxima in pendientes:
+        if proxima:
+            instantes = ocurrencias(hora, proxima, ahora)
+            if ahora - CATCHUP_MAX_DAYS * 86400 < proxima <= ahora:
+                instantes.insert(0, datetime.fromtimestamp(proxima))
+        elif latido:
+            instantes = ocurrencias(hora, latido, ahora)
+        else:
+            continue
+        if not instantes:
+            continue
+        if not recurrente:
+            instantes = instantes[:1]
+        perdidos[telegram_id].append((reminder_id, texto, bool(recurrente), instantes))
+    return dict(perdidos)
@@ -0,0 +1,128 @@
+# ------------------------- PLANIFICADOR -------------------------
+"""
+Planificador de tareas basado en un montículo y un único hilo de control
+"""
+import heapq
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Condition, Thread
+
+
+class Planificador:
+    """Ejecuta funciones en un instante dado sin crear un Timer por tarea.
+
+    Cada tarea tiene una clave; programar de nuevo la misma clave sustituye a la
+    anterior (la entrada vieja del montículo se descarta al salir), de modo que
+    reprogramar o cancelar cuesta O(log n). Las funciones se ejecutan en un pool
+    pequeño para que una tarea lenta no retrase a las demás.
+    """
+
+    def __init__(self, workers: int = 2, nombre: str = "planificador", reloj=time.time):
+        self._reloj = reloj
+        self._heap = []
+        self._vigentes = {}
+        self._contador = itertools.count()
+        self._cond = Condition()
+        self._activo = False
+        self._hilo = None
+        self._nombre = nombre
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=nombre)
+        self.logger = logging.getLogger("SecureBot.scheduler")
+
+    def iniciar(self):
+        """Arranca el hilo del planificador (idempotente)."""
+        with self._cond:
+            if self._activo:
+                return
+            self._activo = True
+        self._hilo = Thread(target=self._bucle, name=self._nombre, daemon=True)
+        self._hilo.start()
+
+    def detener(self, esperar: bool = True):
+        """Detiene el planificador; las tareas pendientes no se ejecutan."""
+        with self._cond:
+            self._activo = False
+            self._cond.notify_all()
+        if self._hilo and esperar:
+            self._hilo.join()
+        self._pool.shutdown(wait=esperar)
+
+    def programar(self, clave, cuando, funcion, *args):
+        """Programa `funcion(*args)` para `cuando` (datetime o timestamp)."""
+        if isinstance(cuando, datetime):
+            cuando = cuando.timestamp()
+        self._encolar(clave, cuando, funcion, args, None)
+
+    def cada(self, clave, intervalo: float, funcion, *args, primera: float = None):
+        """Ejecuta `funcion(*args)` cada `intervalo` segundos hasta que se cancele."""
+        retraso = intervalo if primera is None else primera
+        self._encolar(clave, self._reloj() + retraso, funcion, args, intervalo)
+
+    def _encolar(self, clave, cuando, funcion, args, intervalo, secuencia=None):
+        with self._cond:
+            if secuencia is None:
+                secuencia = next(self._contador)
+                self._vigentes[clave] = secuencia
+            heapq.heappush(self._heap, (cuando, secuencia, clave, funcion, args, intervalo))
+            self._cond.notify()
+
+    def cancelar(self, clave) -> bool:
+        """Cancela la tarea con esa clave. Devuelve False si no existía."""
+        with self._cond:
+            return self._vigentes.pop(clave, None) is not None
+
+    def programada(self, clave) -> bool:
+        """Indica si hay una tarea vigente con esa clave."""
+        with self._cond:
+            return clave in self._vigentes
+
+    def pendientes(self) -> int:
+        """Número de tareas vigentes."""
+        with self._cond:
+            return len(self._vigentes)
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                while self._activo:
+                    tarea, espera = self._siguiente()
+                    if tarea is not None:
+                        break
+                    self._cond.wait(espera)
+                if not self._activo:
+                    return
+            self._pool.submit(self._ejecutar, *tarea)
+
+    def _siguiente(self):
+        """Saca la primera tarea vencida: (tarea, None), o (None, segundos hasta la próxima).
+
+        Sin tareas la espera es None (indefinida). Se llama con el lock tomado.
+        """
+        self._descartar_obsoletas()
+        if not self._heap:
+            return None, None
+        espera = self._heap[0][0] - self._reloj()
+        if espera > 0:
+            return None, espera
+        _, secuencia, clave, funcion, args, intervalo = heapq.heappop(self._heap)
+        if intervalo is None:
+            del self._vigentes[clave]
+        return (clave, secuencia, funcion, args, intervalo), None
+
+    def _descartar_obsoletas(self):
+        while self._heap and self._vigentes.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    def _ejecutar(self, clave, secuencia, funcion, args, intervalo):
+        try:
+            funcion(*args)
+        except Exception as e: # pylint: disable=broad-except
+            self.logger.error(f"Error en tarea programada {clave}: {str(e)}")
+        if intervalo is not None:
+            with self._cond:
+                if self._vigentes.get(clave) != secuencia:
+                    return
+            self._encolar(clave, self._reloj() + intervalo, funcion, args, intervalo, secuencia)
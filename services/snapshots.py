@@ -0,0 +1,193 @@
+# ------------------------- SNAPSHOTS DE LA BASE DE DATOS -------------------------
+"""
+Copias en caliente de secure_reconotas.db usando la API de backup de SQLite
+
+Uso:
+    python -m services.snapshots crear [--cada HORAS]
+    python -m services.snapshots listar
+    python -m services.snapshots verificar <snapshot>
+    python -m services.snapshots restaurar <snapshot>
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from models.database import DB_PATH
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOTS_TO_KEEP = int(os.getenv("SNAPSHOTS_TO_KEEP", "7"))
+PAGES_PER_STEP = 256
+STEP_PAUSE = 0.05
+_PREFIJO = "reconotas_"
+_SUFIJO = ".db"
+
+
+class SnapshotError(Exception):
+    """Fallo al crear, verificar o restaurar un snapshot"""
+
+
+class SnapshotManager:
+    """Crea, rota, verifica y restaura snapshots de la base de datos.
+
+    La copia avanza en pasos de PAGES_PER_STEP páginas con una pausa entre ellos,
+    así el bot puede seguir escribiendo mientras se hace el respaldo.
+    """
+
+    def __init__(self, db_path=DB_PATH, snapshot_dir=SNAPSHOT_DIR, keep=SNAPSHOTS_TO_KEEP,
+                 pages_per_step=PAGES_PER_STEP, step_pause=STEP_PAUSE):
+        self.db_path = str(db_path)
+        self.snapshot_dir = Path(snapshot_dir)
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+        self.logger = logging.getLogger("SecureBot.snapshots")
+
+    def crear(self, rotar: bool = True) -> Path:
+        """Hace un snapshot verificado y, si se pide, elimina los más antiguos."""
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        nombre = f"{_PREFIJO}{datetime.now().strftime('%Y%m%d-%H%M%S')}{_SUFIJO}"
+        destino = self.snapshot_dir / nombre
+        parcial = destino.with_name(nombre + ".partial")
+
+        inicio = time.monotonic()
+        self._copiar(self.db_path, parcial, autocontenido=True)
+
+        ok, detalle = self.verificar(parcial)
+        if not ok:
+            parcial.unlink(missing_ok=True)
+            raise SnapshotError(f"Snapshot corrupto: {detalle}")
+
+        os.replace(parcial, destino)
+        self.logger.info(
+            "Snapshot %s creado en %.1fs (%d bytes)",
+            destino, time.monotonic() - inicio, destino.stat().st_size
+        )
+        if rotar:
+            self.rotar()
+        return destino
+
+    def listar(self) -> list:
+        """Devuelve los snapshots existentes, del más antiguo al más reciente."""
+        if not self.snapshot_dir.exists():
+            return []
+        return sorted(self.snapshot_dir.glob(f"{_PREFIJO}*{_SUFIJO}"))
+
+    def rotar(self):
+        """Conserva solo los últimos `keep` snapshots."""
+        for viejo in self.listar()[:-self.keep] if self.keep > 0 else []:
+            viejo.unlink(missing_ok=True)
+            self.logger.info("Snapshot %s eliminado por rotación", viejo)
+
+    def verificar(self, snapshot) -> tuple:
+        """Ejecuta PRAGMA integrity_check sobre el snapshot."""
+        try:
+            conn = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+            try:
+                filas = conn.execute("PRAGMA integrity_check").fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            return False, str(e)
+        resultado = "; ".join(fila[0] for fila in filas)
+        return resultado == "ok", resultado
+
+    def restaurar(self, snapshot) -> Path:
+        """Restaura un snapshot sobre la base de datos activa.
+
+        Antes se guarda un snapshot de seguridad del estado actual. Debe hacerse con
+        el bot detenido: la API de backup reescribe la base de datos en su sitio,
+        respetando el WAL, pero las conexiones abiertas verían el cambio a mitad.
+        """
+        snapshot = Path(snapshot)
+        ok, detalle = self.verificar(snapshot)
+        if not ok:
+            raise SnapshotError(f"No se restaura un snapshot inválido: {detalle}")
+
+        seguridad = None
+        if os.path.exists(self.db_path):
+            # Sin rotar todavía: podría borrar el snapshot que vamos a restaurar
+            seguridad = self.crear(rotar=False)
+
+        self._copiar(snapshot, self.db_path)
+        self.logger.info("Base de datos restaurada desde %s", snapshot)
+        self.rotar()
+        return seguridad
+
+    def _copiar(self, origen, destino, autocontenido=False):
+        src = sqlite3.connect(str(origen))
+        dst = sqlite3.connect(str(destino))
+        try:
+            src.backup(
+                dst,
+                pages=self.pages_per_step,
+                progress=self._progreso,
+                sleep=self.step_pause
+            )
+            if autocontenido:
+                # Un snapshot es un único archivo, sin -wal ni -shm
+                dst.execute("PRAGMA journal_mode=DELETE")
+            elif dst.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                dst.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            dst.close()
+            src.close()
+
+    def _progreso(self, _status, remaining, total):
+        self.logger.debug("Backup: %d/%d páginas", total - remaining, total)
+
+
+def main(argv=None):
+    """Punto de entrada de la herramienta de administración."""
+    parser = argparse.ArgumentParser(description="Snapshots de la base de datos de RecoNotas")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--keep", type=int, default=SNAPSHOTS_TO_KEEP)
+    sub = parser.add_subparsers(dest="accion", required=True)
+
+    crear = sub.add_parser("crear", help="Crea un snapshot verificado")
+    crear.add_argument("--cada", type=float, metavar="HORAS",
+                       help="Repite la copia periódicamente en lugar de salir")
+    sub.add_parser("listar", help="Lista los snapshots disponibles")
+    verificar = sub.add_parser("verificar", help="Comprueba la integridad de un snapshot")
+    verificar.add_argument("snapshot")
+    restaurar = sub.add_parser("restaurar", help="Restaura un snapshot (con el bot detenido)")
+    restaurar.add_argument("snapshot")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    manager = SnapshotManager(args.db, args.dir, args.keep)
+
+    try:
+        if args.accion == "crear":
+            while True:
+                print(f"✅ Snapshot creado: {manager.crear()}")
+                if not args.cada:
+                    break
+                time.sleep(args.cada * 3600)
+        elif args.accion == "listar":
+            for snapshot in manager.listar():
+                print(f"{snapshot}\t{snapshot.stat().st_size} bytes")
+        elif args.accion == "verificar":
+            ok, detalle = manager.verificar(args.snapshot)
+            print(("✅ " if ok else "❌ ") + detalle)
+            return 0 if ok else 1
+        elif args.accion == "restaurar":
+            seguridad = manager.restaurar(args.snapshot)
+            if seguridad:
+                print(f"ℹ️ Estado anterior guardado en {seguridad}")
+            print(f"✅ Restaurado desde {args.snapshot}")
+    except (SnapshotError, sqlite3.Error) as e:
+        print(f"❌ {str(e)}")
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
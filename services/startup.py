@@ -0,0 +1,88 @@
+# ------------------------- ARRANQUE -------------------------
+"""
+Construcción en segundo plano de los componentes lentos del bot
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+
+
+class Diferido:
+    """Representa un componente que aún se está construyendo.
+
+    Se usa como el propio componente: el primer acceso a un atributo espera a
+    que esté listo, así cada manejador solo se bloquea en lo que necesita.
+    """
+    __slots__ = ("_nombre", "_future")
+
+    def __init__(self, nombre: str, future):
+        self._nombre = nombre
+        self._future = future
+
+    def listo(self) -> bool:
+        """Indica si el componente ya está construido (o falló)."""
+        return self._future.done()
+
+    def obtener(self, timeout: float = None):
+        """Devuelve el componente, esperando como mucho `timeout` segundos."""
+        return self._future.result(timeout)
+
+    def __getattr__(self, atributo):
+        return getattr(self._future.result(), atributo)
+
+    def __repr__(self):
+        estado = "listo" if self._future.done() else "pendiente"
+        return f"<Diferido {self._nombre} ({estado})>"
+
+
+class Arranque:
+    """Lanza en paralelo el trabajo lento del arranque y mide sus tiempos."""
+
+    def __init__(self, inicio: float = None, workers: int = 4):
+        self.inicio = inicio if inicio is not None else time.monotonic()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arranque")
+        self._futures = []
+        self._primera = False
+        self._lock = Lock()
+        self.logger = logging.getLogger("SecureBot.startup")
+
+    def diferir(self, nombre: str, funcion, *args) -> Diferido:
+        """Construye `funcion(*args)` en segundo plano y devuelve su Diferido."""
+        return Diferido(nombre, self.ejecutar(nombre, funcion, *args))
+
+    def ejecutar(self, nombre: str, funcion, *args):
+        """Ejecuta `funcion(*args)` en segundo plano y devuelve su Future."""
+        future = self._pool.submit(self._medir, nombre, funcion, args)
+        self._futures.append(future)
+        return future
+
+    def esperar(self, timeout: float = None):
+        """Espera a que termine todo el trabajo lanzado."""
+        wait(self._futures, timeout)
+
+    def primera_actualizacion(self):
+        """Registra, solo la primera vez, el tiempo hasta atender una actualización."""
+        if self._primera:
+            return
+        with self._lock:
+            if self._primera:
+                return
+            self._primera = True
+        self.logger.info(
+            "Primera actualización atendida a los %.2f s del arranque",
+            time.monotonic() - self.inicio
+        )
+
+    def _medir(self, nombre, funcion, args):
+        comienzo = time.monotonic()
+        try:
+            resultado = funcion(*args)
+        except Exception as e: # pylint: disable=broad-except
+            self.logger.critical(f"Error al preparar {nombre}: {str(e)}")
+            raise
+        self.logger.info(
+            "Arranque: %s listo en %.2f s (%.2f s desde el inicio)",
+            nombre, time.monotonic() - comienzo, time.monotonic() - self.inicio
+        )
+        return resultado
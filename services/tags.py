@@ -0,0 +1,137 @@
+# ------------------------- ETIQUETAS -------------------------
+"""
+Índice de etiquetas (#tag) y carpetas (#carpeta/sub) de las notas
+"""
+import logging
+import re
+
+from models.encryption import CifradoManager
+
+TIPO_ETIQUETA = "tag"
+TIPO_CARPETA = "folder"
+REINDEX_BATCH_NOTES = 200
+
+# "#compras" es una etiqueta; "#trabajo/clientes" (o "#trabajo/") es una carpeta
+_PATRON = re.compile(r"(?<![\w#])#(\w[\w/-]*)")
+
+
+def extraer_etiquetas(texto: str):
+    """Devuelve (etiquetas, carpetas) normalizadas del texto de una nota.
+
+    Cada carpeta incluye también sus carpetas superiores, de modo que filtrar
+    por "trabajo" encuentra las notas de "trabajo/clientes".
+    """
+    etiquetas, carpetas = set(), set()
+    for nombre in _PATRON.findall(texto or ""):
+        nombre = normalizar(nombre)
+        if "/" not in nombre:
+            etiquetas.add(nombre)
+            continue
+        partes = [parte for parte in nombre.split("/") if parte]
+        for i in range(1, len(partes) + 1):
+            carpetas.add("/".join(partes[:i]))
+    return etiquetas, carpetas
+
+
+def normalizar(nombre: str) -> str:
+    """Quita '#' y espacios y pasa a minúsculas."""
+    return nombre.strip().lstrip("#").casefold()
+
+
+class IndiceEtiquetas:
+    """Tabla de unión nota <-> etiqueta con identificadores HMAC.
+
+    Los nombres nunca se guardan en claro: cada etiqueta se identifica por un
+    HMAC con una clave propia del usuario, y una búsqueda es una única consulta
+    por índice que devuelve solo las notas que hay que descifrar.
+    """
+
+    def __init__(self, db, cifrado: CifradoManager):
+        self.db = db
+        self.cifrado = cifrado
+        self.logger = logging.getLogger("SecureBot.tags")
+
+    def identificador(self, db_user_id: int, tipo: str, nombre: str) -> bytes:
+        """Identificador opaco de una etiqueta o carpeta del usuario."""
+        huella = self.cifrado.nuevo_hmac(f"etiqueta:{db_user_id}")
+        huella.update(f"{tipo}:{normalizar(nombre).strip('/')}".encode("utf-8"))
+        return huella.digest()[:16]
+
+    def indexar(self, cursor, db_user_id: int, nota_id: int, texto: str) -> int:
+        """Reescribe las etiquetas de una nota dentro de la transacción del llamador."""
+        filas = self._filas(db_user_id, nota_id, texto)
+        cursor.execute("DELETE FROM notas_etiquetas WHERE nota_id = ?", (nota_id,))
+        cursor.executemany(
+            """INSERT OR IGNORE INTO notas_etiquetas (usuario_id, tipo, etiqueta_id, nota_id)
+            VALUES (?, ?, ?, ?)""",
+            filas
+        )
+        cursor.execute("UPDATE notas SET etiquetado = 1 WHERE id = ?", (nota_id,))
+        return len(filas)
+
+    def indexar_nuevas(self, cursor, db_user_id: int, notas) -> int:
+        """Indexa de una vez notas recién insertadas [(nota_id, texto)] (p. ej. al importar).
+
+        Al ser nuevas no tienen etiquetas previas que borrar.
+        """
+        filas = [
+            fila for nota_id, texto in notas for fila in self._filas(db_user_id, nota_id, texto)
+        ]
+        cursor.executemany(
+            """INSERT OR IGNORE INTO notas_etiquetas (usuario_id, tipo, etiqueta_id, nota_id)
+            VALUES (?, ?, ?, ?)""",
+            filas
+        )
+        cursor.executemany(
+            "UPDATE notas SET etiquetado = 1 WHERE id = ?", [(nota_id,) for nota_id, _ in notas]
+        )
+        return len(filas)
+
+    def _filas(self, db_user_id, nota_id, texto):
+        etiquetas, carpetas = extraer_etiquetas(texto)
+        return [
+            (db_user_id, tipo, self.identificador(db_user_id, tipo, nombre), nota_id)
+            for tipo, nombres in ((TIPO_ETIQUETA, etiquetas), (TIPO_CARPETA, carpetas))
+            for nombre in nombres
+        ]
+
+    def buscar(self, db_user_id: int, tipo: str, nombre: str) -> list:
+        """Notas del usuario con esa etiqueta o carpeta: [(id, contenido_cifrado, fecha)]."""
+        cursor = self.db.conn.cursor()
+        cursor.execute(
+            """SELECT n.id, n.contenido_cifrado, n.fecha_creacion
+            FROM notas_etiquetas e
+            JOIN notas n ON n.id = e.nota_id
+            WHERE e.usuario_id = ? AND e.tipo = ? AND e.etiqueta_id = ?
+            ORDER BY n.id""",
+            (db_user_id, tipo, self.identificador(db_user_id, tipo, nombre))
+        )
+        return cursor.fetchall()
+
+    def indexar_pendientes(self, lote: int = REINDEX_BATCH_NOTES) -> int:
+        """Indexa por lotes las notas guardadas antes de existir el índice."""
+        total = 0
+        while True:
+            with self.db.transaccion() as cursor:
+                cursor.execute(
+                    """SELECT id, usuario_id, contenido_cifrado FROM notas
+                    WHERE etiquetado = 0 ORDER BY id LIMIT ?""",
+                    (lote,)
+                )
+                notas = cursor.fetchall()
+                for nota_id, db_user_id, contenido in notas:
+                    try:
+                        texto = self.cifrado.descifrar(contenido)
+                    except ValueError as e:
+                        # Se marca igualmente: si no, cada arranque volvería a tropezar con ella
+                        self.logger.error(f"Nota {nota_id} ilegible, no se indexa: {str(e)}")
+                        cursor.execute(
+                            "UPDATE notas SET etiquetado = 1 WHERE id = ?", (nota_id,)
+                        )
+                        continue
+                    self.indexar(cursor, db_user_id, nota_id, texto)
+            total += len(notas)
+            if len(notas) < lote:
+                if total:
+                    self.logger.info("Etiquetas: %d notas indexadas", total)
+                return total
@@ -0,0 +1,90 @@
+# ------------------------- HTTP DE LA API DE TELEGRAM -------------------------
+"""
+Sesión HTTP compartida (keep-alive) para todas las llamadas a la Bot API
+"""
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from urllib3.util.retry import Retry
+
+from services.metrics import REGISTRO
+
+
+class _ReintentoConJitter(Retry):
+    """Retry con espera exponencial más un azar, para no reintentar todos a la vez."""
+
+    def get_backoff_time(self):
+        espera = super().get_backoff_time()
+        return espera + random.uniform(0, espera) if espera else 0
+
+
+class SesionTelegram:
+    """Una requests.Session con un pool de `conexiones` sockets reutilizables.
+
+    Se instala como apihelper.CUSTOM_REQUEST_SENDER, así que reply_to,
+    send_message, getUpdates, etc. comparten conexiones TLS en lugar de abrir
+    una por hilo. Solo se reintentan los fallos al conectar, cuando la petición
+    aún no salió: tras un 5xx o un timeout de lectura el mensaje podría haberse
+    enviado ya, y esos reintentos los hace el outbox.
+    """
+
+    def __init__(self, conexiones: int = 8, reintentos: int = 3, timeout_conexion: float = 5,
+                 timeout_lectura: float = 20, metricas=REGISTRO):
+        reintento = _ReintentoConJitter(
+            total=reintentos, connect=reintentos, read=0, status=0, other=0,
+            allowed_methods=None, backoff_factor=0.5, raise_on_status=False
+        )
+        self._adaptador = HTTPAdapter(
+            pool_connections=1, pool_maxsize=conexiones, max_retries=reintento, pool_block=True
+        )
+        self.sesion = requests.Session()
+        self.sesion.mount("https://", self._adaptador)
+        self.sesion.mount("http://", self._adaptador)
+        self.timeout_conexion = timeout_conexion
+        self.timeout_lectura = timeout_lectura
+
+        self._peticiones = metricas.contador(
+            "reconotas_api_peticiones_total", "Peticiones a la Bot API")
+        self._errores = metricas.contador(
+            "reconotas_api_errores_total", "Peticiones a la Bot API sin respuesta")
+        self._segundos = metricas.contador(
+            "reconotas_api_segundos_total", "Tiempo total esperando a la Bot API")
+        metricas.medidor(
+            "reconotas_api_conexiones_creadas", self.conexiones_creadas,
+            "Conexiones TCP/TLS abiertas desde el arranque")
+
+    def instalar(self):
+        """Hace que telebot envíe todas sus peticiones por esta sesión."""
+        apihelper.CONNECT_TIMEOUT = self.timeout_conexion
+        apihelper.READ_TIMEOUT = self.timeout_lectura
+        apihelper.CUSTOM_REQUEST_SENDER = self.enviar
+        return self
+
+    def enviar(self, method, url, **kwargs):
+        """Misma firma que requests.request; telebot ya fija el timeout por llamada."""
+        kwargs.setdefault("timeout", (self.timeout_conexion, self.timeout_lectura))
+        inicio = time.monotonic()
+        try:
+            return self.sesion.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._errores()
+            raise
+        finally:
+            self._peticiones()
+            self._segundos(time.monotonic() - inicio)
+
+    def get(self, url, **kwargs):
+        """GET por la misma sesión (p. ej. descargas de archivos)."""
+        return self.sesion.get(url, **kwargs)
+
+    def conexiones_creadas(self) -> int:
+        """Conexiones abiertas desde el arranque (reutilización = 1 - conexiones / peticiones)."""
+        pools = self._adaptador.poolmanager.pools
+        return sum(pools[clave].num_connections for clave in pools.keys())
+
+    def cerrar(self):
+        """Cierra las conexiones del pool."""
+        self.sesion.close()
@@ -0,0 +1,344 @@
+# ------------------------- TRADUCCIONES -------------------------
+"""
+Servicio de traducción con catálogos precompilados en memoria
+"""
+import ast
+import logging
+import os
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from threading import Lock
+from types import MappingProxyType
+
+DOMINIO = "reconotas"
+LOCALES_POLL_INTERVAL = 5
+
+# Textos fijos que se traducen una sola vez por idioma al arrancar
+MENSAJES_ESTATICOS = {
+    "bienvenida": (
+        "🔐 *Bienvenido a RecoNotas v2.5_beta*\n\n"
+        "📝 **Selecciona una opción del menú:**\n"
+        "O usa los comandos tradicionales si lo prefieres"
+    ),
+    "tutorial": (
+        "📚 *Tutorial de RecoNotas*\n\n"
+        "1. *Notas*:\n"
+        "   - /newnote [texto] - Crea una nota\n"
+        "   - /mynotes - Lista tus notas\n\n"
+        "2. *Recordatorios*:\n"
+        "   - /newreminder [texto] [HH:MM] --recurrente\n"
+        "   - /myreminders - Lista recordatorios\n\n"
+        "3. *Seguridad*:\n"
+        "   - /setup2fa - Configura autenticación\n"
+        "   - /settings - Cambia preferencias\n\n"
+        "ℹ️ Usa el menú de botones para acceso rápido!"
+    ),
+    "comando_desconocido": "No reconozco ese comando. Usa el menú o escribe /help",
+    "pedir_2fa": "🔐 Ingresa tu código 2FA:",
+    "error_solicitud": "❌ Ocurrió un error al procesar tu solicitud",
+    "error_2fa_invalido": "❌ Código inválido. Intenta nuevamente o usa /start",
+    "error_autenticacion": "❌ Error en autenticación",
+    "error_tutorial": "❌ Error al mostrar el tutorial",
+    "error_configurar_2fa": "❌ Error al configurar 2FA",
+    "error_configuracion": "❌ Error al cargar configuración",
+    "error_idioma": "❌ Error al cambiar idioma",
+    "ocupado": "⏳ Hay mucha actividad ahora mismo; inténtalo de nuevo en unos segundos",
+    "limitado": "🐢 Vas demasiado rápido. Espera {segundos} s e inténtalo de nuevo",
+}
+
+
+class _Catalogos:
+    """Foto inmutable de todos los catálogos y textos ya traducidos"""
+
+    def __init__(self, catalogos: dict):
+        self.catalogos = MappingProxyType(
+            {lang: MappingProxyType(cat) for lang, cat in catalogos.items()}
+        )
+        self.textos = MappingProxyType({
+            lang: MappingProxyType({
+                clave: cat.get(msgid, msgid) for clave, msgid in MENSAJES_ESTATICOS.items()
+            })
+            for lang, cat in self.catalogos.items()
+        })
+        self.gettext = MappingProxyType({
+            lang: _crear_gettext(cat) for lang, cat in self.catalogos.items()
+        })
+
+
+class TranslationService:
+    """Resuelve traducciones sin gettext ni consultas a la base de datos en el camino caliente.
+
+    Los catálogos .mo se leen una vez en diccionarios inmutables y el idioma de
+    cada usuario se guarda en caché tras la primera consulta.
+    """
+
+    def __init__(self, db, locales_dir, supported_langs, default_lang):
+        self.db = db
+        self.locales_dir = Path(locales_dir)
+        self.supported_langs = list(supported_langs)
+        self.default_lang = default_lang
+        self._idiomas = {}
+        self._lock = Lock()
+        self._oyentes = []
+        self._catalogos = _Catalogos(self._cargar_catalogos())
+        self.logger = logging.getLogger("SecureBot.translation")
+
+    def gettext(self, lang: str):
+        """Función de traducción para un idioma (la del idioma por defecto si no existe)."""
+        catalogos = self._catalogos
+        return catalogos.gettext.get(lang) or catalogos.gettext[self.default_lang]
+
+    def textos(self, lang: str):
+        """Textos estáticos ya traducidos para un idioma."""
+        catalogos = self._catalogos
+        return catalogos.textos.get(lang) or catalogos.textos[self.default_lang]
+
+    def idioma(self, telegram_id: int) -> str:
+        """Idioma del usuario, consultando la base de datos solo la primera vez."""
+        lang = self._idiomas.get(telegram_id)
+        if lang is not None:
+            return lang
+
+        cursor = self.db.conn.cursor()
+        cursor.execute("SELECT lenguaje FROM usuarios WHERE telegram_id = ?", (telegram_id,))
+        row = cursor.fetchone()
+        lang = row[0] if row and row[0] else self.default_lang
+        with self._lock:
+            self._idiomas[telegram_id] = lang
+        return lang
+
+    def fijar_idioma(self, telegram_id: int, lang: str):
+        """Actualiza la caché tras cambiar el idioma en la base de datos."""
+        with self._lock:
+            self._idiomas[telegram_id] = lang
+
+    def olvidar(self, telegram_id: int):
+        """Elimina al usuario de la caché (p. ej. tras borrar sus datos)."""
+        with self._lock:
+            self._idiomas.pop(telegram_id, None)
+
+    def al_recargar(self, funcion):
+        """Registra una función que se llama después de cada recarga de catálogos."""
+        self._oyentes.append(funcion)
+
+    def recargar(self):
+        """Relee los catálogos y los sustituye de golpe.
+
+        La nueva foto se construye aparte y se publica con una sola asignación;
+        los manejadores en curso siguen usando la que ya tenían.
+        """
+        self._catalogos = _Catalogos(self._cargar_catalogos())
+        for funcion in self._oyentes:
+            funcion()
+        self.logger.info("Catálogos de traducción recargados")
+
+    def _cargar_catalogos(self) -> dict:
+        return {lang: cargar_catalogo(self.locales_dir, lang) for lang in self.supported_langs}
+
+
+class VigilanteLocales:
+    """Detecta cambios en los .po/.mo y recarga el servicio de traducción.
+
+    Se ejecuta como tarea periódica del planificador: solo compara fechas de
+    modificación, así que no necesita un hilo propio ni dependencias externas.
+    """
+
+    def __init__(self, traducciones: TranslationService):
+        self.traducciones = traducciones
+        self.logger = logging.getLogger("SecureBot.translation")
+        self._firma = self._calcular_firma()
+
+    def comprobar(self):
+        """Recarga los catálogos si algún archivo cambió desde la última vez."""
+        firma = self._calcular_firma()
+        if firma == self._firma:
+            return False
+        try:
+            self.traducciones.recargar()
+        except Exception as e: # pylint: disable=broad-except
+            # Un .po a medio guardar no debe tumbar las traducciones vigentes
+            self.logger.error(f"Error recargando traducciones: {str(e)}")
+            return False
+        # La recarga puede haber recompilado algún .mo
+        self._firma = self._calcular_firma()
+        return True
+
+    def _calcular_firma(self):
+        directorio = self.traducciones.locales_dir
+        if not directorio.exists():
+            return {}
+        firma = {}
+        for patron in ("**/*.po", "**/*.mo"):
+            for ruta in directorio.glob(patron):
+                estado = ruta.stat()
+                firma[str(ruta)] = (estado.st_mtime_ns, estado.st_size)
+        return firma
+
+
+def cargar_catalogo(locales_dir: Path, lang: str) -> dict:
+    """Lee el .mo de un idioma. Un archivo ausente o vacío da un catálogo vacío.
+
+    Si el .po es más reciente que su .mo, se recompila antes de leerlo.
+    """
+    ruta = ruta_mo(locales_dir, lang)
+    po = ruta_po(locales_dir, lang)
+    if po is not None and (ruta is None or po.stat().st_mtime_ns > ruta.stat().st_mtime_ns):
+        ruta = po.with_suffix(".mo")
+        compilar_po(po, ruta)
+    if ruta is None:
+        return {}
+    datos = ruta.read_bytes()
+    return leer_mo(datos) if datos else {}
+
+
+def ruta_po(locales_dir: Path, lang: str):
+    """Devuelve el .po de un idioma, si existe."""
+    for ruta in (
+        Path(locales_dir) / lang / f"{lang}_{DOMINIO}.po",
+        Path(locales_dir) / lang / "LC_MESSAGES" / f"{DOMINIO}.po",
+    ):
+        if ruta.exists():
+            return ruta
+    return None
+
+
+def compilar_po(po_path: Path, mo_path: Path):
+    """Compila un .po a .mo escribiendo en un temporal y reemplazando de forma atómica."""
+    # Sin traducciones (p. ej. el idioma original) queda un .mo válido con solo la cabecera
+    datos = escribir_mo(leer_po(Path(po_path).read_text(encoding="utf-8")))
+    fd, temporal = tempfile.mkstemp(dir=str(Path(mo_path).parent), suffix=".mo.tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(datos)
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, mo_path)
+    except Exception:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def leer_po(texto: str) -> dict:
+    """Interpreta un .po: msgid/msgstr, cadenas multilínea y plurales (forma singular).
+
+    Igual que msgfmt, ignora la cabecera y las entradas fuzzy, con contexto o sin traducir.
+    """
+    catalogo = {}
+    entrada = {}
+    campo = None
+    fuzzy = False
+
+    def cerrar():
+        msgid = entrada.get("msgid")
+        msgstr = entrada.get("msgstr", entrada.get("msgstr[0]", ""))
+        if msgid and msgstr and not fuzzy and "msgctxt" not in entrada:
+            catalogo[msgid] = msgstr
+
+    for linea in texto.splitlines():
+        linea = linea.strip()
+        if not linea:
+            continue
+        if linea.startswith('"'):
+            if campo is not None:
+                entrada[campo] += ast.literal_eval(linea)
+            continue
+
+        clave, _, valor = linea.partition(" ")
+        nueva = linea.startswith("#") or clave in ("msgctxt", "msgid")
+        if nueva and any(k.startswith("msgstr") for k in entrada):
+            cerrar()
+            entrada, campo, fuzzy = {}, None, False
+
+        if linea.startswith("#"):
+            if linea.startswith("#,") and "fuzzy" in linea:
+                fuzzy = True
+            continue
+        campo = clave
+        entrada[campo] = ast.literal_eval(valor) if valor else ""
+    cerrar()
+    return catalogo
+
+
+def escribir_mo(catalogo: dict) -> bytes:
+    """Genera un .mo GNU (little endian) a partir de un diccionario msgid -> msgstr."""
+    catalogo = dict(catalogo)
+    catalogo.setdefault("", "Content-Type: text/plain; charset=UTF-8\n")
+    claves = sorted(catalogo)
+    ids = b""
+    strs = b""
+    posiciones = []
+    for clave in claves:
+        msgid = clave.encode("utf-8")
+        msgstr = catalogo[clave].encode("utf-8")
+        posiciones.append((len(ids), len(msgid), len(strs), len(msgstr)))
+        ids += msgid + b"\0"
+        strs += msgstr + b"\0"
+
+    total = len(claves)
+    inicio_claves = 7 * 4
+    inicio_valores = inicio_claves + total * 8
+    inicio_ids = inicio_valores + total * 8
+    inicio_strs = inicio_ids + len(ids)
+
+    salida = struct.pack("<7I", 0x950412de, 0, total, inicio_claves, inicio_valores, 0, 0)
+    for pos_id, len_id, _, _ in posiciones:
+        salida += struct.pack("<2I", len_id, inicio_ids + pos_id)
+    for _, _, pos_str, len_str in posiciones:
+        salida += struct.pack("<2I", len_str, inicio_strs + pos_str)
+    return salida + ids + strs
+
+
+def ruta_mo(locales_dir: Path, lang: str):
+    """Devuelve el .mo de un idioma, en la estructura del proyecto o en la estándar."""
+    for ruta in (
+        Path(locales_dir) / lang / f"{lang}_{DOMINIO}.mo",
+        Path(locales_dir) / lang / "LC_MESSAGES" / f"{DOMINIO}.mo",
+    ):
+        if ruta.exists():
+            return ruta
+    return None
+
+
+def leer_mo(datos: bytes) -> dict:
+    """Convierte un catálogo GNU .mo en un diccionario plano msgid -> msgstr."""
+    magia = struct.unpack("<I", datos[:4])[0]
+    if magia == 0x950412de:
+        orden = "<"
+    elif magia == 0xde120495:
+        orden = ">"
+    else:
+        raise ValueError("Archivo .mo inválido")
+
+    _, total, origen, destino = struct.unpack(orden + "4I", datos[4:20])
+    catalogo = {}
+    for i in range(total):
+        len_id, pos_id = struct.unpack(orden + "2I", datos[origen + 8 * i:origen + 8 * i + 8])
+        len_tr, pos_tr = struct.unpack(orden + "2I", datos[destino + 8 * i:destino + 8 * i + 8])
+        msgid = datos[pos_id:pos_id + len_id].decode("utf-8")
+        msgstr = datos[pos_tr:pos_tr + len_tr].decode("utf-8")
+        if not msgid:
+            continue  # cabecera de metadatos
+        # En las formas plurales nos quedamos con la singular
+        msgid = msgid.split("\x00")[0]
+        msgstr = msgstr.split("\x00")[0]
+        if msgstr:
+            catalogo[msgid] = msgstr
+    return catalogo
+
+
+def _crear_gettext(catalogo):
+    buscar = catalogo.get
+
+    def gettext(mensaje):
+        return buscar(mensaje, mensaje)
+    return gettext
+
+
+if __name__ == "__main__":
+    # python -m services.translation [directorio_locales]: recompila todos los .po
+    directorio_locales = Path(sys.argv[1] if len(sys.argv) > 1 else "locales")
+    for archivo_po in sorted(directorio_locales.glob("**/*.po")):
+        compilar_po(archivo_po, archivo_po.with_suffix(".mo"))
+        print(f"✅ {archivo_po.with_suffix('.mo')}")
@@ -0,0 +1,80 @@
+# ------------------------- CLAVES DE USUARIO -------------------------
+"""
+Claves de datos por usuario envueltas con la clave maestra (cifrado de sobre)
+"""
+import logging
+from collections import OrderedDict
+from threading import Lock
+
+from models.encryption import CifradoManager, CifradoUsuario
+
+USER_KEYS_CACHE = 1024
+
+
+class ClavesUsuario:
+    """Entrega el cifrador de cada usuario y permite destruir su clave.
+
+    Las notas y adjuntos de un usuario se cifran con su propia clave, guardada
+    en claves_usuario cifrada con la clave maestra. Borrar esa única fila deja
+    ilegible todo lo suyo al instante (crypto-shredding), aunque los datos aún
+    sigan en la base, en páginas libres o en el WAL hasta que se purguen. Lo
+    guardado antes de existir estas claves (legado = 1) sigue con la clave
+    maestra hasta que RecifradoLegado lo migra.
+    """
+
+    def __init__(self, db, cifrado: CifradoManager, max_cache: int = USER_KEYS_CACHE):
+        self.db = db
+        self.cifrado = cifrado
+        self.max_cache = max_cache
+        self._cache = OrderedDict()
+        self._lock = Lock()
+        self.logger = logging.getLogger("SecureBot.keys")
+
+    def de(self, db_user_id: int, cursor=None) -> CifradoUsuario:
+        """Cifrador del usuario; crea su clave la primera vez.
+
+        Puede escribir en la base: sin `cursor` abre su propia transacción, así
+        que no debe llamarse dentro de otra; con `cursor`, escribe en la del llamador.
+        """
+        with self._lock:
+            cifrador = self._cache.get(db_user_id)
+            if cifrador is not None:
+                self._cache.move_to_end(db_user_id)
+                return cifrador
+
+        fila = (cursor or self.db.conn).execute(
+            "SELECT clave FROM claves_usuario WHERE usuario_id = ?", (db_user_id,)
+        ).fetchone()
+        if fila is None:
+            if cursor is not None:
+                fila = self._crear(cursor, db_user_id)
+            else:
+                with self.db.transaccion() as cur:
+                    fila = self._crear(cur, db_user_id)
+        cifrador = self.cifrado.cifrador_usuario(fila[0])
+
+        with self._lock:
+            self._cache[db_user_id] = cifrador
+            if len(self._cache) > self.max_cache:
+                self._cache.popitem(last=False)
+        return cifrador
+
+    def _crear(self, cursor, db_user_id):
+        cursor.execute(
+            "INSERT OR IGNORE INTO claves_usuario (usuario_id, clave) VALUES (?, ?)",
+            (db_user_id, self.cifrado.envolver_clave(CifradoUsuario.nueva_clave()))
+        )
+        # Si otro hilo se adelantó, manda la suya
+        return cursor.execute(
+            "SELECT clave FROM claves_usuario WHERE usuario_id = ?", (db_user_id,)
+        ).fetchone()
+
+    def destruir(self, cursor, db_user_id: int):
+        """Borra la clave del usuario dentro de la transacción de `cursor`."""
+        cursor.execute("DELETE FROM claves_usuario WHERE usuario_id = ?", (db_user_id,))
+        self.olvidar(db_user_id)
+
+    def olvidar(self, db_user_id: int):
+        """Quita de memoria el cifrador del usuario."""
+        with self._lock:
+            self._cache.pop(db_user_id, None)
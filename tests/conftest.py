@@ -0,0 +1,29 @@
+# ------------------------- PRUEBAS -------------------------
+"""
+Utilidades comunes de las pruebas
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.database import SecureDB  # pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """SecureDB nueva en un directorio temporal (DB_PATH es relativo)."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(SecureDB, "_instance", None)
+    base = SecureDB.get_instance()
+    yield base
+    base.conn.close()
+
+
+@pytest.fixture(scope="session")
+def cifrado():
+    """Clave maestra de pruebas (el PBKDF2 se calcula una sola vez)."""
+    from models.encryption import CifradoManager  # pylint: disable=import-outside-toplevel
+    return CifradoManager(b"sal-de-pruebas-16", "clave maestra de pruebas")
@@ -0,0 +1,77 @@
+import io
+import os
+
+import pytest
+
+from services.attachments import AlmacenAdjuntos
+from services.user_keys import ClavesUsuario
+
+
+@pytest.fixture
+def almacen(db, cifrado, tmp_path):
+    with db.transaccion() as cursor:
+        cursor.executemany(
+            "INSERT INTO usuarios (id, telegram_id) VALUES (?, ?)", [(1, 100), (2, 200)]
+        )
+        cursor.executemany(
+            "INSERT INTO notas (id, usuario_id, contenido_cifrado) VALUES (?, ?, x'00')",
+            [(10, 1), (11, 1), (20, 2)]
+        )
+    return AlmacenAdjuntos(db, cifrado, ClavesUsuario(db, cifrado), tmp_path / "adjuntos")
+
+
+def _guardar(almacen, db_user_id, nota_id, datos=b"contenido del archivo"):
+    return almacen.guardar(db_user_id, nota_id, io.BytesIO(datos), "a.txt", "text/plain")
+
+
+def test_deduplica_por_contenido_dentro_de_cada_usuario(almacen):
+    huella, duplicado = _guardar(almacen, 1, 10)
+    assert not duplicado
+    assert _guardar(almacen, 1, 11) == (huella, True)
+    otra, duplicado = _guardar(almacen, 2, 20)
+    # La huella lleva una clave por usuario: no revela que otro tiene el mismo archivo
+    assert otra != huella and not duplicado
+
+    assert [fila[0] for fila in almacen.listar(1, 10)] == [huella]
+    assert almacen.listar(2, 10) == []
+    archivos = [ruta for ruta in almacen.directorio.rglob("*") if ruta.is_file()]
+    assert len(archivos) == 2
+    assert all(b"contenido" not in ruta.read_bytes() for ruta in archivos)
+
+    temporal = almacen.descifrar_a_temporal(1, huella)
+    try:
+        with open(temporal, "rb") as archivo:
+            assert archivo.read() == b"contenido del archivo"
+    finally:
+        os.remove(temporal)
+
+
+def test_borra_el_archivo_solo_al_quitar_la_ultima_referencia(db, almacen):
+    huella, _ = _guardar(almacen, 1, 10)
+    _guardar(almacen, 1, 11)
+    ruta = almacen.ruta(huella)
+
+    # Otro usuario no puede desvincular notas ajenas
+    with db.transaccion() as cursor:
+        assert almacen.desvincular(cursor, 2, 10) == []
+    with db.transaccion() as cursor:
+        assert almacen.desvincular(cursor, 1, 10) == []
+    assert ruta.exists()
+
+    with db.transaccion() as cursor:
+        huerfanas = almacen.desvincular(cursor, 1, 11)
+    assert huerfanas == [huella]
+    assert ruta.exists()
+    assert almacen.borrar_sin_uso(huerfanas) == 1
+    assert not ruta.exists()
+
+
+def test_borrar_sin_uso_respeta_un_archivo_reutilizado(db, almacen):
+    huella, _ = _guardar(almacen, 1, 10)
+    with db.transaccion() as cursor:
+        huerfanas = almacen.desvincular(cursor, 1, 10)
+    # Se vuelve a adjuntar antes de que se borre el archivo
+    _guardar(almacen, 1, 11)
+
+    assert almacen.borrar_sin_uso(huerfanas) == 0
+    assert almacen.ruta(huella).exists()
@@ -0,0 +1,51 @@
+import gzip
+import json
+
+from services.audit_archive import ArchivadorAuditoria, TAREA_LOTE
+
+
+class PlanificadorFalso:
+    def __init__(self):
+        self.programadas = []
+
+    def programar(self, clave, cuando, f, *args):
+        self.programadas.append((clave, f))
+
+
+def _auditoria(db, filas):
+    with db.transaccion() as cursor:
+        cursor.execute("INSERT INTO usuarios (id, telegram_id) VALUES (1, 100)")
+        cursor.executemany(
+            "INSERT INTO auditoria (usuario_id, tipo_evento, detalles, fecha) VALUES (1, ?, '{}', ?)",
+            filas
+        )
+
+
+def test_un_lote_por_tarea_hasta_archivar_todo(db, tmp_path):
+    _auditoria(db, [("INICIO_SESION", "2020-01-05 10:00:00")] * 5
+               + [("NOTA_CREADA", "2020-02-01 10:00:00"), ("INICIO_SESION", "2999-01-01 00:00:00")])
+    planificador = PlanificadorFalso()
+    archivador = ArchivadorAuditoria(
+        db, tmp_path / "archivo", politica={"INICIO_SESION": 30, "*": 365},
+        batch_rows=2, planificador=planificador
+    )
+
+    archivador.lanzar()
+    lotes = []
+    while planificador.programadas:
+        clave, tarea = planificador.programadas.pop(0)
+        assert clave == TAREA_LOTE
+        lotes.append(tarea())
+
+    assert lotes == [2, 2, 1, 1, 0]
+    assert db.conn.execute("SELECT fecha FROM auditoria").fetchall() == [("2999-01-01 00:00:00",)]
+    with gzip.open(tmp_path / "archivo" / "auditoria-2020-01.jsonl.gz") as archivo:
+        eventos = [json.loads(linea) for linea in archivo]
+    assert [evento["tipo_evento"] for evento in eventos] == ["INICIO_SESION"] * 5
+
+
+def test_ejecutar_archiva_de_una_vez(db, tmp_path):
+    _auditoria(db, [("INICIO_SESION", "2020-01-05 10:00:00")] * 3)
+    archivador = ArchivadorAuditoria(db, tmp_path, politica={"*": 30}, batch_rows=2)
+    assert archivador.ejecutar() == 3
+    assert archivador.ejecutar() == 0
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+
+from services.dedup import DEDUP_STATE_KEY, UpdatesRecientes
+
+
+def test_confirma_solo_hasta_la_mas_antigua_en_curso(db):
+    recientes = UpdatesRecientes(db)
+    assert recientes.confirmado() is None
+    for update_id in (10, 11, 12):
+        assert recientes.nuevo(update_id)
+    assert recientes.confirmado() == 9
+
+    recientes.terminado(12)
+    recientes.terminado(11)
+    assert recientes.confirmado() == 9
+    recientes.terminado(10)
+    assert recientes.confirmado() == 12
+
+
+def test_las_repetidas_no_vuelven_a_quedar_en_curso(db):
+    recientes = UpdatesRecientes(db)
+    recientes.nuevo(10)
+    recientes.terminado(10)
+    assert not recientes.nuevo(10)
+    # Repetidas o no, cuentan para lo recibido
+    assert not recientes.nuevo(10) and recientes.confirmado() == 10
+
+
+def test_esperar_avance(db):
+    recientes = UpdatesRecientes(db)
+    recientes.nuevo(10)
+    assert not recientes.esperar_avance(9, timeout=0.01)
+
+    threading.Timer(0.05, recientes.terminado, (10,)).start()
+    assert recientes.esperar_avance(9, timeout=5)
+    assert recientes.confirmado() == 10
+
+
+def test_guarda_lo_confirmado_no_lo_admitido(db):
+    recientes = UpdatesRecientes(db)
+    recientes.nuevo(10)
+    recientes.nuevo(11)
+    recientes.terminado(11)
+    assert recientes.guardar()
+    assert not recientes.guardar()
+    assert UpdatesRecientes(db).cargar() == 9
+
+
+def test_el_anillo_olvida_los_mas_antiguos(db):
+    recientes = UpdatesRecientes(db, capacidad=3)
+    for update_id in (1, 2, 3, 4):
+        assert recientes.nuevo(update_id)
+        recientes.terminado(update_id)
+    assert len(recientes) == 3
+    assert not recientes.nuevo(4) and not recientes.nuevo(2)
+    # Fuera de la ventana vuelve a parecer nueva
+    assert recientes.nuevo(1)
+
+
+def test_guarda_y_recupera_el_ultimo_confirmado(db):
+    recientes = UpdatesRecientes(db)
+    assert not recientes.guardar()
+    for update_id in (7, 8):
+        recientes.nuevo(update_id)
+        recientes.terminado(update_id)
+    assert recientes.guardar()
+
+    tras_reinicio = UpdatesRecientes(db)
+    assert tras_reinicio.cargar() == 8
+    assert tras_reinicio.confirmado() == 8
+    # Lo ya guardado no se vuelve a escribir
+    assert not tras_reinicio.guardar()
+
+
+def test_ignora_lo_guardado_fuera_de_la_ventana(db, monkeypatch):
+    recientes = UpdatesRecientes(db)
+    recientes.nuevo(5)
+    recientes.terminado(5)
+    recientes.guardar()
+    monkeypatch.setattr("services.dedup.time.time", lambda: 10 ** 12)
+    assert UpdatesRecientes(db).cargar(ventana=60) is None
+
+
+def test_carga_el_formato_anterior_con_la_lista_de_ids(db):
+    db.guardar_estado(DEDUP_STATE_KEY, json.dumps({"fecha": int(time.time()), "ids": [3, 9, 4]}))
+    assert UpdatesRecientes(db).cargar() == 9
@@ -0,0 +1,75 @@
+from services.deletion_jobs import TrabajosBorrado, TAREA_LOTE
+from services.metrics import Metricas
+
+
+class PlanificadorFalso:
+    def __init__(self):
+        self.programadas = []
+
+    def programar(self, clave, cuando, f, *args):
+        self.programadas.append((clave, f))
+
+
+def _motor(db, planificador, pasos):
+    trabajos = TrabajosBorrado(db, planificador, lote=2, pausa=0, metricas=Metricas())
+    trabajos.registrar("prueba", pasos)
+    return trabajos
+
+
+def _preparar(db, filas):
+    with db.transaccion() as cursor:
+        cursor.execute("CREATE TABLE prueba (id INTEGER PRIMARY KEY, grupo INTEGER)")
+        cursor.executemany("INSERT INTO prueba (grupo) VALUES (?)", [(g,) for g in filas])
+
+
+def test_un_lote_por_tarea_hasta_terminar(db):
+    _preparar(db, [1, 1, 1, 2])
+    planificador = PlanificadorFalso()
+    trabajos = _motor(db, planificador, (
+        """DELETE FROM prueba WHERE id IN (
+            SELECT id FROM prueba WHERE grupo = :grupo LIMIT :lote)""",
+    ))
+    with db.transaccion() as cursor:
+        trabajos.encolar(cursor, "prueba", grupo=1)
+    trabajos.lanzar()
+
+    borradas = []
+    while planificador.programadas and trabajos.pendientes():
+        clave, tarea = planificador.programadas.pop(0)
+        assert clave == TAREA_LOTE
+        borradas.append(tarea())
+
+    assert borradas == [2, 1]
+    assert db.conn.execute("SELECT grupo FROM prueba").fetchall() == [(2,)]
+    assert trabajos.pendientes() == 0
+
+
+def test_unico_no_duplica_el_trabajo(db):
+    trabajos = _motor(db, PlanificadorFalso(), ("SELECT 1",))
+    with db.transaccion() as cursor:
+        trabajos.encolar(cursor, "prueba", unico=True)
+        trabajos.encolar(cursor, "prueba", unico=True)
+    assert trabajos.pendientes() == 1
+
+
+def test_un_error_aparta_el_trabajo_hasta_reanudar(db):
+    _preparar(db, [1])
+    fallos = [RuntimeError("fallo")]
+
+    def paso(cursor, _parametros, _lote):
+        if fallos:
+            raise fallos.pop()
+        cursor.execute("DELETE FROM prueba")
+        return cursor.rowcount
+
+    trabajos = _motor(db, PlanificadorFalso(), (paso,))
+    with db.transaccion() as cursor:
+        trabajos.encolar(cursor, "prueba")
+
+    assert trabajos.ejecutar_lote() == 0
+    assert trabajos.ejecutar_lote() == 0
+    assert db.conn.execute("SELECT error FROM trabajos_borrado").fetchone() == ("fallo",)
+
+    trabajos.reanudar()
+    assert trabajos.ejecutar_lote() == 1
+    assert trabajos.pendientes() == 0
@@ -0,0 +1,67 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from services.dispatch import DespachadorOrdenado
+from services.metrics import Metricas
+
+
+def _update(update_id, usuario=1):
+    return SimpleNamespace(update_id=update_id, message=SimpleNamespace(
+        from_user=SimpleNamespace(id=usuario), chat=SimpleNamespace(id=usuario)))
+
+
+def test_mantiene_el_orden_de_cada_usuario():
+    procesadas = []
+    despachador = DespachadorOrdenado(
+        lambda updates: procesadas.append(updates[0].update_id), workers=3, metricas=Metricas()
+    )
+    despachador.iniciar()
+    despachador.enviar([_update(i, usuario=i % 4) for i in range(40)])
+    despachador.detener()
+
+    assert sorted(procesadas) == list(range(40))
+    for usuario in range(4):
+        ids = [i for i in procesadas if i % 4 == usuario]
+        assert ids == sorted(ids)
+
+
+def test_detener_con_la_cola_llena_no_se_bloquea_y_respeta_el_plazo():
+    liberar = threading.Event()
+    procesadas, terminadas = [], []
+
+    def procesar(updates):
+        liberar.wait()
+        procesadas.append(updates[0].update_id)
+
+    despachador = DespachadorOrdenado(
+        procesar, workers=1, metricas=Metricas(), marca_alta=3, limite=3, tope=3,
+        al_terminar=lambda update: terminadas.append(update.update_id)
+    )
+    despachador.iniciar()
+    despachador.enviar([_update(1)])
+    time.sleep(0.05)
+    despachador.enviar([_update(i) for i in (2, 3, 4)])
+    assert despachador.pendientes() == 3
+
+    threading.Timer(0.2, liberar.set).start()
+    inicio = time.monotonic()
+    despachador.detener(plazo=0.1)
+    assert time.monotonic() - inicio < 2
+
+    # Solo terminó la que estaba en curso; las encoladas no se confirman
+    assert procesadas == terminadas == [1]
+    despachador.enviar([_update(5)])
+    assert despachador.pendientes() == 0
+
+
+def test_detener_procesa_lo_encolado_dentro_del_plazo():
+    procesadas = []
+    despachador = DespachadorOrdenado(
+        lambda updates: procesadas.append(updates[0].update_id), workers=1,
+        metricas=Metricas(), marca_alta=2, limite=2, tope=2
+    )
+    despachador.enviar([_update(1), _update(2)])
+    despachador.iniciar()
+    despachador.detener(plazo=5)
+    assert procesadas == [1, 2]
@@ -0,0 +1,61 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from services.export import ExportadorUsuario, descifrar_respaldo
+from services.user_keys import ClavesUsuario
+
+
+@pytest.fixture
+def cuenta(db, cifrado):
+    claves = ClavesUsuario(db, cifrado)
+    textos = [f"nota {i} ñ" for i in range(7)]
+    with db.transaccion() as cursor:
+        cursor.execute("INSERT INTO usuarios (id, telegram_id, lenguaje) VALUES (1, 100, 'es')")
+        cursor.execute("INSERT INTO usuarios (id, telegram_id) VALUES (2, 200)")
+        cursor.executemany(
+            "INSERT INTO notas (usuario_id, contenido_cifrado) VALUES (?, ?)",
+            [(1, claves.de(1, cursor=cursor).cifrar(texto)) for texto in textos]
+            + [(2, claves.de(2, cursor=cursor).cifrar("ajena"))]
+        )
+        cursor.execute(
+            """INSERT INTO recordatorios (usuario_id, texto, hora_recordatorio, recurrente)
+            VALUES (1, 'agua', '08:00', 1)"""
+        )
+    return ExportadorUsuario(db, claves, chunk_rows=3), textos
+
+
+def _leer(zip_path):
+    with zipfile.ZipFile(zip_path) as zf:
+        notas = [json.loads(linea) for linea in zf.read("notas.jsonl").splitlines()]
+        recordatorios = [json.loads(linea) for linea in zf.read("recordatorios.jsonl").splitlines()]
+        return notas, recordatorios, json.loads(zf.read("manifest.json"))
+
+
+def test_exporta_solo_lo_del_usuario(cuenta):
+    exportador, textos = cuenta
+    ruta, resumen = exportador.exportar(1)
+    try:
+        notas, recordatorios, manifiesto = _leer(ruta)
+    finally:
+        os.remove(ruta)
+    assert [nota["texto"] for nota in notas] == textos
+    assert [(r["texto"], r["recurrente"]) for r in recordatorios] == [("agua", True)]
+    assert resumen["notas"] == manifiesto["notas"] == 7
+
+
+def test_respaldo_con_passphrase_ida_y_vuelta(cuenta, tmp_path):
+    exportador, textos = cuenta
+    ruta, _ = exportador.exportar(1, passphrase="una frase larga")
+    try:
+        with open(ruta, "rb") as archivo:
+            assert not zipfile.is_zipfile(archivo)
+        with pytest.raises(ValueError):
+            descifrar_respaldo(ruta, tmp_path / "mal.zip", "otra frase")
+        descifrar_respaldo(ruta, tmp_path / "respaldo.zip", "una frase larga")
+    finally:
+        os.remove(ruta)
+    notas, _, _ = _leer(tmp_path / "respaldo.zip")
+    assert [nota["texto"] for nota in notas] == textos
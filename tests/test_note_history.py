@@ -0,0 +1,41 @@
+import base64
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("telebot")
+from core.Bot import RecoNotasBot  # pylint: disable=wrong-import-position
+from services.tags import IndiceEtiquetas  # pylint: disable=wrong-import-position
+from services.user_keys import ClavesUsuario  # pylint: disable=wrong-import-position
+
+
+def test_editar_conserva_solo_las_ultimas_versiones(db, cifrado):
+    claves = ClavesUsuario(db, cifrado)
+    with db.transaccion() as cursor:
+        cursor.execute("INSERT INTO usuarios (id, telegram_id) VALUES (1, 100)")
+        cursor.executemany(
+            "INSERT INTO notas (id, usuario_id, contenido_cifrado) VALUES (?, 1, ?)",
+            [(10, claves.de(1, cursor=cursor).cifrar("v0")),
+             (11, claves.de(1, cursor=cursor).cifrar("otra"))]
+        )
+    bot = SimpleNamespace(
+        db=db, claves=claves, etiquetas=IndiceEtiquetas(db, cifrado),
+        config=SimpleNamespace(note_history_limit=3),
+        vistas_previas=SimpleNamespace(invalidar=lambda _id: None),
+    )
+
+    for version in range(1, 6):
+        assert RecoNotasBot._update_note(bot, 100, 10, f"v{version}")  # pylint: disable=protected-access
+    RecoNotasBot._update_note(bot, 100, 11, "otra 2")  # pylint: disable=protected-access
+
+    cifrador = claves.de(1)
+    actual = db.conn.execute("SELECT contenido_cifrado FROM notas WHERE id = 10").fetchone()[0]
+    assert cifrador.descifrar(actual) == "v5"
+    versiones = [
+        cifrador.descifrar(base64.urlsafe_b64encode(fila[0]))
+        for fila in db.conn.execute(
+            "SELECT contenido_cifrado FROM notas_historial WHERE nota_id = 10 ORDER BY id")
+    ]
+    assert versiones == ["v2", "v3", "v4"]
+    assert db.conn.execute(
+        "SELECT COUNT(*) FROM notas_historial WHERE nota_id = 11").fetchone() == (1,)
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from services.note_import import (
+    parse_notes, FormatoImportacionError, MAX_IMPORT_BYTES, MAX_IMPORT_NOTES, MAX_NOTE_LENGTH
+)
+
+
+def test_texto_separa_por_lineas_en_blanco():
+    notas, omitidas = parse_notes("notas.txt", b"uno\n\ndos\r\n\r\ntres\n")
+    assert notas == ["uno", "dos", "tres"]
+    assert omitidas == 0
+
+
+def test_texto_con_separadores_no_parte_por_lineas_en_blanco():
+    notas, _ = parse_notes("notas.txt", "uno\n\nsigue\n---\ndos".encode())
+    assert notas == ["uno\n\nsigue", "dos"]
+
+
+def test_markdown_separa_por_encabezados():
+    notas, _ = parse_notes("notas.md", b"# Uno\ntexto\n\nmas\n## Dos\notro")
+    assert notas == ["# Uno\ntexto\n\nmas", "## Dos\notro"]
+
+
+def test_json_lista_de_textos_y_objetos():
+    datos = {"notas": ["a", {"title": "T", "text": "cuerpo"}, {"contenido": "c"}, {"x": 1}]}
+    notas, _ = parse_notes("notas.json", json.dumps(datos).encode())
+    assert notas == ["a", "T\ncuerpo", "c"]
+
+
+def test_omite_notas_largas_y_las_que_pasan_del_limite():
+    largas = ["x" * (MAX_NOTE_LENGTH + 1)] * 2
+    cortas = [str(i) for i in range(MAX_IMPORT_NOTES + 3)]
+    notas, omitidas = parse_notes("n.json", json.dumps(largas + cortas).encode())
+    assert len(notas) == MAX_IMPORT_NOTES
+    assert omitidas == 2 + 3
+
+
+def test_utf8_con_bom():
+    notas, _ = parse_notes("n.txt", "﻿añadir".encode("utf-8"))
+    assert notas == ["añadir"]
+
+
+@pytest.mark.parametrize("nombre, datos", [
+    ("n.txt", b"\xff\xfe\x00"),
+    ("n.json", b"{no es json"),
+    ("n.json", b'"texto"'),
+    ("n.txt", b"x" * (MAX_IMPORT_BYTES + 1)),
+])
+def test_errores_de_formato(nombre, datos):
+    with pytest.raises(FormatoImportacionError):
+        parse_notes(nombre, datos)
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+pytest.importorskip("telebot")
+from telebot.apihelper import ApiTelegramException  # pylint: disable=wrong-import-position
+
+from services.metrics import Metricas  # pylint: disable=wrong-import-position
+from services.outbox import (  # pylint: disable=wrong-import-position
+    BuzonSalida, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE
+)
+
+
+def _error(codigo, retry_after=None):
+    resultado = {"ok": False, "error_code": codigo, "description": "error"}
+    if retry_after is not None:
+        resultado["parameters"] = {"retry_after": retry_after}
+    return ApiTelegramException("sendMessage", None, resultado)
+
+
+class BotFalso:
+    def __init__(self, fallos=None):
+        self.fallos = fallos or {}
+        self.enviados = []
+
+    def send_message(self, chat_id, texto, **opciones):
+        if chat_id in self.fallos:
+            raise self.fallos[chat_id]
+        self.enviados.append((chat_id, texto, opciones))
+
+
+def _buzon(db, bot):
+    return BuzonSalida(db, bot, lote=50, metricas=Metricas())
+
+
+def _encolar(db, buzon, chat_id, intentos=0):
+    with db.transaccion() as cursor:
+        buzon.encolar(cursor, chat_id, f"hola {chat_id}", responder_a=3)
+        if intentos:
+            cursor.execute("UPDATE outbox SET intentos = ? WHERE chat_id = ?", (intentos, chat_id))
+
+
+def _fila(db, chat_id):
+    return db.conn.execute(
+        "SELECT proximo_intento, intentos FROM outbox WHERE chat_id = ?", (chat_id,)
+    ).fetchone()
+
+
+def test_borra_los_entregados(db):
+    bot = BotFalso()
+    buzon = _buzon(db, bot)
+    _encolar(db, buzon, 1)
+    _encolar(db, buzon, 2)
+
+    assert buzon.enviar_pendientes() == 2
+    assert [envio[0] for envio in bot.enviados] == [1, 2]
+    assert bot.enviados[0][2] == {"reply_to_message_id": 3, "allow_sending_without_reply": True}
+    assert db.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0] == 0
+
+
+def test_429_espera_lo_que_indica_telegram(db):
+    buzon = _buzon(db, BotFalso({1: _error(429, retry_after=120)}))
+    _encolar(db, buzon, 1)
+    antes = time.time()
+
+    assert buzon.enviar_pendientes() == 0
+    proximo, intentos = _fila(db, 1)
+    assert intentos == 1
+    assert antes + 119 <= proximo <= time.time() + 120
+
+
+def test_descarta_los_rechazos_definitivos(db):
+    bot = BotFalso({1: _error(403)})
+    buzon = _buzon(db, bot)
+    _encolar(db, buzon, 1)
+    _encolar(db, buzon, 2)
+
+    assert buzon.enviar_pendientes() == 1
+    assert _fila(db, 1) is None
+    assert bot.enviados[0][0] == 2
+
+
+@pytest.mark.parametrize("fallo", [_error(502), ConnectionError("caído")])
+def test_reintenta_con_espera_exponencial(db, fallo):
+    buzon = _buzon(db, BotFalso({1: fallo}))
+    _encolar(db, buzon, 1, intentos=2)
+    antes = time.time()
+
+    buzon.enviar_pendientes()
+    proximo, intentos = _fila(db, 1)
+    assert intentos == 3
+    assert proximo >= int(antes) + OUTBOX_RETRY_BASE * 4
+
+
+def test_abandona_tras_el_maximo_de_intentos(db):
+    buzon = _buzon(db, BotFalso({1: _error(500)}))
+    _encolar(db, buzon, 1, intentos=OUTBOX_MAX_ATTEMPTS - 1)
+
+    buzon.enviar_pendientes()
+    assert _fila(db, 1) is None
+
+
+def test_no_envia_los_aun_no_vencidos(db):
+    bot = BotFalso()
+    buzon = _buzon(db, bot)
+    _encolar(db, buzon, 1)
+    with db.transaccion() as cursor:
+        cursor.execute("UPDATE outbox SET proximo_intento = ?", (int(time.time()) + 60,))
+
+    assert buzon.enviar_pendientes() == 0
+    assert not bot.enviados
@@ -0,0 +1,98 @@
+from services.preview_cache import CacheVistasPrevias, PREVIEW_CHARS
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+class Descifrador:
+    def __init__(self):
+        self.llamadas = []
+
+    def __call__(self, contenido):
+        self.llamadas.append(contenido)
+        return contenido.decode() * 100
+
+
+NOTAS = [(1, b"a"), (2, b"b")]
+
+
+def test_reutiliza_lo_descifrado_hasta_que_caduca():
+    reloj, descifrar = Reloj(), Descifrador()
+    cache = CacheVistasPrevias(ttl=60, reloj=reloj)
+
+    vistas = cache.obtener(7, NOTAS, descifrar)
+    assert vistas == {1: "a" * PREVIEW_CHARS, 2: "b" * PREVIEW_CHARS}
+    cache.obtener(7, NOTAS, descifrar)
+    assert len(descifrar.llamadas) == 2
+
+    # Una nota nueva solo descifra esa
+    cache.obtener(7, NOTAS + [(3, b"c")], descifrar)
+    assert descifrar.llamadas[-1] == b"c" and len(descifrar.llamadas) == 3
+
+    reloj.ahora += 61
+    cache.obtener(7, NOTAS, descifrar)
+    assert len(descifrar.llamadas) == 5
+
+
+def test_invalidar_descarta_al_usuario():
+    descifrar = Descifrador()
+    cache = CacheVistasPrevias(ttl=60, reloj=Reloj())
+    cache.obtener(7, NOTAS, descifrar)
+    cache.obtener(8, NOTAS, descifrar)
+    cache.invalidar(7)
+    assert len(cache) == 1
+    cache.obtener(7, NOTAS, descifrar)
+    assert len(descifrar.llamadas) == 6
+
+
+def test_no_guarda_vistas_descifradas_antes_de_una_invalidacion():
+    cache = CacheVistasPrevias(ttl=60, reloj=Reloj())
+
+    def descifrar_mientras_cambia(contenido):
+        cache.invalidar(7)
+        return contenido.decode()
+
+    cache.obtener(7, NOTAS, descifrar_mientras_cambia)
+    assert len(cache) == 0
+
+
+def test_expulsa_al_usado_hace_mas_tiempo_al_superar_max_bytes():
+    descifrar = Descifrador()
+    cache = CacheVistasPrevias(ttl=60, reloj=Reloj())
+    cache.obtener(1, NOTAS, descifrar)
+    cache.max_bytes = cache.bytes * 2
+    cache.obtener(2, NOTAS, descifrar)
+    cache.obtener(1, NOTAS, descifrar)  # 1 pasa a ser el más reciente
+    cache.obtener(3, NOTAS, descifrar)
+
+    assert len(cache) == 2
+    assert cache.bytes <= cache.max_bytes
+    llamadas = len(descifrar.llamadas)
+    cache.obtener(1, NOTAS, descifrar)
+    assert len(descifrar.llamadas) == llamadas
+    cache.obtener(2, NOTAS, descifrar)
+    assert len(descifrar.llamadas) == llamadas + 2
+
+
+def test_no_guarda_un_usuario_mayor_que_el_limite():
+    cache = CacheVistasPrevias(ttl=60, max_bytes=10, reloj=Reloj())
+    cache.obtener(7, NOTAS, Descifrador())
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_purgar_y_ttl_cero():
+    reloj = Reloj()
+    cache = CacheVistasPrevias(ttl=60, reloj=reloj)
+    cache.obtener(7, NOTAS, Descifrador())
+    reloj.ahora += 60
+    assert cache.purgar() == 1
+    assert cache.bytes == 0
+
+    desactivada = CacheVistasPrevias(ttl=0, reloj=reloj)
+    desactivada.obtener(7, NOTAS, Descifrador())
+    assert len(desactivada) == 0
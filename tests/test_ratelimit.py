@@ -0,0 +1,42 @@
+from services.ratelimit import LimitadorUsuarios
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_gasta_fichas_y_se_rellena():
+    reloj = Reloj()
+    limitador = LimitadorUsuarios(capacidad=3, por_minuto=60, reloj=reloj)
+
+    assert [limitador.permitir(1) for _ in range(4)] == [True, True, True, False]
+    assert limitador.espera(1) == 1.0
+    assert limitador.permitir(2)
+
+    reloj.ahora += 1
+    assert limitador.espera(1) == 0.0
+    assert limitador.permitir(1)
+    assert not limitador.permitir(1)
+
+
+def test_coste_mayor_que_las_fichas():
+    limitador = LimitadorUsuarios(capacidad=3, por_minuto=60, reloj=Reloj())
+    assert not limitador.permitir(1, coste=4)
+    assert limitador.permitir(1, coste=3)
+
+
+def test_olvida_a_los_inactivos_y_acota_los_usuarios():
+    reloj = Reloj()
+    limitador = LimitadorUsuarios(capacidad=2, por_minuto=60, max_usuarios=2, reloj=reloj)
+    for usuario in (1, 2, 3):
+        limitador.permitir(usuario)
+    assert len(limitador) == 2
+
+    # Tras rellenarse entera, una cubeta es igual que una nueva
+    reloj.ahora += 2
+    limitador.permitir(4)
+    assert len(limitador) == 1
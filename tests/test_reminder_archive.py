@@ -0,0 +1,54 @@
+from services.deletion_jobs import TrabajosBorrado
+from services.metrics import Metricas
+from services.reminder_archive import ArchivadorRecordatorios
+
+
+class PlanificadorFalso:
+    def __init__(self):
+        self.programadas = []
+
+    def programar(self, clave, cuando, f, *args):
+        self.programadas.append((clave, f))
+
+
+def test_archiva_los_completados_y_conserva_un_historial_corto(db):
+    with db.transaccion() as cursor:
+        cursor.executemany(
+            "INSERT INTO usuarios (id, telegram_id) VALUES (?, ?)", [(1, 100), (2, 200)]
+        )
+        filas = [
+            # usuario, texto, completado, fecha_completado
+            (1, "viejo 1", 1, "2020-01-01 08:00:00"),
+            (1, "viejo 2", 1, "2020-01-02 08:00:00"),
+            (1, "viejo 3", 1, "2020-01-03 08:00:00"),
+            (1, "reciente", 1, "2999-01-01 08:00:00"),
+            (1, "activo", 0, None),
+            (2, "otro", 1, "2020-01-01 08:00:00"),
+        ]
+        cursor.executemany(
+            """INSERT INTO recordatorios
+                (usuario_id, texto, hora_recordatorio, completado, fecha_completado)
+            VALUES (?, ?, '08:00', ?, ?)""",
+            filas
+        )
+        # Ya archivado en una pasada anterior, más antiguo que los de ahora
+        cursor.execute(
+            """INSERT INTO recordatorios_archivo
+                (id, usuario_id, texto, hora_recordatorio, fecha_completado)
+            VALUES (100, 1, 'archivado antes', '08:00', '2019-01-01 08:00:00')"""
+        )
+
+    planificador = PlanificadorFalso()
+    trabajos = TrabajosBorrado(db, planificador, lote=2, pausa=0, metricas=Metricas())
+    ArchivadorRecordatorios(db, trabajos, dias=7, historial=2).ejecutar()
+    while planificador.programadas and trabajos.pendientes():
+        planificador.programadas.pop(0)[1]()
+
+    activos = db.conn.execute("SELECT texto FROM recordatorios ORDER BY id").fetchall()
+    assert activos == [("reciente",), ("activo",)]
+    archivo = db.conn.execute(
+        "SELECT usuario_id, texto FROM recordatorios_archivo ORDER BY usuario_id, id"
+    ).fetchall()
+    # ROW_NUMBER por usuario: solo los `historial` completados más recientes
+    assert archivo == [(1, "viejo 2"), (1, "viejo 3"), (2, "otro")]
+    assert trabajos.pendientes() == 0
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from services.reminders import ocurrencias, recordatorios_perdidos, CATCHUP_MAX_DAYS
+
+
+def _ts(texto):
+    return datetime.strptime(texto, "%Y-%m-%d %H:%M").timestamp()
+
+
+def test_ocurrencias_en_el_intervalo_abierto_por_la_izquierda():
+    instantes = ocurrencias("09:00", _ts("2026-01-01 09:00"), _ts("2026-01-03 09:00"))
+    assert instantes == [datetime(2026, 1, 2, 9, 0), datetime(2026, 1, 3, 9, 0)]
+
+
+def test_ocurrencias_vacio_si_no_llega_la_hora():
+    assert ocurrencias("23:00", _ts("2026-01-01 10:00"), _ts("2026-01-01 22:59")) == []
+
+
+def test_ocurrencias_acotadas_a_los_ultimos_dias():
+    instantes = ocurrencias("12:00", _ts("2025-01-01 00:00"), _ts("2026-01-31 13:00"))
+    assert len(instantes) == CATCHUP_MAX_DAYS
+    assert instantes[-1] == datetime(2026, 1, 31, 12, 0)
+
+
+def test_recordatorios_perdidos_agrupa_por_usuario():
+    ahora = _ts("2026-01-03 10:00")
+    pendientes = [
+        # recurrente desde su próxima ejecución: dos días perdidos
+        (1, 100, "agua", "08:00", 1, _ts("2026-01-02 08:00")),
+        # único sin próxima ejecución: desde el latido, solo el primer instante
+        (2, 100, "cita", "09:00", 0, None),
+        (3, 200, "otro", "09:30", 0, None),
+    ]
+    perdidos = recordatorios_perdidos(pendientes, _ts("2026-01-01 12:00"), ahora)
+
+    assert set(perdidos) == {100, 200}
+    agua, cita = perdidos[100]
+    assert agua[:3] == (1, "agua", True)
+    assert agua[3] == [datetime(2026, 1, 2, 8, 0), datetime(2026, 1, 3, 8, 0)]
+    assert cita == (2, "cita", False, [datetime(2026, 1, 2, 9, 0)])
+
+
+def test_recordatorios_perdidos_sin_latido_ni_proxima():
+    ahora = _ts("2026-01-03 10:00")
+    assert recordatorios_perdidos([(1, 100, "x", "08:00", 1, None)], None, ahora) == {}
+
+
+def test_recordatorios_perdidos_ignora_los_aun_no_vencidos():
+    ahora = _ts("2026-01-03 10:00")
+    pendientes = [(1, 100, "x", "11:00", 1, _ts("2026-01-03 11:00"))]
+    assert recordatorios_perdidos(pendientes, None, ahora) == {}
+
+
+def test_recordatorio_pospuesto_vencido_con_el_bot_parado():
+    # Pospuesto a las 08:10; el bot estuvo parado de 08:05 a 09:00
+    ahora = _ts("2026-01-03 09:00")
+    pendientes = [
+        (1, 100, "único", "08:00", 0, _ts("2026-01-03 08:10")),
+        (2, 100, "diario", "08:00", 1, _ts("2026-01-02 08:10")),
+    ]
+    perdidos = recordatorios_perdidos(pendientes, _ts("2026-01-03 08:05"), ahora)
+
+    unico, diario = perdidos[100]
+    assert unico == (1, "único", False, [datetime(2026, 1, 3, 8, 10)])
+    assert diario[3] == [datetime(2026, 1, 2, 8, 10), datetime(2026, 1, 3, 8, 0)]
@@ -0,0 +1,104 @@
+from datetime import datetime
+
+from services.scheduler import Planificador
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def _ejecutar_vencidas(planificador):
+    """Ejecuta en este hilo lo que el bucle del planificador entregaría al pool."""
+    while True:
+        with planificador._cond:  # pylint: disable=protected-access
+            tarea, espera = planificador._siguiente()  # pylint: disable=protected-access
+        if tarea is None:
+            return espera
+        planificador._ejecutar(*tarea)  # pylint: disable=protected-access
+
+
+def _planificador():
+    reloj = Reloj()
+    return Planificador(reloj=reloj), reloj
+
+
+def test_ejecuta_en_orden_cuando_vence():
+    planificador, reloj = _planificador()
+    hechas = []
+    planificador.programar("b", 1020, hechas.append, "b")
+    planificador.programar("a", datetime.fromtimestamp(1010), hechas.append, "a")
+
+    assert _ejecutar_vencidas(planificador) == 10
+    reloj.ahora = 1020
+    assert _ejecutar_vencidas(planificador) is None
+    assert hechas == ["a", "b"]
+    assert planificador.pendientes() == 0
+
+
+def test_programar_la_misma_clave_sustituye_a_la_anterior():
+    planificador, reloj = _planificador()
+    hechas = []
+    planificador.programar("x", 1010, hechas.append, "vieja")
+    planificador.programar("x", 1030, hechas.append, "nueva")
+    assert planificador.pendientes() == 1
+
+    reloj.ahora = 1010
+    # La entrada vieja se descarta al llegar a la cima del montículo
+    assert _ejecutar_vencidas(planificador) == 20
+    assert len(planificador._heap) == 1  # pylint: disable=protected-access
+    reloj.ahora = 1030
+    _ejecutar_vencidas(planificador)
+    assert hechas == ["nueva"]
+
+
+def test_cancelar_descarta_de_forma_perezosa():
+    planificador, reloj = _planificador()
+    hechas = []
+    planificador.programar("x", 1010, hechas.append, "x")
+    assert planificador.cancelar("x")
+    assert not planificador.cancelar("x")
+    assert not planificador.programada("x")
+    assert len(planificador._heap) == 1  # pylint: disable=protected-access
+
+    reloj.ahora = 2000
+    assert _ejecutar_vencidas(planificador) is None
+    assert hechas == [] and not planificador._heap  # pylint: disable=protected-access
+
+
+def test_cada_se_repite_hasta_cancelarse_aunque_falle():
+    planificador, reloj = _planificador()
+    llamadas = []
+
+    def tarea():
+        llamadas.append(reloj.ahora)
+        raise RuntimeError("fallo")
+
+    planificador.cada("periodica", 60, tarea, primera=5)
+    assert _ejecutar_vencidas(planificador) == 5
+    for instante in (1005, 1065, 1125):
+        reloj.ahora = instante
+        assert _ejecutar_vencidas(planificador) == 60
+    assert llamadas == [1005, 1065, 1125]
+    assert planificador.programada("periodica")
+
+    planificador.cancelar("periodica")
+    reloj.ahora = 5000
+    _ejecutar_vencidas(planificador)
+    assert len(llamadas) == 3
+
+
+def test_programar_sobre_una_periodica_la_sustituye():
+    planificador, reloj = _planificador()
+    hechas = []
+    planificador.cada("p", 10, hechas.append, "vieja")
+    # Sustituir una periódica por una única detiene la repetición
+    planificador.programar("p", 1010, hechas.append, "única")
+    reloj.ahora = 1010
+    _ejecutar_vencidas(planificador)
+    reloj.ahora = 1100
+    _ejecutar_vencidas(planificador)
+    assert hechas == ["única"]
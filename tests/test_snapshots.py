@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+from models.database import DB_PATH
+from services.snapshots import SnapshotError, SnapshotManager
+
+
+def _contar(ruta, tabla):
+    conn = sqlite3.connect(str(ruta))
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_snapshot_verificado_y_restaurado_en_otra_ruta(db, tmp_path):
+    with db.transaccion() as cursor:
+        cursor.executemany(
+            "INSERT INTO usuarios (telegram_id) VALUES (?)", [(i,) for i in range(1, 6)]
+        )
+        cursor.executemany(
+            "INSERT INTO notas (usuario_id, contenido_cifrado) VALUES (1, ?)", [(b"x",)] * 3
+        )
+    snapshot = SnapshotManager(DB_PATH, tmp_path / "snapshots", pages_per_step=1,
+                               step_pause=0).crear()
+
+    assert snapshot.exists() and not snapshot.with_name(snapshot.name + ".partial").exists()
+    assert SnapshotManager(DB_PATH, tmp_path / "snapshots").verificar(snapshot) == (True, "ok")
+
+    nueva = tmp_path / "restaurada.db"
+    seguridad = SnapshotManager(nueva, tmp_path / "snapshots").restaurar(snapshot)
+    assert seguridad is None
+    assert _contar(nueva, "usuarios") == 5
+    assert _contar(nueva, "notas") == 3
+
+
+def test_rotar_conserva_los_mas_recientes(tmp_path):
+    manager = SnapshotManager(tmp_path / "x.db", tmp_path, keep=2)
+    nombres = [f"reconotas_20260101-00000{i}.db" for i in range(4)]
+    for nombre in nombres:
+        (tmp_path / nombre).write_bytes(b"")
+    manager.rotar()
+    assert [ruta.name for ruta in manager.listar()] == nombres[2:]
+
+
+def test_no_restaura_un_snapshot_corrupto(tmp_path):
+    corrupto = tmp_path / "reconotas_20260101-000000.db"
+    corrupto.write_bytes(b"esto no es sqlite" * 100)
+    manager = SnapshotManager(tmp_path / "x.db", tmp_path)
+    assert not manager.verificar(corrupto)[0]
+    with pytest.raises(SnapshotError):
+        manager.restaurar(corrupto)
+    assert not (tmp_path / "x.db").exists()
@@ -0,0 +1,36 @@
+from services.tags import IndiceEtiquetas, TIPO_CARPETA, TIPO_ETIQUETA, extraer_etiquetas
+
+
+def test_extraer_etiquetas_y_carpetas():
+    etiquetas, carpetas = extraer_etiquetas("Compra #Pan y #trabajo/clientes/Acme, no#esto")
+    assert etiquetas == {"pan"}
+    assert carpetas == {"trabajo", "trabajo/clientes", "trabajo/clientes/acme"}
+
+
+def _notas(db, contenidos):
+    with db.transaccion() as cursor:
+        cursor.execute("INSERT INTO usuarios (id, telegram_id) VALUES (1, 100)")
+        cursor.executemany(
+            "INSERT INTO notas (usuario_id, contenido_cifrado, etiquetado) VALUES (1, ?, 0)",
+            [(contenido,) for contenido in contenidos]
+        )
+
+
+def test_indexar_pendientes_salta_las_notas_ilegibles(db, cifrado):
+    _notas(db, [cifrado.cifrar("#a"), b"token roto", cifrado.cifrar("#b/c")])
+    etiquetas = IndiceEtiquetas(db, cifrado)
+
+    assert etiquetas.indexar_pendientes(lote=2) == 3
+    assert [fila[0] for fila in etiquetas.buscar(1, TIPO_ETIQUETA, "a")] == [1]
+    assert [fila[0] for fila in etiquetas.buscar(1, TIPO_CARPETA, "b")] == [3]
+    assert db.conn.execute("SELECT COUNT(*) FROM notas WHERE etiquetado = 0").fetchone() == (0,)
+    assert etiquetas.indexar_pendientes() == 0
+
+
+def test_indexar_nuevas(db, cifrado):
+    _notas(db, [b"x", b"y"])
+    etiquetas = IndiceEtiquetas(db, cifrado)
+    with db.transaccion() as cursor:
+        assert etiquetas.indexar_nuevas(cursor, 1, [(1, "#uno #dos"), (2, "sin etiquetas")]) == 2
+    assert [fila[0] for fila in etiquetas.buscar(1, TIPO_ETIQUETA, "#DOS")] == [1]
+    assert db.conn.execute("SELECT COUNT(*) FROM notas WHERE etiquetado = 1").fetchone() == (2,)
@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("telebot")
+import requests  # pylint: disable=wrong-import-position
+from telebot.apihelper import ApiTelegramException  # pylint: disable=wrong-import-position
+
+from bench.telegram_http import ApiLocal, ServidorFalso, medir  # pylint: disable=wrong-import-position
+from services.metrics import Metricas  # pylint: disable=wrong-import-position
+from services.telegram_http import SesionTelegram  # pylint: disable=wrong-import-position
+
+
+def test_reutiliza_las_conexiones_del_pool():
+    resultado = medir(peticiones=60, hilos=6, conexiones=2, retardo=0)
+    assert 1 <= resultado["conexiones"] <= 2
+    assert resultado["p99_ms"] >= resultado["p50_ms"] > 0
+
+
+@pytest.mark.parametrize("fallo, error", [
+    ("cortar", requests.ConnectionError),
+    (502, ApiTelegramException),
+])
+def test_no_reenvia_un_post_que_pudo_llegar(fallo, error):
+    sesion = SesionTelegram(conexiones=1, reintentos=3, metricas=Metricas())
+    with ServidorFalso(fallo=fallo) as servidor, ApiLocal(servidor, sesion) as bot:
+        with pytest.raises(error):
+            bot.send_message(1, "hola")
+        assert servidor.peticiones == 1
+    sesion.cerrar()
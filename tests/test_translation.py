@@ -0,0 +1,46 @@
+import gettext
+import os
+import shutil
+from pathlib import Path
+
+from services.translation import cargar_catalogo, compilar_po, leer_po
+
+LOCALES = Path(__file__).resolve().parent.parent / "locales"
+
+
+def test_compila_un_mo_que_entiende_gnu_gettext(tmp_path):
+    po = LOCALES / "en" / "en_reconotas.po"
+    catalogo = leer_po(po.read_text(encoding="utf-8"))
+    assert catalogo
+
+    mo = tmp_path / "en.mo"
+    compilar_po(po, mo)
+    with open(mo, "rb") as archivo:
+        traducciones = gettext.GNUTranslations(archivo)
+    for msgid, msgstr in catalogo.items():
+        assert traducciones.gettext(msgid) == msgstr
+
+
+def test_un_po_sin_traducciones_da_un_mo_valido(tmp_path):
+    mo = tmp_path / "es.mo"
+    compilar_po(LOCALES / "es" / "es_reconotas.po", mo)
+    with open(mo, "rb") as archivo:
+        assert gettext.GNUTranslations(archivo).gettext("Hola") == "Hola"
+    assert cargar_catalogo(LOCALES, "es") == {}
+
+
+def test_recompila_el_mo_si_el_po_es_mas_reciente(tmp_path):
+    shutil.copytree(LOCALES / "en", tmp_path / "en")
+    po = tmp_path / "en" / "en_reconotas.po"
+    mo = tmp_path / "en" / "en_reconotas.mo"
+    compilar_po(po, mo)
+    assert "Nueva cadena" not in cargar_catalogo(tmp_path, "en")
+
+    with open(po, "a", encoding="utf-8") as archivo:
+        archivo.write('\nmsgid "Nueva cadena"\nmsgstr "New string"\n')
+    futuro = mo.stat().st_mtime_ns + 10**9
+    os.utime(po, ns=(futuro, futuro))
+
+    assert cargar_catalogo(tmp_path, "en")["Nueva cadena"] == "New string"
+    with open(mo, "rb") as archivo:
+        assert gettext.GNUTranslations(archivo).gettext("Nueva cadena") == "New string"
@@ -0,0 +1,174 @@
+import base64
+import io
+
+import pytest
+from cryptography.fernet import Fernet
+
+from services.attachments import AlmacenAdjuntos
+from services.deletion_jobs import TrabajosBorrado
+from services.erasure import PurgaUsuarios, lapida
+from services.key_migration import RecifradoLegado
+from services.metrics import Metricas
+from services.tags import IndiceEtiquetas, TIPO_ETIQUETA
+from services.user_keys import ClavesUsuario
+
+
+class PlanificadorFalso:
+    def __init__(self):
+        self.programadas = []
+
+    def programar(self, clave, cuando, f, *args):
+        self.programadas.append((clave, f))
+
+    def ejecutar_todo(self):
+        while self.programadas:
+            self.programadas.pop(0)[1]()
+
+
+@pytest.fixture
+def servicios(db, cifrado, tmp_path):
+    planificador = PlanificadorFalso()
+    claves = ClavesUsuario(db, cifrado)
+    adjuntos = AlmacenAdjuntos(db, cifrado, claves, tmp_path / "adjuntos")
+    etiquetas = IndiceEtiquetas(db, cifrado)
+    trabajos = TrabajosBorrado(db, planificador, pausa=0, metricas=Metricas())
+    return {
+        "planificador": planificador,
+        "claves": claves,
+        "adjuntos": adjuntos,
+        "etiquetas": etiquetas,
+        "trabajos": trabajos,
+        "purga": PurgaUsuarios(claves, adjuntos, trabajos),
+        "recifrado": RecifradoLegado(db, claves, adjuntos, etiquetas, trabajos),
+    }
+
+
+def _usuario(db, db_user_id, telegram_id=None):
+    with db.transaccion() as cursor:
+        cursor.execute(
+            "INSERT INTO usuarios (id, telegram_id) VALUES (?, ?)",
+            (db_user_id, telegram_id or db_user_id * 100)
+        )
+
+
+def _nota(db, db_user_id, contenido, legado=0, etiquetado=1):
+    with db.transaccion() as cursor:
+        cursor.execute(
+            """INSERT INTO notas (usuario_id, contenido_cifrado, legado, etiquetado)
+            VALUES (?, ?, ?, ?)""",
+            (db_user_id, contenido, legado, etiquetado)
+        )
+        return cursor.lastrowid
+
+
+def _clave_propia(db, cifrado, db_user_id):
+    """Fernet solo con la clave del usuario (sin la maestra de respaldo)."""
+    envuelta = db.conn.execute(
+        "SELECT clave FROM claves_usuario WHERE usuario_id = ?", (db_user_id,)
+    ).fetchone()[0]
+    return Fernet(cifrado.cipher.decrypt(envuelta))
+
+
+def test_tras_borrar_la_cuenta_sus_notas_son_ilegibles(db, cifrado, servicios):
+    _usuario(db, 1)
+    contenido = servicios["claves"].de(1).cifrar("secreto")
+    nota_id = _nota(db, 1, contenido)
+
+    with db.transaccion() as cursor:
+        servicios["purga"].borrar(cursor, 1)
+
+    assert db.conn.execute("SELECT telegram_id FROM usuarios WHERE id = 1").fetchone() == (lapida(1),)
+    # La fila sigue hasta la purga por lotes, pero ninguna clave la descifra
+    fila = db.conn.execute("SELECT contenido_cifrado FROM notas WHERE id = ?", (nota_id,)).fetchone()
+    assert fila == (contenido,)
+    with pytest.raises(ValueError):
+        cifrado.descifrar(contenido)
+    with pytest.raises(ValueError):
+        ClavesUsuario(db, cifrado).de(1).descifrar(contenido)
+
+    servicios["trabajos"].lanzar()
+    servicios["planificador"].ejecutar_todo()
+    assert db.conn.execute("SELECT COUNT(*) FROM notas").fetchone() == (0,)
+    assert db.conn.execute("SELECT COUNT(*) FROM usuarios").fetchone() == (0,)
+
+
+def test_recifra_lo_legado_con_la_clave_del_usuario(db, cifrado, servicios):
+    _usuario(db, 1)
+    _usuario(db, 2, telegram_id=lapida(2))
+    nota_id = _nota(db, 1, cifrado.cifrar("nota #antigua"), legado=1, etiquetado=0)
+    borrada_id = _nota(db, 2, cifrado.cifrar("de un usuario borrado"), legado=1)
+    with db.transaccion() as cursor:
+        cursor.execute(
+            "INSERT INTO notas_historial (nota_id, contenido_cifrado, legado) VALUES (?, ?, 1)",
+            (nota_id, base64.urlsafe_b64decode(cifrado.cifrar("versión anterior")))
+        )
+        cursor.execute(
+            "INSERT INTO adjuntos (huella, usuario_id, tamaño, legado) VALUES ('ab12', 1, 4, 1)"
+        )
+    ruta = servicios["adjuntos"].ruta("ab12")
+    ruta.parent.mkdir(parents=True)
+    with open(ruta, "wb") as destino:
+        cifrado.cifrar_flujo(io.BytesIO(b"hola"), destino)
+
+    servicios["recifrado"].iniciar()
+    servicios["planificador"].ejecutar_todo()
+
+    propia = _clave_propia(db, cifrado, 1)
+    contenido = db.conn.execute(
+        "SELECT contenido_cifrado FROM notas WHERE id = ?", (nota_id,)).fetchone()[0]
+    assert propia.decrypt(contenido) == "nota #antigua".encode()
+    assert servicios["claves"].de(1).descifrar(contenido) == "nota #antigua"
+    version = db.conn.execute("SELECT contenido_cifrado FROM notas_historial").fetchone()[0]
+    assert propia.decrypt(base64.urlsafe_b64encode(version)) == "versión anterior".encode()
+    salida = io.BytesIO()
+    with open(ruta, "rb") as origen:
+        servicios["claves"].de(1).descifrar_flujo(origen, salida)
+    assert salida.getvalue() == b"hola"
+    with pytest.raises(ValueError), open(ruta, "rb") as origen:
+        cifrado.descifrar_flujo(origen, io.BytesIO())
+
+    for tabla in ("notas_historial", "adjuntos"):
+        assert db.conn.execute(f"SELECT COUNT(*) FROM {tabla} WHERE legado = 1").fetchone() == (0,)
+    # El usuario borrado no recibe clave: su purga elimina sus filas
+    assert db.conn.execute(
+        "SELECT legado FROM notas WHERE id = ?", (borrada_id,)).fetchone() == (1,)
+    assert db.conn.execute(
+        "SELECT COUNT(*) FROM claves_usuario WHERE usuario_id = 2").fetchone() == (0,)
+
+
+def test_indexa_las_notas_legadas_sin_etiquetar(db, cifrado, servicios):
+    _usuario(db, 1)
+    nota_id = _nota(db, 1, cifrado.cifrar("compra #pan"), legado=1, etiquetado=0)
+
+    servicios["recifrado"].iniciar()
+    servicios["planificador"].ejecutar_todo()
+
+    assert [fila[0] for fila in servicios["etiquetas"].buscar(1, TIPO_ETIQUETA, "pan")] == [nota_id]
+    assert db.conn.execute(
+        "SELECT etiquetado FROM notas WHERE id = ?", (nota_id,)).fetchone() == (1,)
+
+
+def test_borrar_elimina_ya_lo_legado_y_sus_archivos_tras_confirmar(db, cifrado, servicios):
+    _usuario(db, 1)
+    _nota(db, 1, cifrado.cifrar("legado"), legado=1)
+    with db.transaccion() as cursor:
+        cursor.execute(
+            "INSERT INTO adjuntos (huella, usuario_id, tamaño, legado) VALUES ('cd34', 1, 1, 1)"
+        )
+    ruta = servicios["adjuntos"].ruta("cd34")
+    ruta.parent.mkdir(parents=True)
+    ruta.write_bytes(b"x")
+
+    # Si la transacción se deshace, filas y archivo siguen juntos
+    with pytest.raises(RuntimeError), db.transaccion() as cursor:
+        servicios["purga"].borrar(cursor, 1)
+        raise RuntimeError("fallo posterior")
+    assert ruta.exists()
+    assert db.conn.execute("SELECT COUNT(*) FROM adjuntos").fetchone() == (1,)
+
+    with db.transaccion() as cursor:
+        huellas = servicios["purga"].borrar(cursor, 1)
+    assert ruta.exists()
+    servicios["adjuntos"].borrar_sin_uso(huellas)
+    assert not ruta.exists()
+    assert db.conn.execute("SELECT COUNT(*) FROM notas WHERE legado = 1").fetchone() == (0,)